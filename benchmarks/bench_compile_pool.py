@@ -0,0 +1,77 @@
+"""
+Benchmark compiles/minute of CompileWorkerPool against plain bash_compile.
+
+Runs on a generated corpus of ecl files spread over several include
+repositories. Uses benchmarks/stub_eclcc.py unless --compiler is given, so it
+runs in CI without the ECL Client Tools.
+
+    python benchmarks/bench_compile_pool.py --files 40 --repos 4 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from pyhpcc.models.compile_pool import CompileWorkerPool
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+STUB_ECLCC = (
+    f"{sys.executable} {os.path.join(os.path.dirname(__file__), 'stub_eclcc.py')}"
+)
+
+
+def create_corpus(folder, files, repos):
+    corpus = []
+    for i in range(files):
+        repo = os.path.join(folder, f"repo{i % repos}")
+        os.makedirs(repo, exist_ok=True)
+        file_name = os.path.join(folder, f"query{i}.ecl")
+        with open(file_name, "w") as f:
+            f.write(f"OUTPUT('query {i}');\n")
+        corpus.append((file_name, {"-I": repo, "-E": bool}))
+    return corpus
+
+
+def compiles_per_minute(count, elapsed):
+    return count / elapsed * 60 if elapsed else 0.0
+
+
+def run(files=40, repos=4, workers=4, compiler=STUB_ECLCC):
+    ws = WorkunitSubmit(None, ("thor",))
+    results = {"files": files, "repos": repos, "workers": workers}
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = create_corpus(folder, files, repos)
+
+        start = time.perf_counter()
+        for file_name, options in corpus:
+            ws.bash_compile(file_name, options, compiler)
+        results["baseline_compiles_per_minute"] = compiles_per_minute(
+            files, time.perf_counter() - start
+        )
+
+        with CompileWorkerPool(ws, workers=workers, compiler=compiler) as pool:
+            start = time.perf_counter()
+            futures = [pool.submit(file_name, opts) for file_name, opts in corpus]
+            statuses = [future.result()[0]["status"] for future in futures]
+            results["pool_compiles_per_minute"] = compiles_per_minute(
+                files, time.perf_counter() - start
+            )
+        results["pool_errors"] = sum(status != "success" for status in statuses)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--repos", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--compiler", default=STUB_ECLCC)
+    args = parser.parse_args()
+    print(json.dumps(run(args.files, args.repos, args.workers, args.compiler)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark the read, upload, download, submit-wait, activity and Roxie paths against a stub ESP.
+
+Starts benchmarks/stub_esp.py in a subprocess, so the server does not compete
+with the client for the GIL, and runs each scenario against it. Reports
+throughput, per endpoint latency percentiles from the request
+instrumentation, and peak Python memory from tracemalloc, as JSON. pandas is
+imported before any scenario, so its first import is not timed.
+
+    python benchmarks/bench_esp.py --rows 200000 --latency 0.002
+    python benchmarks/bench_esp.py --scenario read --scenario roxie --output results.json
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from pyhpcc import utils
+from pyhpcc.decoder import decode_response
+from pyhpcc.instrumentation import Instrumentation
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.file import ReadFileInfo
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.roxie import RoxieClient
+from pyhpcc.models.workunit_result import WorkunitResultReader
+
+STUB_ESP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_esp.py")
+WUID = "W20240101-120000"
+
+
+class LatencyRecorder(object):
+    """Post request callback collecting latencies and bytes per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __call__(self, info):
+        self.latencies[info.endpoint].append(info.total)
+        self.bytes_in += info.bytes_in
+        self.bytes_out += info.bytes_out
+
+    def summary(self):
+        return {
+            endpoint: {
+                "requests": len(values),
+                "p50_ms": utils.percentile(values, 50) * 1000,
+                "p95_ms": utils.percentile(values, 95) * 1000,
+                "p99_ms": utils.percentile(values, 99) * 1000,
+            }
+            for endpoint, values in self.latencies.items()
+        }
+
+
+def start_stub(args):
+    command = [
+        sys.executable,
+        STUB_ESP,
+        "--rows",
+        str(args.rows),
+        "--list-size",
+        str(args.list_size),
+        "--latency",
+        str(args.latency),
+        "--wait",
+        str(args.wait),
+        "--download-size",
+        str(args.file_size),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    port = int(process.stdout.readline())
+    return process, port
+
+
+def read(hpcc, args):
+    reader = WorkunitResultReader(
+        hpcc, WUID, sequence=0, page_size=args.page_size, max_workers=args.workers
+    )
+    return {"rows": len(reader.read())}
+
+
+def read_file(hpcc, args):
+    rows = 0
+    file_info = ReadFileInfo(hpcc, "bench::employees")
+    for data_attr, _ in file_info.get_data_iter(0, args.rows, args.page_size):
+        rows += data_attr["count"]
+    return {"rows": rows}
+
+
+def upload(hpcc, args):
+    content = b"x" * args.file_size
+    for i in range(args.iterations):
+        files = {"file": (f"bench{i}.csv", io.BytesIO(content), "text/plain")}
+        hpcc.upload_file(
+            upload_="", rawxml_=1, NetAddress="127.0.0.1", Path="/", OS=2, files=files
+        ).raise_for_status()
+    return {"files": args.iterations, "bytes": args.iterations * args.file_size}
+
+
+def download(hpcc, args):
+    size = 0
+    for i in range(args.iterations):
+        size += len(
+            hpcc.download_file(
+                Name="bench.csv", NetAddress="127.0.0.1", Path="/", OS=2
+            ).content
+        )
+    return {"files": args.iterations, "bytes": size}
+
+
+def submit_wait(hpcc, args):
+    for _ in range(args.iterations):
+        response = hpcc.wu_create_and_update(QueryText="OUTPUT(1);", Jobname="bench")
+        wuid = response.json()["WUUpdateResponse"]["Workunit"]["Wuid"]
+        hpcc.wu_submit(Wuid=wuid, Cluster="thor")
+        hpcc.wu_wait_complete(Wuid=wuid)
+        hpcc.get_wu_info(Wuid=wuid)
+    return {"workunits": args.iterations}
+
+
+def activity(hpcc, args):
+    workunits = 0
+    for _ in range(args.iterations):
+        body = decode_response(hpcc.activity())
+        workunits += len(body["ActivityResponse"]["Running"]["ActiveWorkunit"])
+    return {"polls": args.iterations, "running_workunits": workunits}
+
+
+def roxie(hpcc, args):
+    client = RoxieClient(
+        hpcc.auth,
+        "query",
+        "roxie",
+        max_workers=args.workers,
+        instrumentation=hpcc.instrumentation,
+    )
+    with client:
+        client.call_many([{"id": i} for i in range(args.iterations)])
+    return {"queries": args.iterations}
+
+
+SCENARIOS = {
+    "read": read,
+    "read_file": read_file,
+    "upload": upload,
+    "download": download,
+    "submit_wait": submit_wait,
+    "activity": activity,
+    "roxie": roxie,
+}
+
+
+def run_scenario(name, port, args):
+    recorder = LatencyRecorder()
+    instrumentation = Instrumentation()
+    instrumentation.add_post_request(recorder)
+    hpcc = HPCC(
+        Auth("127.0.0.1", port, "bench", "bench", protocol="http"),
+        instrumentation=instrumentation,
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = SCENARIOS[name](hpcc, args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    requests = sum(len(values) for values in recorder.latencies.values())
+    result.update(
+        seconds=seconds,
+        requests_per_second=requests / seconds,
+        mb_in_per_second=recorder.bytes_in / 1e6 / seconds,
+        mb_out_per_second=recorder.bytes_out / 1e6 / seconds,
+        peak_memory_mb=peak / 1e6,
+        endpoints=recorder.summary(),
+    )
+    for key in ("rows", "queries", "workunits", "polls"):
+        if key in result:
+            result[f"{key}_per_second"] = result[key] / seconds
+    return result
+
+
+def run(args):
+    # PyHPCC imports pandas lazily, keep its import out of the first timed scenario
+    importlib.import_module("pandas")
+    process, port = start_stub(args)
+    try:
+        results = {
+            "config": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "scenarios": {},
+        }
+        for name in args.scenario or SCENARIOS:
+            results["scenarios"][name] = run_scenario(name, port, args)
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), default=[]
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--list-size", type=int, default=100)
+    parser.add_argument("--file-size", type=int, default=1 << 20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--wait", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+    results = json.dumps(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark import time of PyHPCC modules with python -X importtime.
+
+Imports each module in a fresh interpreter several times and reports the best
+cumulative import time, the slowest imports it pulls in and whether heavy
+optional dependencies such as pandas were loaded.
+
+    python benchmarks/bench_import_time.py --runs 5 pyhpcc.models.workunit_submit
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow")
+DEFAULT_MODULES = (
+    "pyhpcc.utils",
+    "pyhpcc.models.workunit_submit",
+    "pyhpcc.models.file",
+    "pyhpcc.models.roxie",
+)
+
+
+def parse_importtime(stderr):
+    """List (module, depth, cumulative microseconds) in the order -X importtime prints them"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(cumulative)))
+    return entries
+
+
+def nested_imports(entries, module):
+    """Get the cumulative time of module and of each import it triggered"""
+    index = max(i for i, entry in enumerate(entries) if entry[0] == module)
+    _, depth, cumulative = entries[index]
+    nested = {}
+    # Nested imports are printed before their parent with a deeper indent
+    for name, entry_depth, entry_cumulative in reversed(entries[:index]):
+        if entry_depth <= depth:
+            break
+        nested[name] = entry_cumulative
+    return cumulative, nested
+
+
+def measure(module):
+    code = (
+        f"import json, sys, {module}; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative, nested = nested_imports(parse_importtime(proc.stderr), module)
+    return cumulative, nested, json.loads(proc.stdout)
+
+
+def run(modules=DEFAULT_MODULES, runs=5, top=5):
+    results = {}
+    for module in modules:
+        cumulative, nested, heavy = min(
+            (measure(module) for _ in range(runs)), key=lambda result: result[0]
+        )
+        slowest = sorted(nested, key=nested.get, reverse=True)[:top]
+        results[module] = {
+            "import_ms": cumulative / 1000,
+            "heavy_modules": heavy,
+            "slowest_imports_ms": {name: nested[name] / 1000 for name in slowest},
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.modules, args.runs, args.top)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark decoding of large ESP JSON responses with each installed JSON backend.
+
+Decodes WUResult pages, generated or recorded, with every backend in
+pyhpcc.decoder.BACKENDS that is installed, and compares requests'
+Response.json() per helper call against a single decode_response shared by
+the helpers.
+
+    python benchmarks/bench_json_decode.py --rows 50000 --repeat 5
+    python benchmarks/bench_json_decode.py --response recorded_wuresult.json
+"""
+
+import argparse
+import json
+import time
+
+from requests.models import Response
+
+from pyhpcc import decoder, utils
+from pyhpcc.errors import HPCCException
+
+
+def generate_wuresult(rows):
+    row_data = [
+        {
+            "id": str(i),
+            "name": f"name {i}",
+            "city": "Alpharetta",
+            "amount": f"{i * 1.25:.2f}",
+            "flags": ["a", "b", "c"],
+        }
+        for i in range(rows)
+    ]
+    return json.dumps(
+        {
+            "WUResultResponse": {
+                "Wuid": "W20240101-000000",
+                "Sequence": 0,
+                "Start": 0,
+                "Requested": rows,
+                "Count": rows,
+                "Total": rows,
+                "Result": {"Row": row_data},
+            }
+        }
+    ).encode("utf-8")
+
+
+def make_response(content):
+    response = Response()
+    response.status_code = 200
+    response._content = content
+    response.encoding = "utf-8"
+    return response
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(contents, repeat=5):
+    size_mb = sum(len(content) for content in contents) / 1e6
+    results = {"responses": len(contents), "size_mb": round(size_mb, 2)}
+
+    def response_json():
+        for content in contents:
+            make_response(content).json()
+
+    seconds = best_of(repeat, response_json)
+    results["response_json_mb_per_second"] = size_mb / seconds
+
+    initial = decoder.get_backend()
+    try:
+        for backend in decoder.BACKENDS:
+            try:
+                decoder.set_backend(backend)
+            except HPCCException:
+                continue
+
+            def decode():
+                for content in contents:
+                    utils.get_data_from_response(make_response(content))
+
+            seconds = best_of(repeat, decode)
+            results[f"{backend}_mb_per_second"] = size_mb / seconds
+    finally:
+        decoder.set_backend(initial)
+
+    # Helpers that read the same response, as ReadFileInfo does with DFUQuery
+    def parse_per_helper():
+        for content in contents:
+            response = make_response(content)
+            for _ in range(3):
+                response.json()
+
+    def parse_once():
+        for content in contents:
+            body = decoder.decode_response(make_response(content))
+            for _ in range(3):
+                decoder.decode_response(body)
+
+    results["parse_per_helper_seconds"] = best_of(repeat, parse_per_helper)
+    results["parse_once_seconds"] = best_of(repeat, parse_once)
+    results["default_backend"] = initial
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--response",
+        action="append",
+        default=[],
+        help="Recorded JSON response file, may be repeated",
+    )
+    args = parser.parse_args()
+    if args.response:
+        contents = []
+        for path in args.response:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+    else:
+        contents = [generate_wuresult(args.rows)]
+    print(json.dumps(run(contents, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Stand-in for eclcc used by the benchmarks and tests.
+
+Writes the -o output file and exits. A compile without a warm --metacache
+directory sleeps STUB_ECLCC_COLD seconds to mimic eclcc loading the standard
+library and include repositories; later compiles with the same cache sleep
+STUB_ECLCC_WARM seconds.
+"""
+
+import os
+import sys
+import time
+
+MARKER = "stub-eclcc.cache"
+
+
+def main(args):
+    cold = float(os.environ.get("STUB_ECLCC_COLD", "0.2"))
+    warm = float(os.environ.get("STUB_ECLCC_WARM", "0.02"))
+    output_file = "a.out"
+    metacache = None
+    if "-o" in args:
+        output_file = args[args.index("-o") + 1]
+    if "--metacache" in args:
+        metacache = args[args.index("--metacache") + 1]
+    input_file = args[-1]
+    if not os.path.exists(input_file):
+        print(f"Error: File '{input_file}' does not exist")
+        return 1
+    marker = os.path.join(metacache, MARKER) if metacache else None
+    if marker and os.path.exists(marker):
+        time.sleep(warm)
+    else:
+        time.sleep(cold)
+        if marker:
+            open(marker, "w").close()
+    with open(output_file, "w") as f:
+        f.write("<Archive/>\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
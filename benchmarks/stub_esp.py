@@ -0,0 +1,195 @@
+"""
+Stub ESP and WsEcl server used by the benchmarks.
+
+Replays the recorded responses in benchmarks/responses, scaled to the
+configured sizes, with a configurable latency per request:
+
+- WsWorkunits/WUResult returns Start/Count rows of a --rows row result, built
+  from the recorded row
+- WsDfu/DFUQuery, WsWorkunits/WUInfo and WsSMC/Activity repeat their recorded
+  file, timer and workunit entries --list-size times
+- WsWorkunits/WUWaitComplete answers after --wait seconds
+- FileSpray/UploadFile reads and discards the upload
+- FileSpray/DownloadFile returns --download-size bytes
+- WsEcl queries return one recorded result row per request
+- any other path returns its recorded file if there is one
+
+Prints the port it listens on, then serves until interrupted.
+
+    python benchmarks/stub_esp.py --port 0 --rows 100000 --latency 0.005
+"""
+
+import argparse
+import copy
+import functools
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+RESPONSES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "responses")
+
+
+class StubESP(object):
+    """Builds the response of each request from the recorded responses"""
+
+    def __init__(
+        self,
+        responses_dir=RESPONSES_DIR,
+        rows=100000,
+        list_size=100,
+        latency=0.0,
+        wait=0.0,
+        download_size=1 << 20,
+    ):
+        self.rows = rows
+        self.list_size = list_size
+        self.latency = latency
+        self.wait = wait
+        self.download_size = download_size
+        self.recorded = {}
+        for file_name in os.listdir(responses_dir):
+            if file_name.endswith(".json"):
+                with open(os.path.join(responses_dir, file_name)) as f:
+                    self.recorded[file_name[: -len(".json")]] = json.load(f)
+        self.encoded = {
+            name: json.dumps(self._scale(name, body)).encode("utf-8")
+            for name, body in self.recorded.items()
+        }
+
+    def respond(self, path, params):
+        """Get the content type and body for a request"""
+        time.sleep(self.latency)
+        name = path.strip("/").removesuffix(".json").replace("/", "_")
+        if name == "WsWorkunits_WUResult":
+            start = int(params.get("Start", 0))
+            count = int(params.get("Count", self.rows))
+            return "application/json", self._result_page(start, count)
+        if name == "WsWorkunits_WUWaitComplete":
+            time.sleep(self.wait)
+        if name == "FileSpray_DownloadFile":
+            return "application/octet-stream", b"x" * self.download_size
+        if name.startswith("WsEcl_"):
+            return "application/json", self.encoded["WsEcl_query"]
+        if name in self.encoded:
+            return "application/json", self.encoded[name]
+        return None, None
+
+    def _scale(self, name, body):
+        body = copy.deepcopy(body)
+        if name == "WsDfu_DFUQuery":
+            response = body["DFUQueryResponse"]
+            files = response["DFULogicalFiles"]["DFULogicalFile"]
+            response["DFULogicalFiles"]["DFULogicalFile"] = self._repeat(
+                files[0], "Name"
+            )
+            response["NumFiles"] = self.list_size
+        elif name == "WsWorkunits_WUInfo":
+            timers = body["WUInfoResponse"]["Workunit"]["Timers"]
+            timers["ECLTimer"] = self._repeat(timers["ECLTimer"][0], "Name")
+        elif name == "WsSMC_Activity":
+            running = body["ActivityResponse"]["Running"]
+            running["ActiveWorkunit"] = self._repeat(
+                running["ActiveWorkunit"][0], "Wuid"
+            )
+        return body
+
+    def _repeat(self, entry, key):
+        entries = []
+        for i in range(self.list_size):
+            entry = dict(entry)
+            entry[key] = f"{entry[key]}_{i}"
+            entries.append(entry)
+        return entries
+
+    @functools.lru_cache(maxsize=64)
+    def _result_page(self, start, count):
+        body = copy.deepcopy(self.recorded["WsWorkunits_WUResult"])
+        response = body["WUResultResponse"]
+        template = response["Result"]["Row"][0]
+        end = min(start + count, self.rows)
+        rows = [dict(template, id=str(i)) for i in range(start, end)]
+        response.update(
+            Start=start,
+            Requested=count,
+            Count=len(rows),
+            Total=self.rows,
+        )
+        response["Result"] = {"Row": rows}
+        return json.dumps(body).encode("utf-8")
+
+
+def make_handler(stub):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, without this small
+        # responses on a kept-alive connection wait for the delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self._handle(b"")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self._handle(self.rfile.read(length))
+
+        def _handle(self, body):
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/x-www-form-urlencoded"):
+                form = parse_qs(body.decode("utf-8"))
+                params.update({key: values[-1] for key, values in form.items()})
+            content_type, content = stub.respond(url.path, params)
+            if content is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--responses", default=RESPONSES_DIR)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--list-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--wait", type=float, default=0.0)
+    parser.add_argument("--download-size", type=int, default=1 << 20)
+    args = parser.parse_args()
+    stub = StubESP(
+        args.responses,
+        args.rows,
+        args.list_size,
+        args.latency,
+        args.wait,
+        args.download_size,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(stub))
+    server.daemon_threads = True
+    print(server.server_address[1], flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pyhpcc.config as conf
+
+
+class TTLCache(object):
+    """
+    Thread-safe in-memory cache with per entry expiry and LRU eviction
+
+    Attributes
+    ----------
+        ttl:
+            Seconds an entry is kept
+        max_size:
+            Maximum number of entries. The least recently used entry is evicted
+            when a new entry is added to a full cache
+        negative_ttl:
+            Seconds a negative entry, e.g. a failed response, is kept.
+            Negative entries are not cached if None
+        hits:
+            Number of lookups that found an entry
+        misses:
+            Number of lookups that found no entry or an expired one
+        evictions:
+            Number of entries evicted to make room
+
+    Methods
+    -------
+        get:
+            Look up a key
+
+        set:
+            Add or replace an entry
+
+        set_negative:
+            Add a negative entry with negative_ttl
+
+        invalidate:
+            Remove an entry
+
+        clear:
+            Remove every entry
+
+        stats:
+            Hit, miss and eviction counters
+    """
+
+    def __init__(
+        self,
+        ttl=conf.CACHE_TTL,
+        max_size=conf.CACHE_MAX_SIZE,
+        negative_ttl=None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size should be at least 1")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        """Look up a key
+
+        Parameters
+        ----------
+            key:
+                Hashable cache key
+            default:
+                Value returned on a miss
+
+        Returns
+        -------
+            value:
+                The cached value, or default if the key is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Add or replace an entry
+
+        Parameters
+        ----------
+            key:
+                Hashable cache key
+            value:
+                Value to cache
+            ttl:
+                Seconds the entry is kept. Defaults to the cache's ttl
+        """
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_negative(self, key, value):
+        """Add a negative entry with negative_ttl. Does nothing if negative_ttl is None
+
+        Parameters
+        ----------
+            key:
+                Hashable cache key
+            value:
+                Value to cache
+        """
+        if self.negative_ttl is not None:
+            self.set(key, value, self.negative_ttl)
+
+    def invalidate(self, key):
+        """Remove an entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit, miss and eviction counters
+
+        Returns
+        -------
+            stats: dict
+                size, hits, misses, evictions and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -3,6 +3,7 @@ import logging
 from pyhpcc.config import (
     CLUSTER_OPTION,
     COMPILE_OPTIONS,
+    ECLCC,
     JOB_NAME_OPTION,
     LIMIT_OPTION,
     MASKED_PASSWORD,
@@ -30,6 +31,8 @@ class CompileConfig(object):
     ----------
         options:
             Dictionary of keys (option), values (value)
+        compiler:
+            The eclcc executable. Defaults to eclcc on the PATH
 
     Methods:
     -------
@@ -48,8 +51,9 @@ class CompileConfig(object):
 
     """
 
-    def __init__(self, options: dict):
+    def __init__(self, options: dict, compiler=ECLCC):
         self.options = options.copy()
+        self.compiler = compiler
 
     def validate_options(self):
         """Validate if the compiler options are supported or not"""
@@ -72,7 +76,7 @@ class CompileConfig(object):
         """Generate the eclcc command for the given options and input_file"""
         self.set_output_xml()
         self.validate_options()
-        eclcc_command = "eclcc"
+        eclcc_command = self.compiler
         for key, value in self.options.items():
             if value is bool:
                 eclcc_command += f" {key}"
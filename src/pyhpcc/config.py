@@ -22,10 +22,13 @@ WORKUNIT_STATE_MAP = {
     "statesize": 17,
 }
 
+ECLCC = "eclcc"
 DEFAULT_COMPILE_OPTIONS = {"-platform": "thor", "-wu": bool, "-E": bool}
 DEFUALT_RUN_OPTIONS = {}
 
 ECL_OUTPUT_DIR = "ecl-output"
+WORKSPACE_PREFIX = "pyhpcc-"
+WORKSPACE_ROOTS = ["/dev/shm"]  # Memory backed directories preferred for workspaces
 
 COMMAND = "command"
 CLUSTER_OPTION = "--target"
@@ -37,6 +40,8 @@ PASSWORD_OPTIONS = ["-pw", "--password"]
 SERVER_OPTIONS = ["-s", "--s"]
 PORT_OPTION = "--port"
 OUTPUT_FILE_OPTION = "-o"
+INCLUDE_OPTION = "-I"
+METACACHE_OPTION = "--metacache"
 OUTPUT_XML = "-E"
 XML_WORKUNIT_INFO = "-wu"
 VERBOSE_OPTIONS = [
@@ -74,7 +79,7 @@ COMPILE_OPTIONS = {
     "--cleaninvalidrepos",
     "--fetchrepos",
     "--logfile",
-    "--metacache",
+    METACACHE_OPTION,
     "--nosourcepath",
     "-specs",
     "--updaterepos",
@@ -146,8 +151,86 @@ COMPILE_ERROR_PATTERN = [
     "Failed to compile ",
 ]
 FAILED_STATUS = {"failed", "aborted", "aborting"}
+TERMINAL_STATUS = {"completed", "failed", "aborted", "archived"}
 
 WUID_PATTERN = "^(wuid): (W[0-9]+-[0-9]+)$"
 WUID = "wuid"
 STATE_PATTERN = f"^(state): ({"|".join(WORKUNIT_STATE_MAP.keys())})$"
 STATE = "state"
+
+## Scheduler Config
+SCHEDULER_POLL_INTERVAL = 5  # Seconds between WUQuery polls of running workunits
+SCHEDULER_METRICS_WINDOW = 10000  # Number of recent jobs kept for wait/run metrics
+
+## Single Flight Config
+SINGLE_FLIGHT_MAX_ENTRIES = 1024  # Successful results kept for the reuse window
+
+## Result Reader Config
+DEFAULT_RESULT_PAGE_SIZE = 10000  # Rows fetched per WUResult call
+DEFAULT_FETCH_WORKERS = 4  # Pages fetched in parallel
+
+## Catalog Config
+DEFAULT_CATALOG_PAGE_SIZE = 1000  # Files fetched per DFUQuery call
+CATALOG_MAX_FILES = 100000  # MaxNumberOfFiles of each DFUQuery
+CATALOG_LOOKUP_SCAN_FACTOR = (
+    10  # Files a lookup reads per name before querying names one by one
+)
+CATALOG_SNAPSHOT_MAX_AGE = 300  # Seconds a snapshot answers lookups before syncing
+CATALOG_FULL_SYNC_INTERVAL = 86400  # Seconds between full syncs of a snapshot
+# Seconds incremental syncs start before the newest Modified read. ESP reports
+# Modified in the server's local time, so this covers any UTC offset
+CATALOG_SYNC_OVERLAP = 86400
+
+## Graph Config
+GRAPH_SKEW_THRESHOLD = (
+    20  # Percent above the average time an activity is reported as skewed
+)
+
+## Statistics Config
+DEFAULT_STATS_BATCH_SIZE = 100  # Workunits collected per batch written to the output
+
+## Workunit History Config
+WU_HISTORY_WINDOW = 3600  # Seconds of workunit history per WUQuery window
+DEFAULT_WU_PAGE_SIZE = 1000  # Workunits fetched per WUQuery call
+DEFAULT_WU_BATCH_SIZE = 10000  # Workunits per exported batch
+
+## Compile Pool Config
+DEFAULT_COMPILE_WORKERS = 4
+COMPILE_WARM_MARKER = ".pyhpcc-warm"  # Marks a metacache with a successful compile
+
+## Roxie Config
+DEFAULT_ROXIE_WORKERS = 32  # Parallel requests and pooled connections per client
+ROXIE_MAX_FAILURES = 3  # Consecutive failures before an endpoint is ejected
+ROXIE_EJECT_SECONDS = 30  # Seconds an ejected endpoint is left out of rotation
+ROXIE_LATENCY_WINDOW = 100  # Recent latencies kept per endpoint
+ROXIE_MIN_LATENCY_SAMPLES = 20  # Samples needed before latency checks and hedging
+ROXIE_EWMA_ALPHA = 0.2  # Weight of the newest latency in the moving average
+DEFAULT_ROXIE_BATCH_SIZE = 500  # Input rows packed into one batched request
+
+## Cache Config
+CACHE_TTL = 60  # Seconds a cached response is kept
+CACHE_MAX_SIZE = 1024  # Cached responses kept before the least recently used is evicted
+
+## Instrumentation Config
+# Upper bounds in seconds of the latency histogram buckets
+HISTOGRAM_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+## Logging Config
+LOG_MAX_CHARS = 500  # Characters of a logged request field before it is truncated
+REQUEST_LOG_SAMPLE_RATE = 0.01  # Fraction of successful requests RequestLogSampler logs
@@ -0,0 +1,113 @@
+import json
+import logging
+
+from pyhpcc.errors import HPCCException
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+def _load_backend(name):
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads
+    if name == "msgspec":
+        import msgspec
+
+        return msgspec.json.decode
+    if name == "json":
+        return json.loads
+    raise HPCCException(f"Unknown JSON backend {name}, expected one of {BACKENDS}")
+
+
+def _default_backend():
+    for name in BACKENDS:
+        try:
+            return name, _load_backend(name)
+        except ImportError:
+            continue
+
+
+_backend, _loads = _default_backend()
+
+
+def get_backend():
+    """
+    Get the name of the JSON backend used to decode responses
+
+    Returns
+    -------
+    str
+        orjson, msgspec or json
+    """
+    return _backend
+
+
+def set_backend(name):
+    """
+    Set the JSON backend used to decode responses
+
+    By default the fastest installed backend is used, in the order of BACKENDS.
+
+    Parameters
+    ----------
+    name : str
+        orjson, msgspec or json
+
+    Raises
+    ------
+    HPCCException
+        If the backend is unknown or not installed
+    """
+    global _backend, _loads
+    try:
+        loads = _load_backend(name)
+    except ImportError:
+        raise HPCCException(f"JSON backend {name} is not installed")
+    _backend, _loads = name, loads
+    log.debug("Using %s to decode JSON responses", name)
+
+
+def loads(data):
+    """
+    Decode a JSON document with the current backend
+
+    Parameters
+    ----------
+    data : bytes or str
+        The JSON document
+
+    Returns
+    -------
+    object
+        The decoded document
+    """
+    return _loads(data)
+
+
+def decode_response(response):
+    """
+    Decode the JSON body of a response
+
+    Already decoded responses are returned as they are, so helpers can be
+    passed either a Response or the result of an earlier decode_response and
+    a response is parsed only once.
+
+    Parameters
+    ----------
+    response : Response or dict or list
+        The Response object or an already decoded body
+
+    Returns
+    -------
+    dict or list
+        The decoded body
+    """
+    if isinstance(response, (dict, list)):
+        return response
+    content = getattr(response, "content", None)
+    if isinstance(content, (bytes, str)) and content:
+        return _loads(content)
+    return response.json()
@@ -1,9 +1,11 @@
 import logging
 
+from requests.exceptions import HTTPError
 from requests.models import Response
 
 from pyhpcc.errors import HPCCAuthenticationError
-from pyhpcc.utils import convert_arg_to_utf8_str
+from pyhpcc.instrumentation import instrumented_request
+from pyhpcc.utils import LazyLogValue, convert_arg_to_utf8_str
 
 log = logging.getLogger(__name__)
 
@@ -56,7 +58,7 @@ def roxie_handler(**config):
             if self.require_auth and not api.auth:
                 raise HPCCAuthenticationError("Authentication required for this method")
             self.post_data = kwargs.pop("data", None)
-            self.session.headers = kwargs.pop("headers", {})
+            self.headers = dict(kwargs.pop("headers", None) or {})
             self.build_parameters(args, kwargs)
 
         def build_parameters(self, args, kwargs):
@@ -80,26 +82,22 @@ def roxie_handler(**config):
                     If the parameter is not allowed or if duplicate parameters are passed
 
             """
-            self.session.params = {}
+            self.params = {}
             for idx, arg in enumerate(args):
                 if arg is None:
                     continue
                 try:
-                    self.session.params[self.allowed_param[idx]] = (
-                        convert_arg_to_utf8_str(arg)
-                    )
+                    self.params[self.allowed_param[idx]] = convert_arg_to_utf8_str(arg)
                 except Exception:
                     raise TypeError("Too many arguments")
             for k, arg in list(kwargs.items()):
                 # for k, arg in kwargs.items():
                 if arg is None:
                     continue
-                if k in self.session.params:
+                if k in self.params:
                     raise TypeError("Duplicate argument: %s" % k)
 
-                self.session.params[k] = convert_arg_to_utf8_str(arg)
-
-            log.info("PARAMS: %r", self.session.params)
+                self.params[k] = convert_arg_to_utf8_str(arg)
 
         def execute(self):
             """
@@ -120,34 +118,44 @@ def roxie_handler(**config):
             """
             self.api.cached_result = False
 
-            # Build the request URL
-            full_url = (
-                self.api.auth.get_url()
-                + self.api.auth.path_delimiter
-                + self.api.definition
-                + self.api.auth.path_delimiter
-                + self.api.roxie_port
-                + self.api.auth.path_delimiter
-                + self.api.search_service
-                + self.api.auth.path_delimiter
-                + "."
-                + self.response_type
-            )
+            # Check the cache
+            cache = getattr(self.api, "cache", None)
+            if self.use_cache and cache is not None:
+                cache_key = self.api.cache_key(self.params, self.post_data)
+                result = cache.get(cache_key)
+                if result is not None:
+                    self.api.cached_result = True
+                    self.api.last_response = result
+                    result.raise_for_status()
+                    return result
 
-            # Debugging
-            log.info("full_url: %s", full_url)
-            log.info("self.session.params: %s", self.session.params)
-            log.info("self.session.headers: %s", self.session.headers)
-            log.info("self.session.data: %s", self.post_data)
+            # Build the request URL
+            full_url = self.api.get_query_url()
+
+            # Debugging, fields are summarized only if the record is emitted
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    "%s %s params=%s headers=%s data=%s",
+                    self.method,
+                    full_url,
+                    LazyLogValue(self.params, decode_bytes=True),
+                    LazyLogValue(self.headers, decode_bytes=True),
+                    LazyLogValue(self.post_data),
+                )
 
             # If auth is required, add auth to the session
             if self.api.auth:
                 auth = self.api.auth.oauth
 
             # Execute request
-            resp: Response = self.session.request(
+            resp: Response = instrumented_request(
+                getattr(self.api, "instrumentation", None),
+                self.api.endpoint_name(),
+                self.session,
                 self.method,
                 full_url,
+                params=self.params,
+                headers=self.headers,
                 data=self.post_data,
                 timeout=self.api.timeout,
                 auth=auth,
@@ -155,13 +163,23 @@ def roxie_handler(**config):
 
             # Check for errors
             self.api.last_response = resp
-            resp.raise_for_status()
+            try:
+                resp.raise_for_status()
+            except HTTPError:
+                # Only client errors are cached, 5xx responses are often transient
+                if (
+                    self.use_cache
+                    and cache is not None
+                    and 400 <= resp.status_code < 500
+                ):
+                    cache.set_negative(cache_key, resp)
+                raise
 
             result = resp
 
             # Cache the result
-            # if self.use_cache and self.api.cache:
-            #     self.api.cache.set(self.session.params, result)
+            if self.use_cache and cache is not None:
+                cache.set(cache_key, result)
 
             return result
 
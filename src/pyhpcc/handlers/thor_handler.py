@@ -3,7 +3,8 @@ import logging
 from requests.models import Response
 
 from pyhpcc.errors import HPCCAuthenticationError
-from pyhpcc.utils import convert_arg_to_utf8_str
+from pyhpcc.instrumentation import instrumented_request
+from pyhpcc.utils import LazyLogValue, convert_arg_to_utf8_str
 
 log = logging.getLogger(__name__)
 
@@ -60,7 +61,7 @@ def thor_handler(**config):
                 raise HPCCAuthenticationError("Authentication required for this method")
             self.data = kwargs.pop("data", None)
             self.files = kwargs.pop("files", None)
-            self.session.headers = kwargs.pop("headers", {})
+            self.headers = dict(kwargs.pop("headers", None) or {})
             self.build_payload(args, kwargs)
 
         def build_payload(self, args, kwargs):
@@ -84,31 +85,27 @@ def thor_handler(**config):
                     If the parameter is not allowed or if duplicate parameters are passed
 
             """
-            self.session.params = {}
+            self.params = {}
 
             for key, arg in enumerate(args):
                 if arg is None:
                     continue
                 try:
-                    self.session.params[self.allowed_param[key]] = (
-                        convert_arg_to_utf8_str(arg)
-                    )
+                    self.params[self.allowed_param[key]] = convert_arg_to_utf8_str(arg)
                 except Exception:
                     raise TypeError("Too many arguments")
 
             for key, arg in kwargs.items():
                 if arg is None:
                     continue
-                if key in self.session.params:
+                if key in self.params:
                     raise TypeError("Duplicate argument: %s" % key)
 
                 try:
-                    self.session.params[key] = convert_arg_to_utf8_str(arg)
+                    self.params[key] = convert_arg_to_utf8_str(arg)
                 except IndexError:
                     raise TypeError("Too many arguments")
 
-            log.info("Parameters: %s" % self.session.params)
-
         def execute(self):
             """
             Executes the API call
@@ -130,7 +127,7 @@ def thor_handler(**config):
             self.api.cached_result = False
 
             # if self.use_cache and self.api.cache:
-            #     result = self.api.cache.get(self.session.params)
+            #     result = self.api.cache.get(self.params)
             #     if result:
             #         self.api.cached_result = True
             #         return result
@@ -139,22 +136,32 @@ def thor_handler(**config):
                 self.api.auth.get_url() + "/" + self.path + "." + self.response_type
             )
 
-            # Debugging
-            log.info("full_url: %s", full_url)
-            log.info("self.session.params: %s", self.session.params)
-            log.info("self.session.headers: %s", self.session.headers)
-            log.info("self.session.data: %s", self.data)
-            log.info("self.session.files: %s", self.files)
+            # Debugging, fields are summarized only if the record is emitted
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(
+                    "%s %s params=%s headers=%s data=%s files=%s",
+                    self.method,
+                    full_url,
+                    LazyLogValue(self.params, decode_bytes=True),
+                    LazyLogValue(self.headers, decode_bytes=True),
+                    LazyLogValue(self.data),
+                    LazyLogValue(self.files),
+                )
 
-            self.session.headers["Accept_Encoding"] = "gzip"
+            self.headers["Accept_Encoding"] = "gzip"
 
             # If auth is required, add auth to the session
             if self.api.auth:
                 auth = self.api.auth.oauth
 
-            resp: Response = self.session.request(
+            resp: Response = instrumented_request(
+                getattr(self.api, "instrumentation", None),
+                self.path.lstrip("/"),
+                self.session,
                 self.method,
                 full_url,
+                params=self.params,
+                headers=self.headers,
                 data=self.data,
                 files=self.files,
                 timeout=self.api.timeout,
@@ -169,7 +176,7 @@ def thor_handler(**config):
 
             # Cache the result
             # if self.use_cache and self.api.cache:
-            #     self.api.cache.set(self.session.params, result)
+            #     self.api.cache.set(self.params, result)
 
             return result
 
@@ -0,0 +1,332 @@
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import pyhpcc.config as conf
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class RequestInfo(object):
+    """
+    Timing and size of one ESP request
+
+    Attributes
+    ----------
+        endpoint:
+            ESP path of the request, e.g. WsWorkunits/WUInfo
+        method:
+            HTTP method
+        url:
+            Full url of the request
+        started:
+            time.time() when the request was sent
+        status:
+            HTTP status code, None if no response was received
+        bytes_out:
+            Size of the request body
+        bytes_in:
+            Size of the decoded response body
+        server:
+            Seconds from sending the request to parsing the response headers,
+            including connection setup when a new connection was opened
+        download:
+            Seconds spent reading the response body
+        total:
+            Seconds the request took
+        retries:
+            Number of retries made by the connection adapter
+        error:
+            Name of the exception raised, None if a response was received
+    """
+
+    endpoint: str
+    method: str
+    url: str
+    started: float = None
+    status: int = None
+    bytes_out: int = 0
+    bytes_in: int = 0
+    server: float = None
+    download: float = None
+    total: float = None
+    retries: int = 0
+    error: str = None
+
+
+class Instrumentation(object):
+    """
+    Registry of callbacks run before and after every ESP request
+
+    Pass an Instrumentation to HPCC or Roxie to instrument their requests. Pre
+    request callbacks get the RequestInfo before the request is sent, post
+    request callbacks get it completed. A callback that raises is logged and
+    does not affect the request.
+
+    Methods
+    -------
+        add_pre_request:
+            Register a callback run before each request
+
+        add_post_request:
+            Register a callback run after each request
+
+        remove:
+            Unregister a callback
+
+        request:
+            Send a request through a session and run the callbacks
+    """
+
+    def __init__(self):
+        self.pre_request = []
+        self.post_request = []
+
+    def add_pre_request(self, callback):
+        """Register a callback run with the RequestInfo before each request"""
+        self.pre_request.append(callback)
+        return callback
+
+    def add_post_request(self, callback):
+        """Register a callback run with the completed RequestInfo after each request"""
+        self.post_request.append(callback)
+        return callback
+
+    def remove(self, callback):
+        """Unregister a pre or post request callback"""
+        for callbacks in (self.pre_request, self.post_request):
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def request(self, endpoint, session, method, url, **kwargs):
+        """Send a request through a session and run the callbacks
+
+        Parameters
+        ----------
+            endpoint:
+                ESP path reported in RequestInfo
+            session:
+                requests.Session to send the request with
+            method:
+                HTTP method
+            url:
+                Full url of the request
+            kwargs:
+                Other session.request arguments
+
+        Returns
+        -------
+            response:
+                The response from session.request
+        """
+        info = RequestInfo(endpoint, method, url, started=time.time())
+        self._run(self.pre_request, info)
+        start = time.perf_counter()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except Exception as e:
+            info.total = time.perf_counter() - start
+            info.error = type(e).__name__
+            self._run(self.post_request, info)
+            raise
+        info.total = time.perf_counter() - start
+        info.status = resp.status_code
+        info.bytes_in = len(resp.content or b"")
+        info.bytes_out = _body_size(resp.request)
+        elapsed = getattr(resp, "elapsed", None)
+        if elapsed is not None:
+            info.server = elapsed.total_seconds()
+            info.download = max(info.total - info.server, 0.0)
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        info.retries = len(getattr(retries, "history", None) or ())
+        self._run(self.post_request, info)
+        return resp
+
+    @staticmethod
+    def _run(callbacks, info):
+        for callback in list(callbacks):
+            try:
+                callback(info)
+            except Exception:
+                log.warning(
+                    "Instrumentation callback %r failed", callback, exc_info=True
+                )
+
+
+def instrumented_request(instrumentation, endpoint, session, method, url, **kwargs):
+    """
+    Send a request, through instrumentation if one is given
+
+    Parameters
+    ----------
+    instrumentation : Instrumentation
+        The callbacks to run, or None to send the request directly
+    endpoint : str
+        ESP path reported in RequestInfo
+    session : requests.Session
+        Session to send the request with
+    method : str
+        HTTP method
+    url : str
+        Full url of the request
+    kwargs :
+        Other session.request arguments
+
+    Returns
+    -------
+    Response
+        The response from session.request
+    """
+    if instrumentation is None:
+        return session.request(method, url, **kwargs)
+    return instrumentation.request(endpoint, session, method, url, **kwargs)
+
+
+class HistogramAggregator(object):
+    """
+    Post request callback that keeps a latency histogram per endpoint
+
+    Latencies are counted in fixed buckets, so memory does not grow with the
+    number of requests and percentiles are the upper bound of their bucket.
+
+    Attributes
+    ----------
+        buckets:
+            Ascending upper bounds of the buckets in seconds. Latencies above
+            the last bound are counted in an overflow bucket
+
+    Methods
+    -------
+        summary:
+            Per endpoint counts, percentiles and totals
+
+        reset:
+            Clear the histograms
+    """
+
+    def __init__(self, buckets=conf.HISTOGRAM_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def __call__(self, info: RequestInfo):
+        with self._lock:
+            stats = self._endpoints.get(info.endpoint)
+            if stats is None:
+                stats = self._endpoints[info.endpoint] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "count": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                }
+            stats["counts"][bisect.bisect_left(self.buckets, info.total)] += 1
+            stats["count"] += 1
+            stats["errors"] += info.error is not None or (info.status or 0) >= 400
+            stats["retries"] += info.retries
+            stats["total_seconds"] += info.total
+            stats["max_seconds"] = max(stats["max_seconds"], info.total)
+            stats["bytes_in"] += info.bytes_in
+            stats["bytes_out"] += info.bytes_out
+
+    def summary(self):
+        """Per endpoint counts, percentiles and totals
+
+        Returns
+        -------
+            summary: dict
+                endpoint to count, errors, retries, total_seconds, mean, p50,
+                p95, p99, max_seconds, bytes_in and bytes_out, ordered by
+                total_seconds so the endpoints that dominate latency come first
+        """
+        with self._lock:
+            endpoints = {
+                endpoint: dict(stats, counts=list(stats["counts"]))
+                for endpoint, stats in self._endpoints.items()
+            }
+        summary = {}
+        for endpoint, stats in sorted(
+            endpoints.items(), key=lambda item: item[1]["total_seconds"], reverse=True
+        ):
+            counts = stats.pop("counts")
+            stats["mean"] = stats["total_seconds"] / stats["count"]
+            for pct in (50, 95, 99):
+                stats[f"p{pct}"] = self._percentile(counts, pct, stats["max_seconds"])
+            summary[endpoint] = stats
+        return summary
+
+    def reset(self):
+        """Clear the histograms"""
+        with self._lock:
+            self._endpoints.clear()
+
+    def _percentile(self, counts, pct, max_seconds):
+        rank = pct / 100 * sum(counts)
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                if index == len(self.buckets):
+                    return max_seconds
+                return min(self.buckets[index], max_seconds)
+        return max_seconds
+
+
+class RequestLogSampler(object):
+    """
+    Post request callback that logs a sample of requests as JSON lines
+
+    Failed requests are always logged, successful ones with probability rate.
+    Each record is one JSON object of the RequestInfo fields, without request
+    bodies, so it can be parsed by log pipelines.
+
+    Attributes
+    ----------
+        rate:
+            Fraction of successful requests logged, between 0 and 1
+        logger:
+            Logger the records are written to. Defaults to pyhpcc.requests
+        level:
+            Level of the records
+        log_errors:
+            Log every failed request regardless of rate
+    """
+
+    def __init__(
+        self,
+        rate=conf.REQUEST_LOG_SAMPLE_RATE,
+        logger=None,
+        level=logging.INFO,
+        log_errors=True,
+    ):
+        self.rate = rate
+        self.logger = logger or logging.getLogger("pyhpcc.requests")
+        self.level = level
+        self.log_errors = log_errors
+
+    def __call__(self, info: RequestInfo):
+        failed = info.error is not None or (info.status or 0) >= 400
+        if not (failed and self.log_errors) and random.random() >= self.rate:
+            return
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s", json.dumps(asdict(info)))
+
+
+def _body_size(request):
+    if request is None:
+        return 0
+    length = request.headers.get("Content-Length")
+    if length is not None:
+        return int(length)
+    body = request.body
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return 0
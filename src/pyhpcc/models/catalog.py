@@ -0,0 +1,276 @@
+import logging
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyhpcc.config as conf
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import DFUQueryResponse
+
+log = logging.getLogger(__name__)
+
+
+def scope_pattern(scope):
+    """
+    LogicalName pattern matching every file under a scope
+
+    Parameters
+    ----------
+    scope : str
+        The scope, e.g. "thor::sales". Patterns containing * are returned as is
+
+    Returns
+    -------
+    str
+        The pattern, e.g. "thor::sales::*"
+    """
+    if "*" in scope:
+        return scope
+    return "%s::*" % scope.rstrip(":")
+
+
+class DFUCatalog(object):
+    """
+    Enumerates the logical files of the DFU catalog, fetching DFUQuery pages in parallel
+
+    Files are sorted by name so pages are stable while the catalog is walked.
+    ESP counts at most max_files files per query, so large catalogs should be
+    enumerated in shards, one LogicalName pattern per scope. A shard with more
+    files raises instead of returning part of the catalog. Shards must not
+    overlap or their files are returned more than once.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        page_size:
+            Number of files fetched per DFUQuery call
+        max_workers:
+            Number of pages fetched in parallel
+        prefetch:
+            Number of pages fetched ahead of the consumer on top of max_workers
+        max_files:
+            MaxNumberOfFiles of each query
+        sort_by:
+            DFUQuery Sortby field
+        scan_factor:
+            Files lookup may read per name of a scope before it queries the
+            names of the scope one by one
+        filters:
+            Other DFUQuery parameters applied to every query, e.g. NodeGroup
+
+    Methods
+    -------
+        fetch_page:
+            Fetch one page of files
+
+        iter_pages:
+            Get the catalog in pages
+
+        iter_files:
+            Get the files of the catalog
+
+        lookup:
+            Get the metadata of many logical files
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        page_size=conf.DEFAULT_CATALOG_PAGE_SIZE,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        prefetch=2,
+        max_files=conf.CATALOG_MAX_FILES,
+        sort_by="Name",
+        scan_factor=conf.CATALOG_LOOKUP_SCAN_FACTOR,
+        **filters,
+    ):
+        self.hpcc = hpcc
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self.max_files = max_files
+        self.sort_by = sort_by
+        self.scan_factor = scan_factor
+        self.filters = filters
+
+    def fetch_page(self, start, logical_name=None):
+        """Fetch one page of files
+
+        Parameters
+        ----------
+            start:
+                Index of the first file
+            logical_name:
+                LogicalName pattern of the files, None for every file
+
+        Returns
+        -------
+            page: DFUQueryResponse
+                The files of the page and the number of matching files
+        """
+        params = dict(self.filters)
+        if logical_name is not None:
+            params["LogicalName"] = logical_name
+        resp = self.hpcc.dfu_query(
+            PageStartFrom=start,
+            PageSize=self.page_size,
+            Sortby=self.sort_by,
+            MaxNumberOfFiles=self.max_files,
+            **params,
+        )
+        return DFUQueryResponse.from_response(resp)
+
+    def iter_pages(self, scopes=None):
+        """Get the catalog in pages
+
+        The first page of every shard is fetched first to learn its file
+        count, then the remaining pages are fetched by max_workers threads, at
+        most max_workers + prefetch pages ahead of the consumer. The pages of a
+        shard are yielded in order.
+
+        Parameters
+        ----------
+            scopes:
+                Scopes or LogicalName patterns to shard the catalog by. None
+                enumerates the catalog in one query
+
+        Returns
+        -------
+            Generator of DFUQueryResponse for each page
+
+        Raises
+        ------
+            HPCCException:
+                If a shard matches more than max_files files, as ESP would
+                return only part of it
+        """
+        patterns = [None] if scopes is None else [scope_pattern(s) for s in scopes]
+        todo = deque((pattern, 0) for pattern in patterns)
+        pending = deque()
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-catalog"
+        )
+        try:
+            while todo or pending:
+                while todo and len(pending) < self.max_workers + self.prefetch:
+                    pattern, start = todo.popleft()
+                    future = executor.submit(self.fetch_page, start, pattern)
+                    pending.append((pattern, start, future))
+                pattern, start, future = pending.popleft()
+                page = future.result()
+                if start == 0:
+                    if page.is_subset:
+                        raise HPCCException(
+                            "%s matches more than %d files, shard it into smaller"
+                            " scopes or raise max_files"
+                            % (pattern or "The catalog", self.max_files)
+                        )
+                    todo.extend(
+                        (pattern, page_start)
+                        for page_start in range(
+                            self.page_size, page.num_files, self.page_size
+                        )
+                    )
+                if page.files:
+                    yield page
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_files(self, scopes=None):
+        """Get the files of the catalog
+
+        Parameters
+        ----------
+            scopes:
+                Scopes or LogicalName patterns to shard the catalog by. None
+                enumerates the catalog in one query
+
+        Returns
+        -------
+            Generator of DFULogicalFile
+        """
+        for page in self.iter_pages(scopes):
+            yield from page.files
+
+    def lookup(self, logical_names):
+        """Get the metadata of many logical files
+
+        Names are grouped by scope. A scope holding one of the names is
+        queried by that name, a scope holding several is listed with one
+        LogicalName pattern, unless it has more than scan_factor files per
+        name or more than max_files files, then its names are queried one by
+        one. Queries run on max_workers threads and files are matched to the
+        names through a dictionary keyed by lowercase name, as logical names
+        are case insensitive.
+
+        Parameters
+        ----------
+            logical_names:
+                The logical file names, with or without a leading ~
+
+        Returns
+        -------
+            files: dict
+                Each name to its DFULogicalFile, None if the file does not exist
+        """
+        wanted = defaultdict(list)
+        scopes = defaultdict(set)
+        for name in logical_names:
+            key = name.lstrip("~").lower()
+            wanted[key].append(name)
+            scope, _, _ = key.rpartition("::")
+            scopes[scope].add(key)
+        # LogicalName of each first query to the names it looks up
+        queries = {}
+        for scope, keys in scopes.items():
+            if scope and len(keys) > 1:
+                queries[scope_pattern(scope)] = keys
+            else:
+                queries.update((key, {key}) for key in keys)
+        found = {}
+
+        def collect(page):
+            for file in page.files:
+                key = (file.name or "").lower()
+                if key in wanted:
+                    found[key] = file
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-catalog"
+        )
+        try:
+            first = {
+                logical_name: executor.submit(self.fetch_page, 0, logical_name)
+                for logical_name in queries
+            }
+            rest = []
+            for logical_name, future in first.items():
+                page = future.result()
+                collect(page)
+                keys = queries[logical_name]
+                if keys == {logical_name}:
+                    continue
+                if page.is_subset or page.num_files > max(
+                    self.page_size, self.scan_factor * len(keys)
+                ):
+                    # The listing is capped at max_files or too large to scan
+                    rest.extend(
+                        executor.submit(self.fetch_page, 0, key)
+                        for key in keys
+                        if key not in found
+                    )
+                else:
+                    rest.extend(
+                        executor.submit(self.fetch_page, start, logical_name)
+                        for start in range(
+                            self.page_size, page.num_files, self.page_size
+                        )
+                    )
+            for future in rest:
+                collect(future.result())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return {name: found.get(key) for key, names in wanted.items() for name in names}
@@ -0,0 +1,357 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pyhpcc.config as conf
+from pyhpcc.models.catalog import DFUCatalog
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import DFULogicalFile
+
+log = logging.getLogger(__name__)
+
+_FIELDS = (
+    "name",
+    "node_group",
+    "total_size",
+    "record_count",
+    "is_superfile",
+    "content_type",
+    "modified",
+    "owner",
+    "record_count_text",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY COLLATE NOCASE,
+    node_group TEXT,
+    total_size INTEGER,
+    record_count INTEGER,
+    is_superfile INTEGER,
+    content_type TEXT,
+    modified TEXT,
+    owner TEXT,
+    generation INTEGER,
+    record_count_text TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+
+class CatalogSnapshot(object):
+    """
+    Local SQLite index of the DFU catalog answering file lookups without ESP calls
+
+    The snapshot is filled by a full sync of the catalog and kept current by
+    incremental syncs of the files modified since the last one. A lookup on a
+    snapshot older than max_age starts a sync in a background thread and is
+    answered from the current snapshot, so answers are about max_age seconds
+    stale plus the time of a sync. Only the first sync blocks lookups. The
+    catalog is walked without holding the database lock, each page is
+    written on its own.
+
+    ESP reports Modified in the server's local time, so incremental syncs
+    start overlap seconds before the newest Modified already read. They do
+    not see deleted files, those are dropped by the full sync run every
+    full_sync_interval seconds.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        path:
+            SQLite database file. Defaults to an in-memory database
+        max_age:
+            Seconds after a sync before lookups sync again
+        full_sync_interval:
+            Seconds after a full sync before the next sync is a full one
+        overlap:
+            Seconds before the newest Modified read that incremental syncs
+            start at
+        background_sync:
+            Sync stale snapshots in a background thread. If False, stale
+            lookups wait for the sync
+        scopes:
+            Scopes to shard the catalog by, see DFUCatalog
+        catalog_options:
+            Other DFUCatalog arguments, e.g. page_size or max_workers
+
+    Methods
+    -------
+        sync:
+            Update the snapshot from the catalog
+
+        refresh_if_stale:
+            Sync if the snapshot is older than max_age
+
+        get:
+            Get a file of the snapshot
+
+        exists:
+            Check if a file is in the snapshot
+
+        get_many:
+            Get many files of the snapshot
+
+        age:
+            Seconds since the last sync
+
+        close:
+            Close the database
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        path=":memory:",
+        max_age=conf.CATALOG_SNAPSHOT_MAX_AGE,
+        full_sync_interval=conf.CATALOG_FULL_SYNC_INTERVAL,
+        scopes=None,
+        overlap=conf.CATALOG_SYNC_OVERLAP,
+        background_sync=True,
+        **catalog_options,
+    ):
+        self.hpcc = hpcc
+        self.path = path
+        self.max_age = max_age
+        self.full_sync_interval = full_sync_interval
+        self.scopes = scopes
+        self.overlap = overlap
+        self.background_sync = background_sync
+        self.catalog_options = catalog_options
+        # _lock guards the database, _sync_lock lets one sync run at a time
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        _migrate(self._db)
+
+    def sync(self, full=None):
+        """Update the snapshot from the catalog
+
+        Parameters
+        ----------
+            full:
+                True for a full sync, False for an incremental one. None runs
+                a full sync if there was none in the last full_sync_interval
+                seconds
+
+        Returns
+        -------
+            count: int
+                Number of files read from the catalog
+        """
+        with self._sync_lock:
+            return self._sync(full)
+
+    def age(self):
+        """Seconds since the last sync, None if the snapshot was never synced"""
+        with self._lock:
+            last_sync = self._get_meta("last_sync")
+        return None if last_sync is None else time.time() - last_sync
+
+    def refresh_if_stale(self, wait=None):
+        """Sync if the snapshot is older than max_age
+
+        Parameters
+        ----------
+            wait:
+                Wait for the sync to finish. Defaults to not background_sync.
+                A snapshot that was never synced is always waited for
+        """
+        age = self.age()
+        if age is not None and age <= self.max_age:
+            return
+        if wait is None:
+            wait = not self.background_sync
+        if age is None or wait:
+            with self._sync_lock:
+                age = self.age()
+                if age is None or age > self.max_age:
+                    self._sync()
+        elif self._sync_lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._background_sync,
+                name="pyhpcc-catalog-sync",
+                daemon=True,
+            ).start()
+
+    def get(self, logical_name):
+        """Get a file of the snapshot
+
+        Parameters
+        ----------
+            logical_name:
+                The logical file name, matched case insensitively
+
+        Returns
+        -------
+            file: DFULogicalFile
+                The file, None if it is not in the catalog
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT %s FROM files WHERE name = ?" % ", ".join(_FIELDS),
+                (logical_name.lstrip("~"),),
+            ).fetchone()
+        if row is None:
+            return None
+        return _to_file(row)
+
+    def exists(self, logical_name):
+        """Check if a file is in the snapshot
+
+        Parameters
+        ----------
+            logical_name:
+                The logical file name, matched case insensitively
+
+        Returns
+        -------
+            exists: bool
+                True if the file is in the catalog
+        """
+        return self.get(logical_name) is not None
+
+    def get_many(self, logical_names):
+        """Get many files of the snapshot
+
+        Parameters
+        ----------
+            logical_names:
+                The logical file names, matched case insensitively
+
+        Returns
+        -------
+            files: dict
+                Each name to its DFULogicalFile, None if it is not in the catalog
+        """
+        self.refresh_if_stale()
+        names = list(logical_names)
+        keys = sorted({name.lstrip("~").lower() for name in names})
+        found = {}
+        with self._lock:
+            # Stay under SQLite's limit on the number of query parameters
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                rows = self._db.execute(
+                    "SELECT %s FROM files WHERE name IN (%s)"
+                    % (", ".join(_FIELDS), ", ".join("?" * len(chunk))),
+                    chunk,
+                )
+                for row in rows:
+                    found[row[0].lower()] = _to_file(row)
+        return {name: found.get(name.lstrip("~").lower()) for name in names}
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def _background_sync(self):
+        # Runs with _sync_lock acquired by refresh_if_stale
+        try:
+            self._sync()
+        except Exception:
+            log.warning("Background catalog sync failed", exc_info=True)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, full=None):
+        started = time.time()
+        with self._lock:
+            last_modified = self._get_meta("last_modified")
+            last_full = self._get_meta("last_full_sync")
+            generation = (self._get_meta("generation") or 0) + 1
+        filters = dict(self.catalog_options)
+        start_date = _esp_date(last_modified, self.overlap)
+        if full is None:
+            full = last_full is None or started - last_full > self.full_sync_interval
+        # Without a Modified to start from only a full sync is possible
+        full = full or start_date is None
+        if not full:
+            filters["StartDate"] = start_date
+        count = 0
+        catalog = DFUCatalog(self.hpcc, **filters)
+        # The catalog is walked without the database lock, so lookups are
+        # answered from the current snapshot meanwhile
+        for page in catalog.iter_pages(self.scopes):
+            rows = [_to_row(f, generation) for f in page.files]
+            with self._lock, self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            count += len(rows)
+            modified = max((f.modified or "" for f in page.files), default="")
+            if modified > (last_modified or ""):
+                last_modified = modified
+        with self._lock, self._db:
+            if full:
+                deleted = self._db.execute(
+                    "DELETE FROM files WHERE generation < ?", (generation,)
+                ).rowcount
+                log.debug("Full catalog sync dropped %d deleted files", deleted)
+                self._set_meta("last_full_sync", started)
+            self._set_meta("generation", generation)
+            self._set_meta("last_sync", started)
+            self._set_meta("last_modified", last_modified or "")
+        log.debug(
+            "%s catalog sync read %d files in %.2fs",
+            "Full" if full else "Incremental",
+            count,
+            time.time() - started,
+        )
+        return count
+
+    def _get_meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        row = row.fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+
+def _migrate(db):
+    columns = {row[1] for row in db.execute("PRAGMA table_info(files)")}
+    if "record_count_text" not in columns:
+        # Files read before the column existed lack it until the next full sync
+        with db:
+            db.execute("ALTER TABLE files ADD COLUMN record_count_text TEXT")
+            db.execute("DELETE FROM meta WHERE key IN ('last_sync', 'last_full_sync')")
+
+
+def _to_row(file: DFULogicalFile, generation):
+    return (
+        file.name,
+        file.node_group,
+        file.total_size,
+        file.record_count,
+        int(file.is_superfile),
+        file.content_type,
+        file.modified,
+        file.owner,
+        generation,
+        file.record_count_text,
+    )
+
+
+def _to_file(row):
+    return DFULogicalFile(*row[:4], bool(row[4]), *row[5:])
+
+
+def _esp_date(modified, overlap):
+    # DFUQuery returns Modified as "2024-01-01 12:00:00" in the server's local
+    # time and takes StartDate as "2024-01-01T12:00:00Z"
+    if not modified:
+        return None
+    try:
+        start = datetime.fromisoformat(modified) - timedelta(seconds=overlap)
+    except ValueError:
+        log.warning("Unexpected Modified %r, running a full sync", modified)
+        return None
+    return start.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,262 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pyhpcc.config as conf
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+log = logging.getLogger(__name__)
+
+
+class CompileWorkerPool(object):
+    """
+    Pool of eclcc workers that keep their --metacache directories warm
+
+    eclcc has no server mode, so every compile is still a new process. What
+    the pool keeps warm is the metadata cache: every worker has its own
+    --metacache directory per set of -I include paths, so no two compiles
+    write to the same cache at once. A job goes to the least loaded worker
+    whose cache for its include paths is warm, i.e. has had a successful
+    compile; a marker file records this so a kept cache_root stays warm
+    across runs. If every warm worker is busy
+    and another worker is idle, the idle one takes the job and warms its own
+    cache, so compiles of one repository run in parallel instead of queueing
+    behind one worker.
+
+    Attributes
+    ----------
+        workunit_submit:
+            WorkunitSubmit object used to compile
+        workers:
+            Number of workers
+        cache_root:
+            Directory holding the metadata caches. A temporary directory that is
+            removed on close is used if None; pass a directory to keep the caches
+            warm across runs
+        compiler:
+            The eclcc executable
+
+    Methods
+    -------
+        submit:
+            Queue a compile and return a Future
+
+        compile:
+            Compile and wait for the result
+
+        route:
+            Get the worker a set of options would be routed to now
+
+        cache_dir:
+            Get the metadata cache directory of a worker for a set of options
+
+        stats:
+            Number of compiles run by each worker
+
+        close:
+            Stop the workers
+    """
+
+    def __init__(
+        self,
+        workunit_submit: WorkunitSubmit,
+        workers=conf.DEFAULT_COMPILE_WORKERS,
+        cache_root=None,
+        compiler=conf.ECLCC,
+    ):
+        if workers < 1:
+            raise ValueError("At least one worker is required")
+        self.workunit_submit = workunit_submit
+        self.workers = workers
+        self.compiler = compiler
+        self._owns_cache_root = cache_root is None
+        if cache_root is None:
+            cache_root = tempfile.mkdtemp(prefix=conf.WORKSPACE_PREFIX + "metacache-")
+        self.cache_root = cache_root
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pyhpcc-eclcc-{i}")
+            for i in range(workers)
+        ]
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._loads = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def repo_key(options: dict):
+        """Get the hash identifying the include paths of a set of options
+
+        Parameters
+        ----------
+            options:
+                dictionary of eclcc compiler options
+
+        Returns
+        -------
+            key: str
+                sha1 hex digest of the -I option
+        """
+        include = str(options.get(conf.INCLUDE_OPTION, ""))
+        return hashlib.sha1(include.encode("utf-8")).hexdigest()
+
+    def route(self, options: dict):
+        """Get the worker a set of options would be routed to now
+
+        Parameters
+        ----------
+            options:
+                dictionary of eclcc compiler options
+
+        Returns
+        -------
+            worker: int
+                Index of the worker
+        """
+        with self._lock:
+            return self._route(self.repo_key(options))
+
+    def cache_dir(self, options: dict, worker: int):
+        """Get the metadata cache directory of a worker for a set of options
+
+        Parameters
+        ----------
+            options:
+                dictionary of eclcc compiler options
+            worker:
+                Index of the worker
+
+        Returns
+        -------
+            path: str
+                The --metacache directory of the worker for the include paths
+        """
+        path = self._cache_path(self.repo_key(options), worker)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def submit(self, file_name, options: dict = None):
+        """Queue a compile
+
+        Parameters
+        ----------
+            file_name:
+                The name of the ecl file
+            options:
+                dictionary of eclcc compiler options. --metacache is set to the
+                cache directory of the worker unless it is already given
+
+        Returns
+        -------
+            future: concurrent.futures.Future
+                Resolves to the output and output_file of bash_compile
+        """
+        if options is None:
+            options = conf.DEFAULT_COMPILE_OPTIONS
+        options = dict(options)
+        with self._lock:
+            worker = self._route(self.repo_key(options))
+            self._counts[worker] += 1
+            self._loads[worker] += 1
+        cache_dir = self.cache_dir(options, worker)
+        options.setdefault(conf.METACACHE_OPTION, cache_dir)
+        # Only a compile into the worker's own cache can warm it
+        own_cache = options[conf.METACACHE_OPTION] == cache_dir
+        log.debug("Routing %s to eclcc worker %s", file_name, worker)
+        future = self._executors[worker].submit(
+            self._compile, file_name, options, cache_dir if own_cache else None
+        )
+        future.add_done_callback(lambda _: self._done(worker))
+        return future
+
+    def compile(self, file_name, options: dict = None):
+        """Compile and wait for the result
+
+        Parameters
+        ----------
+            file_name:
+                The name of the ecl file
+            options:
+                dictionary of eclcc compiler options
+
+        Returns
+        -------
+            output:
+                The output from the bash command
+            output_file:
+                The name of the compiled ecl file - filename.eclxml
+        """
+        return self.submit(file_name, options).result()
+
+    def stats(self):
+        """Number of compiles submitted to each worker
+
+        Returns
+        -------
+            stats: dict
+                worker index to number of compiles
+        """
+        with self._lock:
+            return {worker: self._counts[worker] for worker in range(self.workers)}
+
+    def _route(self, key):
+        # Workers are tried from the one the include paths hash to, so an idle
+        # pool sends every set of include paths to the same worker
+        home = int(key[:8], 16) % self.workers
+        order = [(home + i) % self.workers for i in range(self.workers)]
+        warm = [w for w in order if os.path.exists(self._marker_path(key, w))]
+        idle = [w for w in order if self._loads[w] == 0]
+        if warm:
+            best = min(warm, key=lambda w: self._loads[w])
+            if self._loads[best] == 0 or not idle:
+                return best
+            return idle[0]
+        return min(order, key=lambda w: self._loads[w])
+
+    def _cache_path(self, key, worker):
+        return os.path.join(self.cache_root, key[:16], str(worker))
+
+    def _marker_path(self, key, worker):
+        return os.path.join(self._cache_path(key, worker), conf.COMPILE_WARM_MARKER)
+
+    def _compile(self, file_name, options, cache_dir):
+        # The marker is written before the future resolves, so a job submitted
+        # after the result is seen finds the cache warm
+        output, output_file = self.workunit_submit.bash_compile(
+            file_name, options, self.compiler
+        )
+        if cache_dir is not None and output.get("status") == "success":
+            try:
+                open(os.path.join(cache_dir, conf.COMPILE_WARM_MARKER), "a").close()
+            except OSError as e:
+                log.warning("Could not mark metacache %s as warm: %s", cache_dir, e)
+        return output, output_file
+
+    def _done(self, worker):
+        with self._lock:
+            self._loads[worker] -= 1
+
+    def close(self, remove_cache=None):
+        """Stop the workers after the queued compiles finish
+
+        Parameters
+        ----------
+            remove_cache:
+                Remove the cache directories. Defaults to True only if the pool
+                created its own temporary cache_root
+        """
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        if remove_cache is None:
+            remove_cache = self._owns_cache_root
+        if remove_cache:
+            shutil.rmtree(self.cache_root, ignore_errors=True)
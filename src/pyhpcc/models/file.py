@@ -1,5 +1,7 @@
 from pyhpcc import utils
+from pyhpcc.decoder import decode_response
 from pyhpcc.models.hpcc import HPCC
+from pyhpcc.tracing import get_tracer
 
 
 class ReadFileInfo(object):
@@ -16,6 +18,9 @@ class ReadFileInfo(object):
             The csv seperator for reading the file. Defaults to ','
         infer_header:
             bool varialbe if the header to be inferred from csv file
+        snapshot:
+            Optional CatalogSnapshot answering file existence and type checks
+            locally instead of with a DFUQuery
 
     Methods
     -------
@@ -44,6 +49,7 @@ class ReadFileInfo(object):
         logical_file_name,
         infer_header=True,
         csv_separator_for_read=",",
+        snapshot=None,
     ):
         """Constructor for the ReadFileInfo class"""
 
@@ -59,6 +65,7 @@ class ReadFileInfo(object):
         self.csv_separator_for_read = csv_separator_for_read
         self.read_status = "Not read"
         self.infer_header = infer_header
+        self.snapshot = snapshot
 
     def check_if_file_exists_and_is_super_file(self, cluster_from_user):
         """Function to check if the file exists and is a superfile
@@ -70,9 +77,15 @@ class ReadFileInfo(object):
         """
 
         self.check_status = True
-        file_search = self.hpcc.file_query(
-            LogicalName=self.logical_file_name,
-            LogicalFileSearchType="Logical Files and Superfiles",
+        if self.snapshot is not None:
+            self._check_in_snapshot(cluster_from_user)
+            return
+        # Decode once, both helpers below read the same response
+        file_search = decode_response(
+            self.hpcc.file_query(
+                LogicalName=self.logical_file_name,
+                LogicalFileSearchType="Logical Files and Superfiles",
+            )
         )
         self.if_exists = utils.get_file_status(file_search)
         if self.if_exists != 0 and self.if_exists != "0":
@@ -86,7 +99,7 @@ class ReadFileInfo(object):
                 arrFESF["isSuperfile"] if "isSuperfile" in arrFESF else False
             )
             self.actual_file_size = (
-                int(arrFESF["Totalsize"].replace(",", ""))
+                utils.to_int(arrFESF["Totalsize"])
                 if arrFESF["Totalsize"] is not None
                 else ""
             )
@@ -96,14 +109,7 @@ class ReadFileInfo(object):
                 else self.file_type
             )
             if bool(arrFESF):
-                if arrFESF["RecordCount"] != "":
-                    self.record_count = (
-                        9223372036854775807
-                        if arrFESF["RecordCount"] is None
-                        else int(arrFESF["RecordCount"].replace(",", ""))
-                    )
-                else:
-                    self.record_count = -2
+                self.record_count = _record_count(arrFESF["RecordCount"])
         else:
             self.file_type = ""
             self.if_superfile = False
@@ -112,6 +118,29 @@ class ReadFileInfo(object):
             self.cluster = ""
             self.read_status = "File doesn't exist"
 
+    def _check_in_snapshot(self, cluster_from_user):
+        file = self.snapshot.get(self.logical_file_name)
+        if file is None:
+            self.if_exists = 0
+            self.file_type = ""
+            self.if_superfile = False
+            self.actual_file_size = None
+            self.record_count = None
+            self.cluster = ""
+            self.read_status = "File doesn't exist"
+            return
+        # NumFiles of a DFUQuery by the exact name of an existing file
+        self.if_exists = 1
+        self.cluster = (
+            file.node_group if file.node_group is not None else cluster_from_user
+        )
+        self.if_superfile = file.is_superfile
+        self.actual_file_size = "" if file.total_size is None else file.total_size
+        self.file_type = (
+            file.content_type if file.content_type is not None else self.file_type
+        )
+        self.record_count = _record_count(file.record_count_text)
+
     def set_file_name(self, file_name):
         """Function to set the logical file name and check if the file exists and is a superfile
 
@@ -155,6 +184,8 @@ class ReadFileInfo(object):
             dfuFileStatus:
                 A boolean to determine if the file exists in the DFU queue
         """
+        if self.snapshot is not None:
+            return self.snapshot.exists(self.logical_file_name)
         status_details = self.hpcc.check_file_exists(LogicalName=self.logical_file_name)
         return utils.check_file_existence(status_details, self.logical_file_name)
 
@@ -210,52 +241,86 @@ class ReadFileInfo(object):
             data: pd.DataFrame
                 The data from the file
         """
-        MAX_ITEMS = 9223372036854775807
-        self.check_if_file_exists_and_is_super_file(self.cluster)
-        file_name = self.logical_file_name
-        file_attributes: dict = {
-            "record_count": self.record_count,
-            "cluster": self.cluster,
-            "if_exists": self.if_exists,
-            "file_type": self.file_type,
-        }
-        if file_attributes["if_exists"] != 0 and file_attributes["if_exists"] != "0":
-            csv_header = []
-            if file_attributes["file_type"] == "csv" and self.infer_header:
-                start_index = max(1, start_index)
-                header_response = self.hpcc.get_file_info(
-                    LogicalName=file_name,
-                    Cluster=file_attributes["cluster"],
-                    Start=0,
-                    Count=1,
-                )
-                csv_header = utils.get_csv_header(
-                    header_response, self.csv_separator_for_read
-                )
-            if items_size == -1:
-                items_size = MAX_ITEMS
-            end_index = start_index + items_size
-            while start_index < end_index:
-                curr_chunk_size = min(end_index - start_index, batch_size)
-                self.read_status = "Read"
-                resp = self.hpcc.get_file_info(
-                    LogicalName=file_name,
-                    Cluster=file_attributes["cluster"],
-                    Start=start_index,
-                    Count=curr_chunk_size,
-                )
-                if file_attributes["file_type"] == "flat":
-                    data_attr, df = utils.get_flat_data(resp)
-                else:
-                    data_attr, df = utils.get_csv_data(
-                        resp,
-                        self.csv_separator_for_read,
-                        self.infer_header,
-                        csv_header,
+        tracer = get_tracer()
+        # Not activated, the consumer runs between the yields
+        with tracer.start_span(
+            "pyhpcc.read",
+            {"pyhpcc.logical_name": self.logical_file_name},
+            activate=False,
+        ) as read_span:
+            MAX_ITEMS = 9223372036854775807
+            self.check_if_file_exists_and_is_super_file(self.cluster)
+            file_name = self.logical_file_name
+            file_attributes: dict = {
+                "record_count": self.record_count,
+                "cluster": self.cluster,
+                "if_exists": self.if_exists,
+                "file_type": self.file_type,
+            }
+            read_span.set_attributes(
+                {
+                    "pyhpcc.cluster": self.cluster,
+                    "pyhpcc.file_type": self.file_type,
+                }
+            )
+            if (
+                file_attributes["if_exists"] != 0
+                and file_attributes["if_exists"] != "0"
+            ):
+                csv_header = []
+                if file_attributes["file_type"] == "csv" and self.infer_header:
+                    start_index = max(1, start_index)
+                    header_response = self.hpcc.get_file_info(
+                        LogicalName=file_name,
+                        Cluster=file_attributes["cluster"],
+                        Start=0,
+                        Count=1,
                     )
-                if data_attr["count"] == 0:
-                    return
-                start_index = start_index + batch_size
-                yield data_attr, df
-        else:
-            raise FileNotFoundError("Logical File Not found")
+                    csv_header = utils.get_csv_header(
+                        header_response, self.csv_separator_for_read
+                    )
+                if items_size == -1:
+                    items_size = MAX_ITEMS
+                end_index = start_index + items_size
+                page = 0
+                while start_index < end_index:
+                    curr_chunk_size = min(end_index - start_index, batch_size)
+                    self.read_status = "Read"
+                    with tracer.start_span(
+                        "pyhpcc.read.page",
+                        {"pyhpcc.page": page, "pyhpcc.start": start_index},
+                        parent=read_span,
+                    ) as page_span:
+                        resp = self.hpcc.get_file_info(
+                            LogicalName=file_name,
+                            Cluster=file_attributes["cluster"],
+                            Start=start_index,
+                            Count=curr_chunk_size,
+                        )
+                        if file_attributes["file_type"] == "flat":
+                            data_attr, df = utils.get_flat_data(resp)
+                        else:
+                            data_attr, df = utils.get_csv_data(
+                                resp,
+                                self.csv_separator_for_read,
+                                self.infer_header,
+                                csv_header,
+                            )
+                        page_span.set_attribute("pyhpcc.rows", data_attr["count"])
+                    read_span.set_attribute("pyhpcc.pages", page + 1)
+                    if data_attr["count"] == 0:
+                        return
+                    page += 1
+                    start_index = start_index + batch_size
+                    yield data_attr, df
+            else:
+                raise FileNotFoundError("Logical File Not found")
+
+
+def _record_count(record_count):
+    # An empty RecordCount is unknown, a missing one is read without a limit
+    if record_count == "":
+        return -2
+    if record_count is None:
+        return 9223372036854775807
+    return utils.to_int(record_count)
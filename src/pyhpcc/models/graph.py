@@ -0,0 +1,438 @@
+import io
+import logging
+import multiprocessing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pyhpcc.config as conf
+from pyhpcc.decoder import decode_response
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.utils import parse_duration, to_int
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class GraphActivity(object):
+    """
+    An activity of a workunit graph with its timings
+
+    Attributes
+    ----------
+        id:
+            Activity id
+        subgraph_id:
+            Id of the subgraph running the activity
+        graph_name:
+            Name of the graph, e.g. graph1
+        kind:
+            Activity kind number
+        label:
+            Label shown in ECL Watch, e.g. "Join"
+        time_avg:
+            Average local execute seconds over the workers
+        time_max:
+            Maximum local execute seconds over the workers
+        time_min:
+            Minimum local execute seconds over the workers
+        skew_max:
+            Percent the slowest worker is above the average
+        skew_min:
+            Percent the fastest worker is below the average
+        rows_in:
+            Rows read from the input edges
+        rows_out:
+            Rows written to the output edges
+    """
+
+    id: str
+    subgraph_id: str = None
+    graph_name: str = None
+    kind: str = None
+    label: str = None
+    time_avg: float = None
+    time_max: float = None
+    time_min: float = None
+    skew_max: float = None
+    skew_min: float = None
+    rows_in: int = 0
+    rows_out: int = 0
+
+
+@dataclass(slots=True)
+class SubgraphTiming(object):
+    """
+    A subgraph of a workunit graph with its timings
+
+    Attributes
+    ----------
+        id:
+            Subgraph id
+        graph_name:
+            Name of the graph
+        time_avg:
+            Average local execute seconds over the workers
+        time_max:
+            Maximum local execute seconds over the workers
+        skew_max:
+            Percent the slowest worker is above the average
+        activities:
+            Number of activities in the subgraph
+    """
+
+    id: str
+    graph_name: str = None
+    time_avg: float = None
+    time_max: float = None
+    skew_max: float = None
+    activities: int = 0
+
+
+@dataclass(slots=True)
+class GraphAnalysis(object):
+    """
+    Timings, skew and row counts of the graphs of a workunit
+
+    Attributes
+    ----------
+        wuid:
+            Wuid of the workunit
+        subgraphs:
+            list of SubgraphTiming
+        activities:
+            list of GraphActivity
+    """
+
+    wuid: str = None
+    subgraphs: list = field(default_factory=list)
+    activities: list = field(default_factory=list)
+
+    def hot_activities(self, count=10):
+        """The activities with the highest maximum execute time
+
+        Parameters
+        ----------
+            count:
+                Number of activities returned
+
+        Returns
+        -------
+            activities: list
+                GraphActivity, slowest first
+        """
+        timed = [a for a in self.activities if a.time_max is not None]
+        return sorted(timed, key=lambda a: a.time_max, reverse=True)[:count]
+
+    def skewed_activities(self, threshold=conf.GRAPH_SKEW_THRESHOLD):
+        """The activities whose slowest worker is more than threshold percent above the average
+
+        Parameters
+        ----------
+            threshold:
+                Skew in percent
+
+        Returns
+        -------
+            activities: list
+                GraphActivity, most skewed first
+        """
+        skewed = [
+            a
+            for a in self.activities
+            if a.skew_max is not None and a.skew_max > threshold
+        ]
+        return sorted(skewed, key=lambda a: a.skew_max, reverse=True)
+
+
+def parse_graph(xml, graph_name=None, wuid=None):
+    """
+    Stream parse the xgmml of a workunit graph
+
+    The graph is read with iterparse. Every element is cleared and removed
+    from its parent once read, and only the attributes used are kept, so
+    memory grows with the number of activities rather than the size of the
+    xgmml.
+
+    Parameters
+    ----------
+    xml : str, bytes or file-like object
+        The Graph xgmml from WUGetGraph
+    graph_name : str
+        Name of the graph, stored on the subgraphs and activities
+    wuid : str
+        Wuid stored on the analysis
+
+    Returns
+    -------
+    GraphAnalysis
+        The subgraphs and activities of the graph
+    """
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+    if isinstance(xml, bytes):
+        xml = io.BytesIO(xml)
+    analysis = GraphAnalysis(wuid)
+    activities = {}
+    # (source, target, rows) of each edge
+    edges = []
+    # Open node and edge elements, innermost last, with their attributes
+    open_items = []
+    # Open elements, so each element is removed from its parent once read
+    parents = []
+    try:
+        for event, element in ET.iterparse(xml, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag in ("node", "edge"):
+                    open_items.append(
+                        {
+                            "tag": tag,
+                            "id": element.get("id"),
+                            "label": element.get("label"),
+                            "source": element.get("source"),
+                            "target": element.get("target"),
+                            "atts": {},
+                        }
+                    )
+                elif tag == "graph" and open_items:
+                    open_items[-1]["subgraph"] = True
+                parents.append(element)
+                continue
+            parents.pop()
+            if tag == "att":
+                name = element.get("name")
+                if name is not None and open_items:
+                    open_items[-1]["atts"][name] = element.get("value")
+            elif tag == "edge":
+                item = open_items.pop()
+                atts = item["atts"]
+                rows = to_int(atts.get("NumRowsProcessed", atts.get("count")))
+                if rows is not None:
+                    edges.append((item["source"], item["target"], rows))
+            elif tag == "node":
+                item = open_items.pop()
+                parent = _parent_subgraph(open_items)
+                if item.get("subgraph"):
+                    _add_subgraph(analysis, item, graph_name)
+                else:
+                    activity = _activity(item, parent, graph_name)
+                    activities[activity.id] = activity
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+    except ET.ParseError as e:
+        raise HPCCException("Could not parse graph %s: %s" % (graph_name, e))
+    for source, target, rows in edges:
+        if source in activities:
+            activities[source].rows_out += rows
+        if target in activities:
+            activities[target].rows_in += rows
+    analysis.activities = list(activities.values())
+    counts = {}
+    for activity in analysis.activities:
+        counts[activity.subgraph_id] = counts.get(activity.subgraph_id, 0) + 1
+    for subgraph in analysis.subgraphs:
+        subgraph.activities = counts.get(subgraph.id, 0)
+    return analysis
+
+
+def parse_graph_response(response, wuid=None):
+    """
+    Parse every graph of a WUGetGraph response
+
+    Parameters
+    ----------
+    response : Response or dict
+        The WUGetGraph response or its decoded body
+    wuid : str
+        Wuid stored on the analysis
+
+    Returns
+    -------
+    GraphAnalysis
+        The subgraphs and activities of all the graphs
+    """
+    return _parse_graphs(wuid, _graphs(response))
+
+
+class GraphAnalyzer(object):
+    """
+    Finds slow and skewed activities in the graphs of workunits
+
+    WUGetGraph calls are made by max_workers threads, then the graphs are
+    parsed by a pool of processes, so parsing many large graphs is not limited
+    to one core. The graphs of every workunit are held in memory between the
+    two steps, so very large batches should be split.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        max_workers:
+            Number of WUGetGraph calls made in parallel
+        processes:
+            Number of parser processes. None uses one per core, 0 parses in
+            the calling process
+
+    Methods
+    -------
+        fetch_graphs:
+            Get the graph xgmml of a workunit
+
+        analyze:
+            Analyze the graphs of a workunit
+
+        analyze_many:
+            Analyze the graphs of many workunits
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        processes=None,
+    ):
+        self.hpcc = hpcc
+        self.max_workers = max_workers
+        self.processes = processes
+
+    def fetch_graphs(self, wuid, graph_name=None):
+        """Get the graph xgmml of a workunit
+
+        Parameters
+        ----------
+            wuid:
+                Wuid of the workunit
+            graph_name:
+                Name of one graph, None for every graph
+
+        Returns
+        -------
+            graphs: list
+                (graph name, xgmml) of each graph
+        """
+        return _graphs(self.hpcc.get_graph(Wuid=wuid, GraphName=graph_name))
+
+    def analyze(self, wuid, graph_name=None):
+        """Analyze the graphs of a workunit in the calling process
+
+        Parameters
+        ----------
+            wuid:
+                Wuid of the workunit
+            graph_name:
+                Name of one graph, None for every graph
+
+        Returns
+        -------
+            analysis: GraphAnalysis
+                The subgraphs and activities of the graphs
+        """
+        return _parse_graphs(wuid, self.fetch_graphs(wuid, graph_name))
+
+    def analyze_many(self, wuids):
+        """Analyze the graphs of many workunits
+
+        Parameters
+        ----------
+            wuids:
+                Wuids of the workunits
+
+        Returns
+        -------
+            analyses: dict
+                Each wuid to its GraphAnalysis
+        """
+        wuids = list(wuids)
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-graph"
+        ) as fetch_pool:
+            graphs = list(fetch_pool.map(self.fetch_graphs, wuids))
+        if self.processes == 0:
+            parsed = map(_parse_graphs, wuids, graphs)
+        else:
+            # Spawned parsers do not inherit locks held by other threads of
+            # this process, as forked ones could
+            with ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as parse_pool:
+                parsed = list(parse_pool.map(_parse_graphs, wuids, graphs))
+        return dict(zip(wuids, parsed))
+
+
+def _parse_graphs(wuid, graphs):
+    analysis = GraphAnalysis(wuid)
+    for name, xml in graphs:
+        graph = parse_graph(xml, name, wuid)
+        analysis.subgraphs.extend(graph.subgraphs)
+        analysis.activities.extend(graph.activities)
+    return analysis
+
+
+def _graphs(response):
+    body = decode_response(response)
+    if "Exceptions" in body:
+        messages = [
+            e.get("Message", "") for e in body["Exceptions"].get("Exception", [])
+        ]
+        raise HPCCException(",".join(messages))
+    graphs = body.get("WUGetGraphResponse", {}).get("Graphs", {})
+    graphs = graphs.get("ECLGraphEx", []) if isinstance(graphs, dict) else []
+    return [(g.get("Name"), g.get("Graph")) for g in graphs if g.get("Graph")]
+
+
+def _parent_subgraph(open_items):
+    for item in reversed(open_items):
+        if item["tag"] == "node" and item.get("subgraph"):
+            return item["id"]
+    return None
+
+
+def _add_subgraph(analysis, item, graph_name):
+    atts = item["atts"]
+    analysis.subgraphs.append(
+        SubgraphTiming(
+            item["id"],
+            graph_name,
+            _to_seconds(atts.get("TimeAvgLocalExecute")),
+            _to_seconds(atts.get("TimeMaxLocalExecute")),
+            _to_percent(atts.get("SkewMaxLocalExecute")),
+        )
+    )
+
+
+def _activity(item, subgraph_id, graph_name):
+    atts = item["atts"]
+    return GraphActivity(
+        item["id"],
+        subgraph_id,
+        graph_name,
+        atts.get("_kind"),
+        item["label"] or atts.get("label"),
+        _to_seconds(atts.get("TimeAvgLocalExecute")),
+        _to_seconds(atts.get("TimeMaxLocalExecute")),
+        _to_seconds(atts.get("TimeMinLocalExecute")),
+        _to_percent(atts.get("SkewMaxLocalExecute")),
+        _to_percent(atts.get("SkewMinLocalExecute")),
+    )
+
+
+def _to_seconds(value):
+    # Raw statistics are nanoseconds, formatted ones carry a unit
+    return parse_duration(value, default_unit="ns")
+
+
+def _to_percent(value):
+    # Raw skews are hundredths of a percent, formatted ones end with %
+    if value is None:
+        return None
+    value = value.strip().lstrip("+")
+    try:
+        if value.endswith("%"):
+            return float(value[:-1])
+        return float(value) / 100
+    except ValueError:
+        return None
@@ -1,4 +1,5 @@
 from pyhpcc.handlers.thor_handler import thor_handler
+from pyhpcc.instrumentation import Instrumentation
 
 
 class HPCC(object):
@@ -11,6 +12,8 @@ class HPCC(object):
             The authentication object
         timeout:
             The timeout for the requests
+        instrumentation:
+            Optional Instrumentation whose callbacks are run around every request
 
     Methods:
     -------
@@ -95,15 +98,19 @@ class HPCC(object):
         add_to_superfile_request:
             Add the file to the superfile
 
+        superfile_action:
+            Add or remove subfiles of a superfile
+
         file_list:
             Get the file list
 
     """
 
-    def __init__(self, auth, timeout=1200):
+    def __init__(self, auth, timeout=1200, instrumentation: Instrumentation = None):
         self.auth = auth
         self.timeout = timeout
         self.response_type = "json"
+        self.instrumentation = instrumentation
 
     @property
     def get_wu_info(self):
@@ -633,6 +640,23 @@ class HPCC(object):
             allowed_param=["Superfile", "ExistingFile"],
         )
 
+    @property
+    def superfile_action(self):
+        """Add or remove subfiles of a superfile"""
+        return thor_handler(
+            api=self,
+            path="WsDfu/SuperfileAction",
+            payload_list=True,
+            allowed_param=[
+                "action",
+                "superfile",
+                "subfiles",
+                "before",
+                "delete",
+                "removeSuperfile",
+            ],
+        )
+
     @property
     def file_list(self):
         """List files in a directory"""
@@ -0,0 +1,321 @@
+"""
+Typed models of the ESP responses read most often.
+
+Each response class has a from_response classmethod that takes a Response or
+its decoded body, raises HPCCException if ESP returned exceptions, and reads
+the fields into slotted dataclasses. Numbers formatted with thousands
+separators, such as Totalsize and RecordCount, are parsed to int.
+
+The body is decoded to dicts first and the models are built from them, so
+they give typed, compact fields but do not save the cost of decoding.
+"""
+
+from dataclasses import dataclass, field
+
+from pyhpcc.decoder import decode_response
+from pyhpcc.errors import HPCCException
+from pyhpcc.utils import to_int
+
+
+def _body(response, name):
+    body = decode_response(response)
+    exceptions = body.get("Exceptions")
+    if exceptions is None:
+        exceptions = body.get(name, {}).get("Exceptions")
+    if exceptions:
+        messages = [e.get("Message", "") for e in exceptions.get("Exception", [])]
+        raise HPCCException(",".join(messages))
+    return body.get(name, {})
+
+
+def _items(container, key, item):
+    if not isinstance(container, dict):
+        return []
+    items = container.get(key, [])
+    if isinstance(items, dict):
+        items = [items]
+    return [item(entry) for entry in items]
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+@dataclass(slots=True)
+class ECLTimer(object):
+    """Timer of a workunit, from WUInfo"""
+
+    name: str
+    value: str
+    count: int = None
+    graph_name: str = None
+    subgraph_id: int = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("Name"),
+            d.get("Value"),
+            to_int(d.get("count")),
+            d.get("GraphName"),
+            to_int(d.get("SubGraphId")),
+        )
+
+
+@dataclass(slots=True)
+class ECLGraph(object):
+    """Graph of a workunit, from WUInfo"""
+
+    name: str
+    label: str = None
+    type: str = None
+    complete: bool = False
+    when_started: str = None
+    when_finished: str = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("Name"),
+            d.get("Label"),
+            d.get("Type"),
+            _to_bool(d.get("Complete", False)),
+            d.get("WhenStarted"),
+            d.get("WhenFinished"),
+        )
+
+
+@dataclass(slots=True)
+class ECLWorkunit(object):
+    """Workunit summary, from WUQuery and WUInfo"""
+
+    wuid: str
+    owner: str = None
+    cluster: str = None
+    job_name: str = None
+    state: str = None
+    state_id: int = None
+    protected: bool = False
+    total_cluster_time: str = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("Wuid"),
+            d.get("Owner"),
+            d.get("Cluster"),
+            d.get("Jobname"),
+            d.get("State"),
+            to_int(d.get("StateID")),
+            _to_bool(d.get("Protected", False)),
+            d.get("TotalClusterTime"),
+        )
+
+
+@dataclass(slots=True)
+class WUInfoResponse(object):
+    """WUInfo response"""
+
+    workunit: ECLWorkunit
+    timers: list = field(default_factory=list)
+    graphs: list = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response):
+        workunit = _body(response, "WUInfoResponse").get("Workunit", {})
+        return cls(
+            ECLWorkunit.from_dict(workunit),
+            _items(workunit.get("Timers"), "ECLTimer", ECLTimer.from_dict),
+            _items(workunit.get("Graphs"), "ECLGraph", ECLGraph.from_dict),
+        )
+
+
+@dataclass(slots=True)
+class WUQueryResponse(object):
+    """WUQuery response"""
+
+    num_wus: int
+    workunits: list = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response):
+        body = _body(response, "WUQueryResponse")
+        workunits = _items(body.get("Workunits"), "ECLWorkunit", ECLWorkunit.from_dict)
+        return cls(to_int(body.get("NumWUs"), len(workunits)), workunits)
+
+
+@dataclass(slots=True)
+class DFULogicalFile(object):
+    """Logical file, from DFUQuery"""
+
+    name: str
+    node_group: str = None
+    total_size: int = None
+    record_count: int = None
+    is_superfile: bool = False
+    content_type: str = None
+    modified: str = None
+    owner: str = None
+    # RecordCount as ESP formats it, "" if unknown and None if not reported
+    record_count_text: str = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("Name"),
+            d.get("NodeGroup"),
+            to_int(d.get("IntSize", d.get("Totalsize"))),
+            to_int(d.get("IntRecordCount", d.get("RecordCount"))),
+            _to_bool(d.get("isSuperfile", False)),
+            d.get("ContentType"),
+            d.get("Modified"),
+            d.get("Owner"),
+            d.get("RecordCount"),
+        )
+
+
+@dataclass(slots=True)
+class DFUQueryResponse(object):
+    """DFUQuery response"""
+
+    num_files: int
+    files: list = field(default_factory=list)
+    page_start_from: int = None
+    page_end_at: int = None
+    is_subset: bool = False
+
+    @classmethod
+    def from_response(cls, response):
+        body = _body(response, "DFUQueryResponse")
+        files = _items(
+            body.get("DFULogicalFiles"), "DFULogicalFile", DFULogicalFile.from_dict
+        )
+        return cls(
+            to_int(body.get("NumFiles"), len(files)),
+            files,
+            to_int(body.get("PageStartFrom")),
+            to_int(body.get("PageEndAt")),
+            _to_bool(body.get("IsSubsetOfFiles", False)),
+        )
+
+
+@dataclass(slots=True)
+class DFUInfoResponse(object):
+    """DFUInfo response"""
+
+    name: str
+    node_group: str = None
+    file_size: int = None
+    record_count: int = None
+    record_size: int = None
+    content_type: str = None
+    is_superfile: bool = False
+    modified: str = None
+    owner: str = None
+    wuid: str = None
+    subfiles: list = field(default_factory=list)
+    superfiles: list = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response):
+        detail = _body(response, "DFUInfoResponse").get("FileDetail", {})
+        subfiles = detail.get("subfiles", {})
+        return cls(
+            detail.get("Name"),
+            detail.get("NodeGroup"),
+            to_int(detail.get("FileSizeInt64", detail.get("Filesize"))),
+            to_int(detail.get("RecordCountInt64", detail.get("RecordCount"))),
+            to_int(detail.get("RecordSizeInt64", detail.get("RecordSize"))),
+            detail.get("ContentType"),
+            _to_bool(detail.get("isSuperfile", False)),
+            detail.get("Modified"),
+            detail.get("Owner"),
+            detail.get("Wuid"),
+            list(subfiles.get("Item", [])) if isinstance(subfiles, dict) else [],
+            _items(detail.get("Superfiles"), "DFULogicalFile", lambda d: d.get("Name")),
+        )
+
+
+@dataclass(slots=True)
+class WUResultResponse(object):
+    """WUResult response"""
+
+    wuid: str
+    sequence: int = None
+    name: str = None
+    start: int = 0
+    requested: int = 0
+    count: int = 0
+    total: int = 0
+    rows: list = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response):
+        body = _body(response, "WUResultResponse")
+        result = body.get("Result") or {}
+        return cls(
+            body.get("Wuid"),
+            to_int(body.get("Sequence")),
+            body.get("Name"),
+            to_int(body.get("Start"), 0),
+            to_int(body.get("Requested"), 0),
+            to_int(body.get("Count"), 0),
+            to_int(body.get("Total"), 0),
+            result.get("Row", []),
+        )
+
+
+@dataclass(slots=True)
+class ActiveWorkunit(object):
+    """Running workunit, from Activity"""
+
+    wuid: str
+    state: str = None
+    owner: str = None
+    job_name: str = None
+    cluster_name: str = None
+    target_cluster_name: str = None
+    queue_name: str = None
+    priority: str = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            d.get("Wuid"),
+            d.get("State"),
+            d.get("Owner"),
+            d.get("Jobname"),
+            d.get("ClusterName"),
+            d.get("TargetClusterName"),
+            d.get("QueueName"),
+            d.get("Priority"),
+        )
+
+
+@dataclass(slots=True)
+class ActivityResponse(object):
+    """Activity response"""
+
+    running: list = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response):
+        body = _body(response, "ActivityResponse")
+        return cls(
+            _items(body.get("Running"), "ActiveWorkunit", ActiveWorkunit.from_dict)
+        )
+
+
+@dataclass(slots=True)
+class SuperfileActionResponse(object):
+    """SuperfileAction response"""
+
+    superfile: str
+    retcode: int = 0
+
+    @classmethod
+    def from_response(cls, response):
+        body = _body(response, "SuperfileActionResponse")
+        return cls(body.get("superfile"), to_int(body.get("retcode"), 0))
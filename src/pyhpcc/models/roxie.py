@@ -1,4 +1,20 @@
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import pyhpcc.config as conf
+from pyhpcc.cache import TTLCache
 from pyhpcc.handlers.roxie_handler import roxie_handler
+from pyhpcc.instrumentation import Instrumentation, instrumented_request
+from pyhpcc.models.roxie_pool import RoxieEndpointPool
+from pyhpcc.errors import HPCCException
+from pyhpcc.utils import convert_arg_to_utf8_str, get_roxie_results
+
+log = logging.getLogger(__name__)
 
 
 class Roxie(object):
@@ -19,12 +35,25 @@ class Roxie(object):
             Search service object
         roxie_port:
             Roxie port
+        cache:
+            Optional TTLCache of responses. Responses are not cached if None
+        instrumentation:
+            Optional Instrumentation whose callbacks are run around every request
 
     Methods
     -------
-        __init__(auth, timeout, response_type, definition, search_service, roxie_port)
+        __init__(auth, timeout, response_type, definition, search_service, roxie_port, cache, instrumentation)
             Initialize the class
 
+        get_query_url(self, base_url)
+            Build the url of the query
+
+        endpoint_name(self)
+            Name of the query reported to instrumentation
+
+        cache_key(self, params, data)
+            Build the cache key of a request
+
         roxie_call(self)
             Call the roxie API
     """
@@ -37,6 +66,8 @@ class Roxie(object):
         timeout=1200,
         response_type="json",
         definition="submit",
+        cache: TTLCache = None,
+        instrumentation: Instrumentation = None,
     ):
         self.auth = auth
         self.timeout = timeout
@@ -44,6 +75,83 @@ class Roxie(object):
         self.definition = "WsEcl/" + definition + "/query"
         self.search_service = search_service
         self.roxie_port = roxie_port
+        self.cache = cache
+        self.instrumentation = instrumentation
+
+    def get_query_url(self, base_url=None):
+        """Build the url of the query
+
+        Parameters
+        ----------
+            base_url:
+                protocol://host:port of the ESP. Defaults to auth.get_url()
+
+        Returns
+        -------
+            url:
+                The WsEcl url of the query
+        """
+        if base_url is None:
+            base_url = self.auth.get_url()
+        delimiter = self.auth.path_delimiter
+        return (
+            base_url
+            + delimiter
+            + self.definition
+            + delimiter
+            + self.roxie_port
+            + delimiter
+            + self.search_service
+            + delimiter
+            + "."
+            + self.response_type
+        )
+
+    def endpoint_name(self):
+        """Name of the query reported to instrumentation
+
+        Returns
+        -------
+            endpoint: str
+                WsEcl/<definition>/query/<roxie_port>/<search_service>
+        """
+        return self.definition + "/" + self.roxie_port + "/" + self.search_service
+
+    def cache_key(self, params: dict = None, data=None):
+        """Build the cache key of a request
+
+        Parameters are sorted and a JSON body is re-serialized with sorted keys,
+        so requests that differ only in ordering share a key. The key holds the
+        url of the ESP, so clients of different hosts can share a cache.
+
+        Parameters
+        ----------
+            params:
+                dictionary of query parameters
+            data:
+                Request body
+
+        Returns
+        -------
+            key: tuple
+                Hashable key of the host, query, port, service, params and body
+        """
+        params = {
+            key: convert_arg_to_utf8_str(value)
+            for key, value in (params or {}).items()
+            if value is not None
+        }
+        return (
+            self._cache_scope(),
+            self.definition,
+            self.roxie_port,
+            self.search_service,
+            tuple(sorted(params.items())),
+            _normalize_body(data),
+        )
+
+    def _cache_scope(self):
+        return self.auth.get_url()
 
     @property
     def roxie_call(self):
@@ -61,3 +169,374 @@ class Roxie(object):
 
         """
         return roxie_handler(api=self)
+
+
+class RoxieClient(Roxie):
+    """
+    Thread-safe Roxie client that runs many query invocations in parallel
+
+    Every request goes through the client's own requests.Session with a
+    connection pool sized to max_workers, and params and headers are passed per
+    request, so one client can be shared by many threads.
+
+    With an endpoint pool, requests are routed across its ESP endpoints instead
+    of auth.get_url(). With hedge enabled, a request that has not answered after
+    the hedge delay is duplicated to another endpoint and the first successful
+    response is returned; a request that fails is retried once on another endpoint.
+    A 4xx response is raised as is: it is not retried or hedged and does not
+    count as a failure of its endpoint.
+
+    Attributes
+    ----------
+        max_workers:
+            Number of requests run in parallel by call_many
+        session:
+            The pooled requests.Session
+        endpoints:
+            Optional RoxieEndpointPool to route requests across
+        hedge:
+            Send hedged duplicate requests. Requires endpoints
+        hedge_delay:
+            Seconds before a request is hedged. Defaults to the pool's p95 latency
+        cache:
+            Optional TTLCache of responses, checked before any request is sent
+        instrumentation:
+            Optional Instrumentation whose callbacks are run around every request
+
+    Methods
+    -------
+        call(self, params, data, headers)
+            Call the query once
+
+        call_many(self, inputs, data, headers, return_exceptions)
+            Call the query once per input in parallel
+
+        call_batch(self, inputs, dataset_name, batch_size, key_field, result_name, headers)
+            Call the query once per batch of input rows and split the results per input
+
+        close(self)
+            Close the worker threads and the connection pool
+    """
+
+    def __init__(
+        self,
+        auth,
+        search_service,
+        roxie_port,
+        timeout=1200,
+        response_type="json",
+        definition="submit",
+        max_workers=conf.DEFAULT_ROXIE_WORKERS,
+        endpoints: RoxieEndpointPool = None,
+        hedge=False,
+        hedge_delay=None,
+        cache: TTLCache = None,
+        instrumentation: Instrumentation = None,
+    ):
+        super().__init__(
+            auth,
+            search_service,
+            roxie_port,
+            timeout,
+            response_type,
+            definition,
+            cache,
+            instrumentation,
+        )
+        if hedge and endpoints is None:
+            raise ValueError("Hedged requests require an endpoint pool")
+        self.max_workers = max_workers
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.session = requests.Session()
+        hosts = len(endpoints.endpoints) if endpoints is not None else 1
+        adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pyhpcc-roxie"
+        )
+        self._hedge_executor = None
+        if hedge:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=2 * max_workers, thread_name_prefix="pyhpcc-roxie-hedge"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def call(self, params: dict = None, data=None, headers: dict = None):
+        """Call the query once
+
+        Parameters
+        ----------
+            params:
+                dictionary of query parameters
+            data:
+                Request body
+            headers:
+                dictionary of request headers
+
+        Returns
+        -------
+            response:
+                The response from the API
+
+        Raises
+        ------
+            requests.HTTPError:
+                If the response is not OK
+        """
+        if self.cache is None:
+            return self._call(params, data, headers)
+        key = self.cache_key(params, data)
+        resp = self.cache.get(key)
+        if resp is not None:
+            resp.raise_for_status()
+            return resp
+        try:
+            resp = self._call(params, data, headers)
+        except requests.HTTPError as e:
+            # Only client errors are cached, 5xx responses are often transient
+            if _client_error(e):
+                self.cache.set_negative(key, e.response)
+            raise
+        self.cache.set(key, resp)
+        return resp
+
+    def _call(self, params, data, headers):
+        if self.endpoints is None:
+            return self._request(self.get_query_url(), params, data, headers)
+        if self.hedge:
+            return self._call_hedged(params, data, headers)
+        return self._call_endpoint(self.endpoints.choose(), params, data, headers)
+
+    def call_many(
+        self,
+        inputs: list,
+        data=None,
+        headers: dict = None,
+        return_exceptions=False,
+    ):
+        """Call the query once per input in parallel
+
+        Parameters
+        ----------
+            inputs:
+                list of dictionaries of query parameters
+            data:
+                Request body sent with every request
+            headers:
+                dictionary of request headers sent with every request
+            return_exceptions:
+                Return exceptions in place of the responses of failed
+                requests instead of raising the first one
+
+        Returns
+        -------
+            responses: list
+                The responses in the order of inputs
+        """
+        futures = [
+            self._executor.submit(self.call, params, data, headers) for params in inputs
+        ]
+        responses = []
+        for future in futures:
+            if return_exceptions:
+                error = future.exception()
+                responses.append(future.result() if error is None else error)
+            else:
+                responses.append(future.result())
+        return responses
+
+    def call_batch(
+        self,
+        inputs: list,
+        dataset_name,
+        batch_size=conf.DEFAULT_ROXIE_BATCH_SIZE,
+        key_field=None,
+        result_name=None,
+        headers: dict = None,
+    ):
+        """Call the query once per batch of input rows and split the results per input
+
+        For queries that take a dataset parameter. The input rows are packed into
+        the dataset of one JSON request per batch, the batches are sent in
+        parallel, and the result rows are matched back to their inputs.
+
+        Parameters
+        ----------
+            inputs:
+                list of dictionaries, one row of the input dataset each
+            dataset_name:
+                Name of the query's dataset parameter
+            batch_size:
+                Input rows per request
+            key_field:
+                Field present in both the input and result rows used to match
+                results to inputs. If None the query must return exactly one
+                row per input, in input order
+            result_name:
+                Name of the result to read. Defaults to the first result
+            headers:
+                dictionary of request headers sent with every request
+
+        Returns
+        -------
+            rows: list
+                For each input, the list of result rows matched to it
+
+        Raises
+        ------
+            HPCCException:
+                If the query returns an exception, or if key_field is None
+                and the result has a different number of rows than the batch
+        """
+        headers = dict(headers or {})
+        headers.setdefault("Content-Type", "application/json")
+        batches = [
+            inputs[start : start + batch_size]
+            for start in range(0, len(inputs), batch_size)
+        ]
+        futures = [
+            self._executor.submit(
+                self.call,
+                None,
+                json.dumps({self.search_service: {dataset_name: {"Row": batch}}}),
+                headers,
+            )
+            for batch in batches
+        ]
+        rows = []
+        for batch, future in zip(batches, futures):
+            results = get_roxie_results(future.result())
+            if result_name is not None:
+                result = results.get(result_name, [])
+            else:
+                result = next(iter(results.values()), [])
+            rows.extend(_split_batch_result(batch, result, key_field))
+        return rows
+
+    def close(self):
+        """Close the worker threads and the connection pool"""
+        self._executor.shutdown(wait=True)
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=True)
+        self.session.close()
+
+    def _cache_scope(self):
+        # The endpoints of a pool serve the same queries, so they share entries
+        if self.endpoints is None:
+            return self.auth.get_url()
+        return tuple(sorted(e.base_url for e in self.endpoints.endpoints))
+
+    def _call_endpoint(self, endpoint, params, data, headers):
+        start = time.perf_counter()
+        try:
+            resp = self._request(
+                self.get_query_url(endpoint.base_url), params, data, headers
+            )
+        except Exception as e:
+            # A 4xx is an answer to a bad request, not a sign of a bad endpoint
+            if _client_error(e):
+                self.endpoints.report_success(endpoint, time.perf_counter() - start)
+            else:
+                self.endpoints.report_failure(endpoint)
+            raise
+        self.endpoints.report_success(endpoint, time.perf_counter() - start)
+        return resp
+
+    def _call_hedged(self, params, data, headers):
+        primary = self.endpoints.choose()
+        futures = [
+            self._hedge_executor.submit(
+                self._call_endpoint, primary, params, data, headers
+            )
+        ]
+        delay = self.hedge_delay
+        if delay is None:
+            delay = self.endpoints.hedge_delay()
+        done, _ = wait(futures, timeout=delay)
+        # Client errors would fail on any endpoint, so they are not retried
+        if done and _answered(futures[0]):
+            return futures[0].result()
+        secondary = self.endpoints.choose(exclude=(primary,))
+        if secondary is None:
+            return futures[0].result()
+        log.debug("Hedging request from %s to %s", primary, secondary)
+        futures.append(
+            self._hedge_executor.submit(
+                self._call_endpoint, secondary, params, data, headers
+            )
+        )
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if _answered(future):
+                    return future.result()
+        # Both attempts failed, raise the primary's error
+        return futures[0].result()
+
+    def _request(self, url, params, data, headers):
+        params = {
+            key: convert_arg_to_utf8_str(value)
+            for key, value in (params or {}).items()
+            if value is not None
+        }
+        resp = instrumented_request(
+            self.instrumentation,
+            self.endpoint_name(),
+            self.session,
+            "POST",
+            url,
+            params=params,
+            headers=headers,
+            data=data,
+            timeout=self.timeout,
+            auth=self.auth.oauth if self.auth else None,
+        )
+        resp.raise_for_status()
+        return resp
+
+
+def _client_error(error):
+    response = getattr(error, "response", None)
+    return (
+        isinstance(error, requests.HTTPError)
+        and response is not None
+        and 400 <= response.status_code < 500
+    )
+
+
+def _answered(future):
+    error = future.exception()
+    return error is None or _client_error(error)
+
+
+def _split_batch_result(batch, result, key_field):
+    if key_field is None:
+        if len(result) != len(batch):
+            raise HPCCException(
+                f"Expected {len(batch)} result rows for the batch, got {len(result)}"
+            )
+        return [[row] for row in result]
+    matches = {}
+    for row in result:
+        matches.setdefault(str(row.get(key_field)), []).append(row)
+    return [matches.get(str(row.get(key_field)), []) for row in batch]
+
+
+def _normalize_body(data):
+    if data is None:
+        return None
+    if isinstance(data, (dict, list)):
+        return json.dumps(data, sort_keys=True, separators=(",", ":"))
+    try:
+        return json.dumps(json.loads(data), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return data if isinstance(data, (str, bytes)) else repr(data)
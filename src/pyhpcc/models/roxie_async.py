@@ -0,0 +1,460 @@
+import asyncio
+import base64
+import logging
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import pyhpcc.config as conf
+from pyhpcc.cache import TTLCache
+from pyhpcc.errors import HPCCException
+from pyhpcc.instrumentation import Instrumentation, RequestInfo
+from pyhpcc.models.roxie import RoxieClient, _answered, _client_error
+from pyhpcc.models.roxie_pool import RoxieEndpointPool
+from pyhpcc.utils import convert_arg_to_utf8_str
+
+log = logging.getLogger(__name__)
+
+
+class AsyncRoxieClient(object):
+    """
+    asyncio interface to Roxie queries
+
+    Requests share the endpoint routing, hedging and cache of a RoxieClient.
+    Two transports send them:
+
+    aiohttp: requests are sent by an aiohttp session on the event loop, so
+    the number of requests in flight is bounded by max_concurrency only, and
+    one client can keep thousands of them open. Requires the async extra,
+    pip install pyhpcc[async].
+
+    threads: requests are sent by the RoxieClient on its max_workers threads,
+    which also size its connection pool, so at most max_workers requests are
+    open against the server at a time whatever max_concurrency is. This lets
+    coroutines call Roxie without blocking the event loop, it does not scale
+    past the number of threads.
+
+    The default, auto, uses aiohttp when it is installed and threads
+    otherwise. Responses are requests.Response objects with either transport.
+
+    max_concurrency is the admission window: at most that many requests are
+    accepted at a time, running or queued. Further calls wait for a free
+    slot, which gives callers backpressure. gather and as_completed keep
+    only that window of inputs in flight, so they can consume very large or
+    unbounded input iterables.
+
+    A request that times out or is cancelled stops being awaited right away.
+    With aiohttp it is closed and frees its slot. With threads a queued
+    request is dropped, a running one keeps its slot until its HTTP call
+    finishes.
+
+    Attributes
+    ----------
+        client:
+            The RoxieClient used to send requests
+        max_concurrency:
+            Maximum number of requests accepted, running or queued
+        max_workers:
+            Number of threads and pooled connections sending the requests of
+            the threads transport
+        transport:
+            aiohttp or threads
+        request_timeout:
+            Default seconds to wait for a response, including the wait for a
+            free slot. No timeout if None
+
+    Methods
+    -------
+        call:
+            Call the query once
+
+        gather:
+            Call the query once per input and return the responses in input order
+
+        as_completed:
+            Call the query once per input and yield responses as they complete
+
+        close:
+            Close the underlying RoxieClient
+    """
+
+    def __init__(
+        self,
+        auth,
+        search_service,
+        roxie_port,
+        timeout=1200,
+        response_type="json",
+        definition="submit",
+        max_concurrency=conf.DEFAULT_ROXIE_WORKERS,
+        max_workers=None,
+        request_timeout=None,
+        endpoints: RoxieEndpointPool = None,
+        hedge=False,
+        hedge_delay=None,
+        cache: TTLCache = None,
+        instrumentation: Instrumentation = None,
+        transport="auto",
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency should be at least 1")
+        if transport == "auto":
+            transport = "aiohttp" if _import_aiohttp() is not None else "threads"
+        if transport not in ("aiohttp", "threads"):
+            raise ValueError("Unknown transport %r" % transport)
+        if transport == "aiohttp" and _import_aiohttp() is None:
+            raise HPCCException(
+                "aiohttp is required for the aiohttp transport, install pyhpcc[async]"
+            )
+        if max_workers is None:
+            max_workers = min(max_concurrency, conf.DEFAULT_ROXIE_WORKERS)
+        self.client = RoxieClient(
+            auth,
+            search_service,
+            roxie_port,
+            timeout=timeout,
+            response_type=response_type,
+            definition=definition,
+            max_workers=max_workers,
+            endpoints=endpoints,
+            hedge=hedge,
+            hedge_delay=hedge_delay,
+            cache=cache,
+            instrumentation=instrumentation,
+        )
+        self.max_concurrency = max_concurrency
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._aiohttp = _import_aiohttp() if transport == "aiohttp" else None
+        self._session = None
+        self._authorization = _basic_auth(auth)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def call(
+        self, params: dict = None, data=None, headers: dict = None, timeout=None
+    ):
+        """Call the query once
+
+        Parameters
+        ----------
+            params:
+                dictionary of query parameters
+            data:
+                Request body
+            headers:
+                dictionary of request headers
+            timeout:
+                Seconds to wait for the response. Defaults to request_timeout
+
+        Returns
+        -------
+            response:
+                The response from the API
+
+        Raises
+        ------
+            asyncio.TimeoutError:
+                If no response arrived within timeout
+            requests.HTTPError:
+                If the response is not OK
+            aiohttp.ClientError:
+                If the aiohttp transport could not get a response
+        """
+        if timeout is None:
+            timeout = self.request_timeout
+        return await asyncio.wait_for(self._call(params, data, headers), timeout)
+
+    async def gather(
+        self,
+        inputs,
+        data=None,
+        headers: dict = None,
+        timeout=None,
+        return_exceptions=False,
+    ):
+        """Call the query once per input and return the responses in input order
+
+        Parameters
+        ----------
+            inputs:
+                iterable of dictionaries of query parameters
+            data:
+                Request body sent with every request
+            headers:
+                dictionary of request headers sent with every request
+            timeout:
+                Seconds to wait for each response. Defaults to request_timeout
+            return_exceptions:
+                Return exceptions in place of the responses of failed requests
+                instead of raising the first one
+
+        Returns
+        -------
+            responses: list
+                The responses in the order of inputs
+        """
+        responses = {}
+        async for index, response in self.as_completed(
+            inputs, data, headers, timeout, return_exceptions
+        ):
+            responses[index] = response
+        return [responses[index] for index in range(len(responses))]
+
+    async def as_completed(
+        self,
+        inputs,
+        data=None,
+        headers: dict = None,
+        timeout=None,
+        return_exceptions=False,
+    ):
+        """Call the query once per input and yield responses as they complete
+
+        At most max_concurrency inputs are taken from inputs ahead of the
+        responses consumed, so inputs may be a lazy or unbounded iterable.
+
+        Parameters
+        ----------
+            inputs:
+                iterable of dictionaries of query parameters
+            data:
+                Request body sent with every request
+            headers:
+                dictionary of request headers sent with every request
+            timeout:
+                Seconds to wait for each response. Defaults to request_timeout
+            return_exceptions:
+                Yield exceptions in place of the responses of failed requests
+                instead of raising the first one
+
+        Yields
+        ------
+            index: int
+                Position of the input in inputs
+            response:
+                The response, or the exception if return_exceptions is set
+        """
+        inputs = iter(enumerate(inputs))
+        pending = {}
+        try:
+            while True:
+                for index, params in inputs:
+                    task = asyncio.ensure_future(
+                        self.call(params, data, headers, timeout)
+                    )
+                    pending[task] = index
+                    if len(pending) >= self.max_concurrency:
+                        break
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=pending.get):
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is not None and not return_exceptions:
+                        raise error
+                    yield index, task.result() if error is None else error
+        finally:
+            # Cancel what is left if the consumer stops early or a request failed
+            for task in pending:
+                task.cancel()
+
+    async def close(self):
+        """Close the HTTP session and the underlying RoxieClient after in-flight requests finish"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await asyncio.get_running_loop().run_in_executor(None, self.client.close)
+
+    async def _call(self, params, data, headers):
+        if self.transport == "threads":
+            return await self._call_threads(params, data, headers)
+        async with self._semaphore:
+            return await self._call_cached(params, data, headers)
+
+    async def _call_threads(self, params, data, headers):
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.client._executor.submit(
+                self.client.call, params, data, headers
+            )
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        def release(_):
+            # Free the slot when the HTTP request really ends, not when it stops being awaited
+            try:
+                loop.call_soon_threadsafe(self._semaphore.release)
+            except RuntimeError:
+                log.debug("Event loop closed before a Roxie request finished")
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def _call_cached(self, params, data, headers):
+        # The aiohttp transport's RoxieClient.call
+        cache = self.client.cache
+        if cache is None:
+            return await self._send(params, data, headers)
+        key = self.client.cache_key(params, data)
+        resp = cache.get(key)
+        if resp is not None:
+            resp.raise_for_status()
+            return resp
+        try:
+            resp = await self._send(params, data, headers)
+        except requests.HTTPError as e:
+            if _client_error(e):
+                cache.set_negative(key, e.response)
+            raise
+        cache.set(key, resp)
+        return resp
+
+    async def _send(self, params, data, headers):
+        endpoints = self.client.endpoints
+        if endpoints is None:
+            return await self._request(
+                self.client.get_query_url(), params, data, headers
+            )
+        if self.client.hedge:
+            return await self._send_hedged(params, data, headers)
+        return await self._send_endpoint(endpoints.choose(), params, data, headers)
+
+    async def _send_endpoint(self, endpoint, params, data, headers):
+        start = time.perf_counter()
+        try:
+            resp = await self._request(
+                self.client.get_query_url(endpoint.base_url), params, data, headers
+            )
+        except Exception as e:
+            if _client_error(e):
+                self.client.endpoints.report_success(
+                    endpoint, time.perf_counter() - start
+                )
+            else:
+                self.client.endpoints.report_failure(endpoint)
+            raise
+        self.client.endpoints.report_success(endpoint, time.perf_counter() - start)
+        return resp
+
+    async def _send_hedged(self, params, data, headers):
+        endpoints = self.client.endpoints
+        primary = endpoints.choose()
+        tasks = [
+            asyncio.ensure_future(self._send_endpoint(primary, params, data, headers))
+        ]
+        try:
+            delay = self.client.hedge_delay
+            if delay is None:
+                delay = endpoints.hedge_delay()
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done and _answered(tasks[0]):
+                return tasks[0].result()
+            secondary = endpoints.choose(exclude=(primary,))
+            if secondary is None:
+                return await tasks[0]
+            log.debug("Hedging request from %s to %s", primary, secondary)
+            tasks.append(
+                asyncio.ensure_future(
+                    self._send_endpoint(secondary, params, data, headers)
+                )
+            )
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if _answered(task):
+                        return task.result()
+            # Both attempts failed, raise the primary's error
+            return tasks[0].result()
+        finally:
+            # The slower request is closed rather than left holding a connection
+            for task in tasks:
+                task.cancel()
+
+    async def _request(self, url, params, data, headers):
+        aiohttp = self._aiohttp
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.client.timeout),
+            )
+        if self._authorization is not None:
+            headers = {"Authorization": self._authorization, **(headers or {})}
+        params = {
+            key: convert_arg_to_utf8_str(value).decode("utf-8")
+            for key, value in (params or {}).items()
+            if value is not None
+        }
+        instrumentation = self.client.instrumentation
+        info = RequestInfo(self.client.endpoint_name(), "POST", url, time.time())
+        if instrumentation is not None:
+            instrumentation._run(instrumentation.pre_request, info)
+        start = time.perf_counter()
+        try:
+            async with self._session.post(
+                url, params=params, data=data, headers=headers
+            ) as raw:
+                info.server = time.perf_counter() - start
+                resp = _to_response(raw, await raw.read())
+        except Exception as e:
+            if instrumentation is not None:
+                info.total = time.perf_counter() - start
+                info.error = type(e).__name__
+                instrumentation._run(instrumentation.post_request, info)
+            raise
+        if instrumentation is not None:
+            info.total = time.perf_counter() - start
+            info.download = max(info.total - info.server, 0.0)
+            info.status = resp.status_code
+            info.bytes_in = len(resp.content)
+            info.bytes_out = len(
+                data.encode("utf-8") if isinstance(data, str) else data or b""
+            )
+            instrumentation._run(instrumentation.post_request, info)
+        resp.raise_for_status()
+        return resp
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    return aiohttp
+
+
+def _basic_auth(auth):
+    # The Authorization header requests sends for auth.oauth
+    if auth is None or auth.oauth[0] is None:
+        return None
+    username, password = auth.oauth
+    credentials = ("%s:%s" % (username, password or "")).encode("latin1")
+    return "Basic " + base64.b64encode(credentials).decode("ascii")
+
+
+def _to_response(raw, content):
+    # A requests.Response, so both transports return and cache the same type
+    resp = requests.Response()
+    resp.status_code = raw.status
+    resp.reason = raw.reason
+    resp.url = str(raw.url)
+    resp.headers = CaseInsensitiveDict(raw.headers)
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp._content = content
+    return resp
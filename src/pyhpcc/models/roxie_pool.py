@@ -0,0 +1,270 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+import pyhpcc.config as conf
+from pyhpcc import utils
+
+log = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_LATENCY = "least_latency"
+
+
+class RoxieEndpoint(object):
+    """
+    Health and latency state of one ESP endpoint in a RoxieEndpointPool
+
+    Attributes
+    ----------
+        base_url:
+            protocol://host:port of the ESP
+        consecutive_failures:
+            Number of failed requests since the last success
+        latencies:
+            Recent request latencies in seconds
+        latency_ewma:
+            Exponentially weighted moving average of the latency in seconds
+        in_flight:
+            Number of requests currently sent to the endpoint
+        ejected_until:
+            time.monotonic() value until which the endpoint is not used
+    """
+
+    def __init__(self, base_url, latency_window):
+        self.base_url = base_url.rstrip("/")
+        self.consecutive_failures = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.latency_ewma = None
+        self.in_flight = 0
+        self.ejected_until = None
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def __repr__(self):
+        return f"RoxieEndpoint({self.base_url!r})"
+
+    def is_ejected(self, now):
+        """Check if the endpoint is ejected at time now"""
+        return self.ejected_until is not None and now < self.ejected_until
+
+
+class RoxieEndpointPool(object):
+    """
+    Routes Roxie requests across several ESP endpoints and ejects unhealthy ones
+
+    An endpoint is ejected for eject_seconds after max_failures consecutive
+    failures, or when the p95 of its recent latencies exceeds max_latency.
+    When the ejection expires the endpoint is readmitted with a clean history.
+    If every endpoint is ejected the one whose ejection ends first is used
+    rather than failing the request.
+
+    Attributes
+    ----------
+        endpoints:
+            list of RoxieEndpoint
+        strategy:
+            round_robin or least_latency
+        max_failures:
+            Consecutive failures before an endpoint is ejected
+        max_latency:
+            p95 latency in seconds above which an endpoint is ejected. Not checked if None
+        eject_seconds:
+            Seconds an ejected endpoint is left out of rotation
+        min_samples:
+            Latency samples needed before max_latency and the hedge delay apply
+
+    Methods
+    -------
+        choose:
+            Pick the endpoint for the next request
+
+        report_success:
+            Record a successful request
+
+        report_failure:
+            Record a failed request
+
+        hedge_delay:
+            p95 latency across the pool, used to time hedged requests
+
+        stats:
+            Per endpoint request, failure and latency statistics
+    """
+
+    def __init__(
+        self,
+        base_urls: list,
+        strategy=ROUND_ROBIN,
+        max_failures=conf.ROXIE_MAX_FAILURES,
+        max_latency=None,
+        eject_seconds=conf.ROXIE_EJECT_SECONDS,
+        latency_window=conf.ROXIE_LATENCY_WINDOW,
+        min_samples=conf.ROXIE_MIN_LATENCY_SAMPLES,
+    ):
+        if len(base_urls) == 0:
+            raise ValueError("Minimum one endpoint should be specified")
+        if strategy not in (ROUND_ROBIN, LEAST_LATENCY):
+            raise ValueError(f"Unknown routing strategy {strategy}")
+        self.endpoints = [RoxieEndpoint(url, latency_window) for url in base_urls]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.max_latency = max_latency
+        self.eject_seconds = eject_seconds
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(range(len(self.endpoints)))
+
+    @classmethod
+    def from_auths(cls, auths: list, **kwargs):
+        """Create a pool from Auth objects of each ESP
+
+        Parameters
+        ----------
+            auths:
+                list of Auth objects
+            kwargs:
+                Other RoxieEndpointPool arguments
+
+        Returns
+        -------
+            pool: RoxieEndpointPool
+        """
+        return cls([auth.get_url() for auth in auths], **kwargs)
+
+    def choose(self, exclude=()):
+        """Pick the endpoint for the next request and count it as in flight
+
+        Parameters
+        ----------
+            exclude:
+                Endpoints not to pick, e.g. the one a hedged request went to
+
+        Returns
+        -------
+            endpoint: RoxieEndpoint
+                The endpoint, or None if every endpoint is excluded
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [ep for ep in self.endpoints if ep not in exclude]
+            if not candidates:
+                return None
+            for endpoint in candidates:
+                if endpoint.ejected_until is not None and not endpoint.is_ejected(now):
+                    self._readmit(endpoint)
+            healthy = [ep for ep in candidates if not ep.is_ejected(now)]
+            if not healthy:
+                endpoint = min(candidates, key=lambda ep: ep.ejected_until)
+            elif self.strategy == LEAST_LATENCY:
+                endpoint = min(healthy, key=self._latency_score)
+            else:
+                endpoint = self._next_round_robin(healthy)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def report_success(self, endpoint: RoxieEndpoint, latency):
+        """Record a successful request
+
+        Parameters
+        ----------
+            endpoint:
+                The endpoint returned by choose
+            latency:
+                Seconds the request took
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.consecutive_failures = 0
+            endpoint.latencies.append(latency)
+            if endpoint.latency_ewma is None:
+                endpoint.latency_ewma = latency
+            else:
+                endpoint.latency_ewma += conf.ROXIE_EWMA_ALPHA * (
+                    latency - endpoint.latency_ewma
+                )
+            if (
+                self.max_latency is not None
+                and len(endpoint.latencies) >= self.min_samples
+                and utils.percentile(endpoint.latencies, 95) > self.max_latency
+            ):
+                self._eject(endpoint, "p95 latency above max_latency")
+
+    def report_failure(self, endpoint: RoxieEndpoint):
+        """Record a failed request
+
+        Parameters
+        ----------
+            endpoint:
+                The endpoint returned by choose
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.max_failures:
+                self._eject(endpoint, f"{endpoint.consecutive_failures} failures")
+
+    def hedge_delay(self):
+        """p95 latency across the pool
+
+        Returns
+        -------
+            delay: float
+                Seconds, or None until min_samples latencies are recorded
+        """
+        with self._lock:
+            latencies = [latency for ep in self.endpoints for latency in ep.latencies]
+        if len(latencies) < self.min_samples:
+            return None
+        return utils.percentile(latencies, 95)
+
+    def stats(self):
+        """Per endpoint request, failure and latency statistics
+
+        Returns
+        -------
+            stats: dict
+                base_url to requests, failures, ejections, ejected, p50 and p95
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                ep.base_url: {
+                    "requests": ep.requests,
+                    "failures": ep.failures,
+                    "ejections": ep.ejections,
+                    "ejected": ep.is_ejected(now),
+                    "p50": utils.percentile(ep.latencies, 50),
+                    "p95": utils.percentile(ep.latencies, 95),
+                }
+                for ep in self.endpoints
+            }
+
+    def _next_round_robin(self, healthy):
+        for _ in range(len(self.endpoints)):
+            endpoint = self.endpoints[next(self._cycle)]
+            if endpoint in healthy:
+                return endpoint
+        return healthy[0]
+
+    @staticmethod
+    def _latency_score(endpoint):
+        # Endpoints without samples score 0 so they get tried
+        return (endpoint.latency_ewma or 0.0) * (1 + endpoint.in_flight)
+
+    def _eject(self, endpoint, reason):
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        endpoint.ejections += 1
+        log.warning("Ejecting %s for %ss: %s", endpoint, self.eject_seconds, reason)
+
+    def _readmit(self, endpoint):
+        endpoint.ejected_until = None
+        endpoint.consecutive_failures = 0
+        endpoint.latencies.clear()
+        endpoint.latency_ewma = None
+        log.info("Readmitting %s", endpoint)
@@ -0,0 +1,513 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyhpcc.config as conf
+import pyhpcc.utils as utils
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+log = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class ScheduledJob(object):
+    """
+    A compiled workunit queued in, or dispatched by, a WorkunitScheduler
+
+    Attributes
+    ----------
+        job_id:
+            Sequence number assigned by the scheduler
+        compiled_file:
+            The compiled ecl file passed to bash_run
+        cluster:
+            The requested cluster, or the cluster it was dispatched to
+        priority:
+            Jobs with a higher priority are dispatched first
+        options:
+            dictionary of ecl run options
+        job_name:
+            The workunit job name
+        status:
+            One of queued, running, completed, failed or cancelled
+        wuid:
+            The Wuid of the workunit once it has been submitted
+        wu_state:
+            The last known state of the workunit
+        output:
+            Parsed output from bash_run
+        error:
+            The exception if the job failed
+
+    Methods
+    -------
+        queue_wait:
+            Seconds the job spent in the queue
+
+        run_time:
+            Seconds from dispatch to completion
+
+        done:
+            Check if the job is finished
+
+        wait:
+            Block until the job is finished
+    """
+
+    def __init__(self, job_id, compiled_file, cluster, priority, options, job_name):
+        self.job_id = job_id
+        self.compiled_file = compiled_file
+        self.cluster = cluster
+        self.priority = priority
+        self.options = options
+        self.job_name = job_name
+        self.status = QUEUED
+        self.wuid = None
+        self.wu_state = None
+        self.output = None
+        self.error = None
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def queue_wait(self):
+        """Seconds the job spent in the queue, None while it is still queued"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.enqueued_at
+
+    @property
+    def run_time(self):
+        """Seconds from dispatch to completion, None while it is not finished"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def done(self):
+        """Check if the job is finished"""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job is finished
+
+        Parameters
+        ----------
+            timeout:
+                Seconds to wait. Waits forever if None
+
+        Returns
+        -------
+            bool:
+                True if the job finished within the timeout
+        """
+        return self._done.wait(timeout)
+
+
+class WorkunitScheduler(object):
+    """
+    Client-side scheduler that dispatches compiled workunits through
+    WorkunitSubmit.bash_run while enforcing concurrency caps
+
+    Attributes
+    ----------
+        workunit_submit:
+            WorkunitSubmit object used to run the jobs
+        cluster_limits:
+            dictionary of cluster to the maximum number of concurrently running jobs
+        max_concurrent:
+            Maximum number of running jobs across all clusters
+        poll_interval:
+            Seconds between WUQuery polls for workunits still running after bash_run.
+            WUQuery takes one Wuid, so each poll queries the tracked workunits in
+            parallel on poller threads, off the dispatcher thread
+
+    Methods
+    -------
+        start:
+            Start the dispatcher
+
+        submit:
+            Queue a compiled workunit
+
+        cancel:
+            Cancel a queued job
+
+        join:
+            Wait for every submitted job to finish
+
+        shutdown:
+            Stop the dispatcher
+
+        metrics:
+            Throughput and queue wait metrics
+    """
+
+    def __init__(
+        self,
+        workunit_submit: WorkunitSubmit,
+        cluster_limits: dict = None,
+        max_concurrent: int = None,
+        poll_interval=conf.SCHEDULER_POLL_INTERVAL,
+    ):
+        self.workunit_submit = workunit_submit
+        self.hpcc = workunit_submit.hpcc
+        self.cluster_limits = dict(cluster_limits or {})
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        unbounded = [
+            cluster
+            for cluster in workunit_submit.clusters
+            if cluster not in self.cluster_limits
+        ]
+        if max_concurrent is None and unbounded:
+            raise ValueError(
+                f"max_concurrent or a cluster limit is required for {unbounded}"
+            )
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = Counter()
+        self._active = 0
+        self._tracked = {}
+        self._condition = threading.Condition()
+        self._executor = None
+        self._poller = None
+        self._polls = []
+        self._dispatcher = None
+        self._stopping = False
+        self._started_at = None
+        self._counts = Counter()
+        self._queue_waits = deque(maxlen=conf.SCHEDULER_METRICS_WINDOW)
+        self._run_times = deque(maxlen=conf.SCHEDULER_METRICS_WINDOW)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=exc_type is None, cancel_pending=exc_type is not None)
+
+    def start(self):
+        """Start the dispatcher thread"""
+        with self._condition:
+            if self._dispatcher is not None:
+                return
+            max_workers = self.max_concurrent or sum(self.cluster_limits.values())
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="pyhpcc-scheduler"
+            )
+            self._poller = ThreadPoolExecutor(
+                max_workers=conf.DEFAULT_FETCH_WORKERS,
+                thread_name_prefix="pyhpcc-scheduler-poll",
+            )
+            self._started_at = time.monotonic()
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="pyhpcc-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+
+    def submit(
+        self,
+        compiled_file,
+        cluster=None,
+        priority=0,
+        options: dict = None,
+        job_name=None,
+    ):
+        """Queue a compiled workunit
+
+        Parameters
+        ----------
+            compiled_file:
+                The compiled ecl file
+            cluster:
+                The cluster to run on. The configured cluster with the most free
+                slots is used if None
+            priority:
+                Jobs with a higher priority are dispatched first. Jobs with the
+                same priority are dispatched in submission order
+            options:
+                dictionary of ecl run options
+            job_name:
+                The workunit job name. Defaults to the compiled file name
+
+        Returns
+        -------
+            job: ScheduledJob
+                The queued job
+
+        Raises
+        ------
+            HPCCException:
+                If the scheduler is shutting down
+            ValueError:
+                If the cluster has no limit and max_concurrent is not set
+        """
+        if (
+            cluster is not None
+            and cluster not in self.cluster_limits
+            and self.max_concurrent is None
+        ):
+            raise ValueError(f"No concurrency limit configured for {cluster}")
+        if job_name is None:
+            job_name = os.path.splitext(os.path.basename(compiled_file))[0]
+        with self._condition:
+            if self._stopping:
+                raise HPCCException("Scheduler is shutting down")
+            job_id = next(self._sequence)
+            job = ScheduledJob(
+                job_id, compiled_file, cluster, priority, options, job_name
+            )
+            heapq.heappush(self._queue, (-priority, job_id, job))
+            self._counts["submitted"] += 1
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job: ScheduledJob):
+        """Cancel a queued job
+
+        Parameters
+        ----------
+            job:
+                The job returned by submit
+
+        Returns
+        -------
+            bool:
+                True if the job was still queued and is now cancelled
+        """
+        with self._condition:
+            if job.status != QUEUED:
+                return False
+            job.status = CANCELLED
+            job.finished_at = time.monotonic()
+            self._counts[CANCELLED] += 1
+            self._condition.notify_all()
+        job._done.set()
+        return True
+
+    def join(self, timeout=None):
+        """Wait for every submitted job to finish
+
+        Parameters
+        ----------
+            timeout:
+                Seconds to wait. Waits forever if None
+
+        Returns
+        -------
+            bool:
+                True if all jobs finished within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending() or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stop accepting jobs and stop the dispatcher once the queue drains
+
+        The dispatcher shuts down the worker threads once the last job
+        finishes, also when wait is False.
+
+        Parameters
+        ----------
+            wait:
+                Block until the dispatcher has stopped
+            cancel_pending:
+                Cancel queued jobs instead of running them
+        """
+        if cancel_pending:
+            with self._condition:
+                queued = [entry[2] for entry in self._queue]
+            for job in queued:
+                self.cancel(job)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if wait and self._dispatcher is not None:
+            self._dispatcher.join()
+
+    def metrics(self):
+        """Throughput and queue wait metrics
+
+        Returns
+        -------
+            metrics: dict
+                Job counts, running jobs per cluster, throughput in finished
+                jobs per minute and queue wait / run time summaries in seconds
+        """
+        with self._condition:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            finished = self._counts[COMPLETED] + self._counts[FAILED]
+            return {
+                "submitted": self._counts["submitted"],
+                "queued": self._pending(),
+                "running": self._active,
+                "running_by_cluster": {
+                    cluster: count for cluster, count in self._running.items() if count
+                },
+                "completed": self._counts[COMPLETED],
+                "failed": self._counts[FAILED],
+                "cancelled": self._counts[CANCELLED],
+                "throughput_per_minute": finished / elapsed * 60 if elapsed else 0.0,
+                "queue_wait": self._summarize(self._queue_waits),
+                "run_time": self._summarize(self._run_times),
+            }
+
+    @staticmethod
+    def _summarize(values):
+        values = list(values)
+        return {
+            "mean": sum(values) / len(values) if values else None,
+            "p50": utils.percentile(values, 50),
+            "p95": utils.percentile(values, 95),
+            "max": max(values) if values else None,
+        }
+
+    def _pending(self):
+        return sum(1 for entry in self._queue if entry[2].status == QUEUED)
+
+    def _capacity(self, cluster):
+        limit = self.cluster_limits.get(cluster)
+        if limit is None:
+            # Clusters without a limit are only bounded by max_concurrent
+            return self.max_concurrent - self._active
+        return limit - self._running[cluster]
+
+    def _pick_cluster(self, job):
+        if job.cluster is not None:
+            return job.cluster if self._capacity(job.cluster) > 0 else None
+        free = [
+            (self._capacity(cluster), -self._running[cluster], cluster)
+            for cluster in self.workunit_submit.clusters
+        ]
+        capacity, _, cluster = max(free)
+        return cluster if capacity > 0 else None
+
+    def _next_dispatchable(self):
+        if self.max_concurrent is not None and self._active >= self.max_concurrent:
+            return None
+        skipped = []
+        job = None
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            candidate = entry[2]
+            if candidate.status != QUEUED:
+                continue
+            cluster = self._pick_cluster(candidate)
+            if cluster is not None:
+                candidate.cluster = cluster
+                job = candidate
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return job
+
+    def _dispatch_loop(self):
+        next_poll = time.monotonic() + self.poll_interval
+        try:
+            while True:
+                with self._condition:
+                    while (job := self._next_dispatchable()) is not None:
+                        job.status = RUNNING
+                        job.started_at = time.monotonic()
+                        self._running[job.cluster] += 1
+                        self._active += 1
+                        self._queue_waits.append(job.queue_wait)
+                        self._counts["dispatched"] += 1
+                        self._executor.submit(self._run, job)
+                    if self._stopping and not self._pending() and not self._active:
+                        return
+                    self._condition.wait(max(0, next_poll - time.monotonic()))
+                if time.monotonic() >= next_poll:
+                    self._poll_running()
+                    next_poll = time.monotonic() + self.poll_interval
+        finally:
+            self._executor.shutdown(wait=False)
+            self._poller.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: ScheduledJob):
+        options = dict(job.options or {})
+        options[conf.CLUSTER_OPTION] = job.cluster
+        options.setdefault(conf.JOB_NAME_OPTION, job.job_name.replace(" ", "_"))
+        log.debug("Dispatching job %s to %s", job.job_id, job.cluster)
+        try:
+            output = self.workunit_submit.bash_run(job.compiled_file, options=options)
+        except Exception as e:
+            self._finish(job, FAILED, e)
+            return
+        job.output = output
+        job.wuid = output["wu_info"][conf.WUID]
+        job.wu_state = output["wu_info"][conf.STATE]
+        if "error" in output or job.wuid is None:
+            messages = output.get("error", {}).get("message", ["No wuid returned"])
+            self._finish(job, FAILED, HPCCException(",".join(messages)))
+        elif job.wu_state in conf.TERMINAL_STATUS:
+            self._finish_with_state(job)
+        else:
+            with self._condition:
+                self._tracked[job.wuid] = job
+
+    def _poll_running(self):
+        # Start a poll only once the previous one finished, so a slow ESP does
+        # not pile up queries
+        if not all(future.done() for future in self._polls):
+            return
+        with self._condition:
+            tracked = list(self._tracked.items())
+        self._polls = [
+            self._poller.submit(self._poll_workunit, wuid, job) for wuid, job in tracked
+        ]
+
+    def _poll_workunit(self, wuid, job: ScheduledJob):
+        try:
+            states = utils.get_workunit_states(self.hpcc.wu_query(Wuid=wuid))
+        except Exception as e:
+            log.warning("Could not poll state of %s: %s", wuid, e)
+            return
+        with self._condition:
+            if self._tracked.get(wuid) is not job:
+                return
+            if wuid in states:
+                job.wu_state = states[wuid]
+        if job.wu_state in conf.TERMINAL_STATUS:
+            self._finish_with_state(job)
+
+    def _finish_with_state(self, job: ScheduledJob):
+        if job.wu_state in conf.FAILED_STATUS:
+            self._finish(job, FAILED, HPCCException(f"Workunit {job.wu_state}"))
+        else:
+            self._finish(job, COMPLETED)
+
+    def _finish(self, job: ScheduledJob, status, error=None):
+        with self._condition:
+            job.status = status
+            job.error = error
+            job.finished_at = time.monotonic()
+            self._tracked.pop(job.wuid, None)
+            self._running[job.cluster] -= 1
+            self._active -= 1
+            self._run_times.append(job.run_time)
+            self._counts[status] += 1
+            self._condition.notify_all()
+        if error is not None:
+            log.warning("Job %s failed: %s", job.job_id, error)
+        job._done.set()
@@ -0,0 +1,201 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+import pyhpcc.config as conf
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+log = logging.getLogger(__name__)
+
+
+class SingleFlightSubmit(object):
+    """
+    Deduplicates identical workunit submissions made through WorkunitSubmit
+
+    Concurrent submissions of the same query text with the same compile and run
+    options share one compile and run, and every caller receives its own copy
+    of the compile output, run output and wuid, so callers can change their
+    results without affecting each other. With a reuse window, submissions that
+    arrive shortly after an identical one succeeded get its results as well.
+    Runs that reported errors or ended in a failed state are not reused.
+
+    Attributes
+    ----------
+        workunit_submit:
+            WorkunitSubmit object used to compile and run the queries
+        working_folder:
+            The folder to write the ecl files to
+        reuse_window:
+            Seconds a successful result is reused for identical submissions.
+            0 only shares submissions that are still in flight
+        max_entries:
+            Number of successful results kept for the reuse window, the oldest
+            are dropped first
+
+    Methods
+    -------
+        submit:
+            Compile and run a query, sharing the work with identical submissions
+
+        submission_key:
+            Hash of the query text, compile options and run options
+
+        stats:
+            Counts of executed, shared and reused submissions
+    """
+
+    def __init__(
+        self,
+        workunit_submit: WorkunitSubmit,
+        working_folder,
+        reuse_window=0,
+        max_entries=conf.SINGLE_FLIGHT_MAX_ENTRIES,
+    ):
+        self.workunit_submit = workunit_submit
+        self.working_folder = working_folder
+        self.reuse_window = reuse_window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._completed = OrderedDict()
+        self._counts = Counter()
+
+    @staticmethod
+    def submission_key(query_text, compile_options=None, run_options=None):
+        """Hash of the query text, compile options and run options
+
+        Parameters
+        ----------
+            query_text:
+                The ecl query
+            compile_options:
+                dictionary of eclcc compiler options
+            run_options:
+                dictionary of ecl run options
+
+        Returns
+        -------
+            key: str
+                sha256 hex digest identifying the submission
+        """
+        payload = json.dumps(
+            [query_text, compile_options or {}, run_options or {}],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(
+        self,
+        query_text,
+        job_name,
+        compile_options: dict = None,
+        run_options: dict = None,
+    ):
+        """Compile and run a query, sharing the work with identical submissions
+
+        Parameters
+        ----------
+            query_text:
+                The ecl query
+            job_name:
+                The name of the ecl file and workunit. Submissions that share a
+                run keep the job name of the first one
+            compile_options:
+                dictionary of eclcc compiler options
+            run_options:
+                dictionary of ecl run options
+
+        Returns
+        -------
+            compile_output:
+                Parsed output from bash_compile
+            run_output:
+                Parsed output from bash_run
+
+        Raises
+        ------
+            HPCCException:
+                If the shared compile or run failed
+        """
+        key = self.submission_key(query_text, compile_options, run_options)
+        with self._lock:
+            self._evict_expired()
+            if key in self._completed:
+                self._counts["reused"] += 1
+                return copy.deepcopy(self._completed[key][1])
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self._counts["executed"] += 1
+            else:
+                self._counts["shared"] += 1
+        if not leader:
+            log.debug("Sharing in-flight submission %s", key)
+            return copy.deepcopy(future.result())
+        # The entry is removed and the future completed whatever the leader
+        # raises, so followers are never left waiting
+        try:
+            result = self.workunit_submit.submit_query(
+                query_text,
+                self.working_folder,
+                job_name,
+                compile_options=compile_options,
+                run_options=run_options,
+            )
+            with self._lock:
+                if self.reuse_window > 0 and _succeeded(result):
+                    self._completed[key] = (time.monotonic(), result)
+                    while len(self._completed) > self.max_entries:
+                        self._completed.popitem(last=False)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            if not future.done():
+                future.set_exception(HPCCException("Shared submission was interrupted"))
+        return copy.deepcopy(result)
+
+    def stats(self):
+        """Counts of executed, shared and reused submissions
+
+        Returns
+        -------
+            stats: dict
+                executed: submissions that compiled and ran,
+                shared: submissions that joined an in-flight one,
+                reused: submissions answered from the reuse window
+        """
+        with self._lock:
+            return {
+                "executed": self._counts["executed"],
+                "shared": self._counts["shared"],
+                "reused": self._counts["reused"],
+            }
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.reuse_window
+        while self._completed:
+            key, (completed_at, _) = next(iter(self._completed.items()))
+            if completed_at > cutoff:
+                break
+            del self._completed[key]
+
+
+def _succeeded(result):
+    _, run_output = result
+    if not isinstance(run_output, dict) or run_output.get("error"):
+        return False
+    state = (run_output.get("wu_info") or {}).get(conf.STATE)
+    return state not in conf.FAILED_STATUS
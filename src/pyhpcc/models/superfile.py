@@ -0,0 +1,443 @@
+import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pyhpcc.config as conf
+from pyhpcc.cache import TTLCache
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import DFUInfoResponse, SuperfileActionResponse
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SuperfileNode(object):
+    """
+    A logical file in a resolved superfile tree
+
+    Attributes
+    ----------
+        name:
+            Logical name of the file
+        info:
+            DFUInfo of the file
+        children:
+            Nodes of the subfiles, empty for a logical file
+    """
+
+    name: str
+    info: DFUInfoResponse = None
+    children: list = field(default_factory=list)
+
+    @property
+    def is_superfile(self):
+        return self.info.is_superfile
+
+    def leaves(self):
+        """Logical files under the node, each once, in tree order"""
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.children or node.is_superfile:
+                stack.extend(reversed(node.children))
+            elif node.name.lower() not in seen:
+                seen.add(node.name.lower())
+                yield node
+
+    @property
+    def total_size(self):
+        """Total size in bytes of the logical files under the node"""
+        return sum(leaf.info.file_size or 0 for leaf in self.leaves())
+
+    @property
+    def total_records(self):
+        """Total record count of the logical files under the node"""
+        return sum(leaf.info.record_count or 0 for leaf in self.leaves())
+
+    @property
+    def depth(self):
+        """Levels of superfiles under the node, 0 for a logical file"""
+        if not self.children:
+            return 0
+        return 1 + max(child.depth for child in self.children)
+
+
+class SuperfileResolver(object):
+    """
+    Expands nested superfiles into trees of their logical files
+
+    Each level of the tree is fetched with concurrent DFUInfo calls. DFUInfo
+    responses are cached by name, so trees sharing subfiles and repeated
+    resolves within the cache ttl cost no further calls.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        max_workers:
+            Number of DFUInfo calls made in parallel
+        cache:
+            TTLCache of DFUInfo responses by lowercase name
+
+    Methods
+    -------
+        fetch_info:
+            Get the DFUInfo of a file
+
+        resolve:
+            Expand a superfile into a tree
+
+        invalidate:
+            Drop a file from the cache
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        cache: TTLCache = None,
+    ):
+        self.hpcc = hpcc
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else TTLCache()
+
+    def fetch_info(self, logical_name):
+        """Get the DFUInfo of a file
+
+        Parameters
+        ----------
+            logical_name:
+                The logical file name
+
+        Returns
+        -------
+            info: DFUInfoResponse
+                The DFUInfo of the file, from the cache if it holds it
+        """
+        key = logical_name.lstrip("~").lower()
+        info = self.cache.get(key)
+        if info is None:
+            info = DFUInfoResponse.from_response(
+                self.hpcc.get_subfile_info(Name=logical_name)
+            )
+            self.cache.set(key, info)
+        return info
+
+    def resolve(self, logical_name):
+        """Expand a superfile into a tree
+
+        Parameters
+        ----------
+            logical_name:
+                The logical name of the superfile or file
+
+        Returns
+        -------
+            tree: SuperfileNode
+                The root of the tree
+
+        Raises
+        ------
+            HPCCException:
+                If a superfile contains itself, or a DFUInfo call fails
+        """
+        root = SuperfileNode(logical_name)
+        frontier = [(root, (logical_name.lstrip("~").lower(),))]
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-superfile"
+        ) as executor:
+            while frontier:
+                names = list({path[-1]: node.name for node, path in frontier}.items())
+                infos = dict(
+                    zip(
+                        (key for key, _ in names),
+                        executor.map(self.fetch_info, (name for _, name in names)),
+                    )
+                )
+                next_frontier = []
+                for node, path in frontier:
+                    node.info = infos[path[-1]]
+                    if not node.info.is_superfile:
+                        continue
+                    for subfile in node.info.subfiles:
+                        key = subfile.lstrip("~").lower()
+                        if key in path:
+                            raise HPCCException(
+                                "Superfile cycle: %s" % " -> ".join(path + (key,))
+                            )
+                        child = SuperfileNode(subfile)
+                        node.children.append(child)
+                        next_frontier.append((child, path + (key,)))
+                frontier = next_frontier
+        log.debug("Resolved %s to %d levels", logical_name, root.depth)
+        return root
+
+    def invalidate(self, logical_name):
+        """Drop a file from the cache
+
+        Parameters
+        ----------
+            logical_name:
+                The logical file name, e.g. of a superfile that was changed
+        """
+        self.cache.invalidate(logical_name.lstrip("~").lower())
+
+
+@dataclass(slots=True)
+class SuperfileOperation(object):
+    """
+    An operation of a SuperfileTransaction and its outcome
+
+    Attributes
+    ----------
+        superfile:
+            Logical name of the superfile
+        action:
+            add, remove, clear or swap
+        subfiles:
+            Subfiles added or removed. For swap, the subfiles removed
+        added:
+            For swap, the subfiles added
+        delete:
+            Delete the removed subfiles
+        status:
+            pending, ok, failed, or skipped after an earlier operation on the
+            same superfile failed
+        error:
+            Error message of a failed operation
+    """
+
+    superfile: str
+    action: str
+    subfiles: list = field(default_factory=list)
+    added: list = field(default_factory=list)
+    delete: bool = False
+    status: str = "pending"
+    error: str = None
+
+
+class SuperfileTransaction(object):
+    """
+    Batches superfile maintenance into as few SuperfileAction calls as possible
+
+    Operations are queued with add, remove, clear and swap and run by commit.
+    Consecutive adds, or removes with the same delete flag, on a superfile are
+    merged into one SuperfileAction call. The calls of a superfile run in the
+    order the operations were queued, and different superfiles run
+    concurrently. A swap adds the new subfiles before it removes the old ones.
+    Each SuperfileAction call is applied atomically by ESP, the transaction as
+    a whole is not: after a failure the remaining operations of that
+    superfile are skipped and other superfiles are unaffected. If a resolver
+    is given, every superfile the commit touched, and every subfile it
+    deleted, is dropped from its cache.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        max_workers:
+            Number of superfiles updated in parallel
+        resolver:
+            Optional SuperfileResolver whose cache is invalidated on commit
+        operations:
+            Queued operations, with their outcomes after commit
+
+    Methods
+    -------
+        add:
+            Queue adding subfiles to a superfile
+
+        remove:
+            Queue removing subfiles from a superfile
+
+        clear:
+            Queue removing every subfile of a superfile
+
+        swap:
+            Queue replacing subfiles of a superfile
+
+        commit:
+            Run the queued operations
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        resolver: SuperfileResolver = None,
+    ):
+        self.hpcc = hpcc
+        self.max_workers = max_workers
+        self.resolver = resolver
+        self.operations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def add(self, superfile, subfiles):
+        """Queue adding subfiles to a superfile
+
+        Parameters
+        ----------
+            superfile:
+                Logical name of the superfile
+            subfiles:
+                Logical names of the subfiles, added in order
+        """
+        return self._queue(SuperfileOperation(superfile, "add", list(subfiles)))
+
+    def remove(self, superfile, subfiles, delete=False):
+        """Queue removing subfiles from a superfile
+
+        Parameters
+        ----------
+            superfile:
+                Logical name of the superfile
+            subfiles:
+                Logical names of the subfiles
+            delete:
+                Delete the subfiles once removed
+        """
+        return self._queue(
+            SuperfileOperation(superfile, "remove", list(subfiles), delete=delete)
+        )
+
+    def clear(self, superfile, delete=False):
+        """Queue removing every subfile of a superfile
+
+        Parameters
+        ----------
+            superfile:
+                Logical name of the superfile
+            delete:
+                Delete the subfiles once removed
+        """
+        return self._queue(SuperfileOperation(superfile, "clear", delete=delete))
+
+    def swap(self, superfile, remove, add, delete=False):
+        """Queue replacing subfiles of a superfile, e.g. to rotate generations
+
+        Parameters
+        ----------
+            superfile:
+                Logical name of the superfile
+            remove:
+                Logical names of the subfiles removed
+            add:
+                Logical names of the subfiles added in their place
+            delete:
+                Delete the removed subfiles
+        """
+        return self._queue(
+            SuperfileOperation(superfile, "swap", list(remove), list(add), delete)
+        )
+
+    def commit(self):
+        """Run the queued operations
+
+        Returns
+        -------
+            operations: list
+                The SuperfileOperations in the order they were queued, with
+                their status and error
+        """
+        superfiles = OrderedDict()
+        for operation in self.operations:
+            if operation.status == "pending":
+                key = operation.superfile.lstrip("~").lower()
+                superfiles.setdefault(key, []).append(operation)
+        if superfiles:
+            with ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="pyhpcc-superfile",
+            ) as executor:
+                list(executor.map(self._run, superfiles.values()))
+        return self.operations
+
+    def _queue(self, operation):
+        self.operations.append(operation)
+        return operation
+
+    def _run(self, operations):
+        calls = []
+        for operation in operations:
+            for action, subfiles in _calls(operation):
+                delete = operation.delete and action == "remove"
+                last = calls[-1] if calls else None
+                if (
+                    last is not None
+                    and (last[0], last[1]) == (action, delete)
+                    and "*" not in last[2]
+                    and "*" not in subfiles
+                ):
+                    last[2].extend(subfiles)
+                    if last[3][-1] is not operation:
+                        last[3].append(operation)
+                else:
+                    calls.append((action, delete, list(subfiles), [operation]))
+        superfile = operations[0].superfile
+        failed = None
+        try:
+            for action, delete, subfiles, call_operations in calls:
+                if failed is not None:
+                    for operation in call_operations:
+                        if operation.status == "pending":
+                            operation.status = "skipped"
+                    continue
+                try:
+                    self._superfile_action(superfile, action, subfiles, delete)
+                except Exception as e:
+                    log.warning(
+                        "SuperfileAction %s on %s failed: %s", action, superfile, e
+                    )
+                    failed = e
+                    for operation in call_operations:
+                        operation.status = "failed"
+                        operation.error = str(e)
+                    continue
+                if self.resolver is not None and delete:
+                    for subfile in subfiles:
+                        self.resolver.invalidate(subfile)
+        finally:
+            # Even a failed call may have changed the superfile
+            if self.resolver is not None:
+                self.resolver.invalidate(superfile)
+        for operation in operations:
+            if operation.status == "pending":
+                operation.status = "ok"
+
+    def _superfile_action(self, superfile, action, subfiles, delete):
+        request = {
+            "action": action,
+            "superfile": superfile,
+            "subfiles": subfiles,
+            "delete": delete,
+        }
+        resp = self.hpcc.superfile_action(
+            data=json.dumps({"SuperfileActionRequest": request}),
+            headers={"Content-Type": "application/json"},
+        )
+        result = SuperfileActionResponse.from_response(resp)
+        if result.retcode != 0:
+            raise HPCCException(
+                "SuperfileAction %s returned %d" % (action, result.retcode)
+            )
+        return result
+
+
+def _calls(operation):
+    if operation.action == "clear":
+        return [("remove", ["*"])]
+    if operation.action == "swap":
+        # Add first, so readers never see the superfile without a generation
+        # and a failed remove leaves extra data rather than missing data
+        return [("add", operation.added), ("remove", operation.subfiles)]
+    return [(operation.action, operation.subfiles)]
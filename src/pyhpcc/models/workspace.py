@@ -0,0 +1,162 @@
+import glob
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+from pyhpcc.config import WORKSPACE_PREFIX, WORKSPACE_ROOTS
+from pyhpcc.errors import HPCCException
+
+log = logging.getLogger(__name__)
+
+
+class EclWorkspace(object):
+    """
+    Temporary workspace for generated ecl files and compiler output
+
+    A single directory, preferably on a memory backed filesystem such as
+    /dev/shm, is created on first use and reused for every job. Each job gets
+    a unique file name, so jobs with identical job names do not collide, and
+    its .ecl, .eclxml and .eclxml.xml files are removed when the job is released.
+
+    Attributes
+    ----------
+        root:
+            Directory the workspace is created in. Defaults to the first
+            writable directory in WORKSPACE_ROOTS, else the system temp directory
+        prefix:
+            Prefix of the workspace directory name
+        path:
+            The workspace directory, None until the first file is written
+
+    Methods
+    -------
+        write:
+            Write an ecl query to a unique file
+
+        release:
+            Remove a job's ecl file and the files compiled from it
+
+        job:
+            Context manager that writes a query and releases it on exit
+
+        cleanup:
+            Remove the workspace directory
+    """
+
+    def __init__(self, root=None, prefix=WORKSPACE_PREFIX):
+        self.root = root if root is not None else default_workspace_root()
+        self.prefix = prefix
+        self.path = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def directory(self):
+        """Get the workspace directory, creating it on first use
+
+        Returns
+        -------
+            path: str
+                The workspace directory
+        """
+        with self._lock:
+            if self.path is None:
+                self.path = tempfile.mkdtemp(prefix=self.prefix, dir=self.root)
+                log.debug("Created ecl workspace %s", self.path)
+            return self.path
+
+    def write(self, query_text, job_name):
+        """Write an ecl query to a unique file
+
+        Parameters
+        ----------
+            query_text:
+                The ecl query
+            job_name:
+                The job name used as the start of the file name
+
+        Returns
+        -------
+            file_name:
+                The path of the ecl file written
+
+        Raises
+        ------
+            HPCCException:
+                If the file could not be written
+        """
+        stem = "_".join(job_name.split()) + "_" + uuid.uuid4().hex[:12]
+        file_name = os.path.join(self.directory(), stem + ".ecl")
+        try:
+            with open(file_name, "w") as f:
+                f.write(query_text)
+        except OSError as e:
+            raise HPCCException("Could not write file: " + str(e))
+        return file_name
+
+    def release(self, file_name):
+        """Remove a job's ecl file and the files compiled from it
+
+        Parameters
+        ----------
+            file_name:
+                The ecl file returned by write
+        """
+        stem = os.path.splitext(file_name)[0]
+        for path in glob.glob(glob.escape(stem) + ".*"):
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning("Could not remove %s: %s", path, e)
+
+    @contextmanager
+    def job(self, query_text, job_name):
+        """Context manager that writes a query and releases it on exit
+
+        Parameters
+        ----------
+            query_text:
+                The ecl query
+            job_name:
+                The job name used as the start of the file name
+
+        Returns
+        -------
+            file_name:
+                The path of the ecl file written
+        """
+        file_name = self.write(query_text, job_name)
+        try:
+            yield file_name
+        finally:
+            self.release(file_name)
+
+    def cleanup(self):
+        """Remove the workspace directory and everything left in it"""
+        with self._lock:
+            if self.path is not None:
+                shutil.rmtree(self.path, ignore_errors=True)
+                self.path = None
+
+
+def default_workspace_root():
+    """
+    Get the directory temporary workspaces are created in
+
+    Returns
+    -------
+    str
+        The first writable directory in WORKSPACE_ROOTS, else the system temp directory
+    """
+    for root in WORKSPACE_ROOTS:
+        if os.path.isdir(root) and os.access(root, os.W_OK | os.X_OK):
+            return root
+    return tempfile.gettempdir()
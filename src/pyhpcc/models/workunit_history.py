@@ -0,0 +1,281 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+
+import pyhpcc.config as conf
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import ECLWorkunit, WUQueryResponse
+
+log = logging.getLogger(__name__)
+
+
+class WorkunitHistoryExporter(object):
+    """
+    Exports the workunits of a date range, fetching WUQuery pages in parallel
+
+    The range is split into windows of window seconds, read in order. The
+    first page of a window is fetched first to learn its workunit count, then
+    its remaining pages, and the next window starts once they are all queued.
+    Pages are fetched by max_workers threads, at most max_workers + prefetch
+    pages ahead of the consumer. Pages are sorted by Wuid, so
+    workunits created during the export are added after the pages already
+    read. Windows include both ends, so a workunit on a boundary can be
+    returned by two windows. It is only exported once: the wuids of a window
+    are kept until both of its neighbours have been read.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        window:
+            Seconds of history per WUQuery window
+        page_size:
+            Number of workunits fetched per WUQuery call
+        max_workers:
+            Number of pages fetched in parallel
+        prefetch:
+            Number of pages fetched ahead of the consumer on top of max_workers
+        filters:
+            Other WUQuery parameters applied to every query, e.g. Cluster or State
+
+    Methods
+    -------
+        windows:
+            Split a date range into windows
+
+        fetch_page:
+            Fetch one page of a window
+
+        iter_workunits:
+            Get the workunits of a date range
+
+        iter_batches:
+            Get the workunits of a date range as lists of dictionaries
+
+        iter_arrow_batches:
+            Get the workunits of a date range as pyarrow RecordBatches
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        window=conf.WU_HISTORY_WINDOW,
+        page_size=conf.DEFAULT_WU_PAGE_SIZE,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        prefetch=2,
+        **filters,
+    ):
+        self.hpcc = hpcc
+        self.window = window
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self.filters = filters
+
+    def windows(self, start, end=None):
+        """Split a date range into windows
+
+        Parameters
+        ----------
+            start:
+                datetime the range starts at, naive datetimes are UTC
+            end:
+                datetime the range ends at. Defaults to now
+
+        Returns
+        -------
+            windows: list
+                (StartDate, EndDate) of each window, formatted for WUQuery
+        """
+        start = _utc(start)
+        end = _utc(end) if end is not None else datetime.now(timezone.utc)
+        step = timedelta(seconds=self.window)
+        windows = []
+        while start < end:
+            window_end = min(start + step, end)
+            windows.append((_esp_date(start), _esp_date(window_end)))
+            start = window_end
+        return windows
+
+    def fetch_page(self, window, page_start):
+        """Fetch one page of a window
+
+        Parameters
+        ----------
+            window:
+                (StartDate, EndDate) of the window
+            page_start:
+                Index of the first workunit
+
+        Returns
+        -------
+            page: WUQueryResponse
+                The workunits of the page and the number in the window
+        """
+        resp = self.hpcc.wu_query(
+            StartDate=window[0],
+            EndDate=window[1],
+            PageStartFrom=page_start,
+            PageSize=self.page_size,
+            Sortby="Wuid",
+            Descending=0,
+            **self.filters,
+        )
+        return WUQueryResponse.from_response(resp)
+
+    def iter_workunits(self, start, end=None):
+        """Get the workunits of a date range
+
+        Parameters
+        ----------
+            start:
+                datetime the range starts at, naive datetimes are UTC
+            end:
+                datetime the range ends at. Defaults to now
+
+        Returns
+        -------
+            Generator of ECLWorkunit
+        """
+        windows = self.windows(start, end)
+        next_window = iter(enumerate(windows))
+        # Wuids of each window still needed to drop the duplicates of its
+        # neighbours, and the pages left to read of each started window
+        seen = {}
+        pages_left = {}
+        done = set()
+        exported = 0
+        todo = deque()
+        pending = deque()
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-wuhistory"
+        )
+        try:
+            while True:
+                while len(pending) < self.max_workers + self.prefetch:
+                    if todo:
+                        index, page_start = todo.popleft()
+                    else:
+                        index, _ = next(next_window, (None, None))
+                        if index is None:
+                            break
+                        page_start = 0
+                    future = executor.submit(
+                        self.fetch_page, windows[index], page_start
+                    )
+                    pending.append((index, page_start, future))
+                if not pending:
+                    break
+                index, page_start, future = pending.popleft()
+                page = future.result()
+                if page_start == 0:
+                    starts = range(self.page_size, page.num_wus, self.page_size)
+                    todo.extend((index, next_start) for next_start in starts)
+                    pages_left[index] = len(starts) + 1
+                    seen[index] = set()
+                nearby = [seen[index], seen.get(index - 1, ()), seen.get(index + 1, ())]
+                for workunit in page.workunits:
+                    if not any(workunit.wuid in wuids for wuids in nearby):
+                        seen[index].add(workunit.wuid)
+                        exported += 1
+                        yield workunit
+                pages_left[index] -= 1
+                if pages_left[index] == 0:
+                    done.add(index)
+                    for finished in (index - 1, index, index + 1):
+                        if all(
+                            i in done
+                            for i in (finished - 1, finished, finished + 1)
+                            if 0 <= i < len(windows)
+                        ):
+                            seen.pop(finished, None)
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+        log.debug("Exported %d workunits", exported)
+
+    def iter_batches(self, start, end=None, batch_size=conf.DEFAULT_WU_BATCH_SIZE):
+        """Get the workunits of a date range as lists of dictionaries
+
+        Parameters
+        ----------
+            start:
+                datetime the range starts at, naive datetimes are UTC
+            end:
+                datetime the range ends at. Defaults to now
+            batch_size:
+                Number of workunits per batch
+
+        Returns
+        -------
+            Generator of lists of at most batch_size dictionaries with the
+            ECLWorkunit fields
+        """
+        batch = []
+        for workunit in self.iter_workunits(start, end):
+            batch.append({name: getattr(workunit, name) for name in _FIELD_NAMES})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def iter_arrow_batches(
+        self, start, end=None, batch_size=conf.DEFAULT_WU_BATCH_SIZE, schema=None
+    ):
+        """Get the workunits of a date range as pyarrow RecordBatches
+
+        Every batch has the same schema, so the batches can be written to one
+        Parquet file or IPC stream.
+
+        Parameters
+        ----------
+            start:
+                datetime the range starts at, naive datetimes are UTC
+            end:
+                datetime the range ends at. Defaults to now
+            batch_size:
+                Number of workunits per batch
+            schema:
+                Optional pyarrow.Schema of the batches. Defaults to the
+                ECLWorkunit fields with their types
+
+        Returns
+        -------
+            Generator of pyarrow.RecordBatch with the ECLWorkunit fields
+
+        Raises
+        ------
+            HPCCException:
+                If pyarrow is not installed
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise HPCCException("pyarrow is required for Arrow output")
+        if schema is None:
+            schema = _workunit_schema(pa)
+        for batch in self.iter_batches(start, end, batch_size):
+            yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(ECLWorkunit))
+
+
+def _workunit_schema(pa):
+    types = {str: pa.string(), int: pa.int64(), bool: pa.bool_()}
+    return pa.schema([(f.name, types[f.type]) for f in fields(ECLWorkunit)])
+
+
+def _utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _esp_date(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,304 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyhpcc.config as conf
+from pyhpcc import utils
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+
+log = logging.getLogger(__name__)
+
+
+class WorkunitResultReader(object):
+    """
+    Reads a workunit result page by page, fetching pages in parallel
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        wuid:
+            The Wuid of the workunit
+        sequence:
+            The sequence number of the result. Either sequence or result_name is required
+        result_name:
+            The name of the result. Either sequence or result_name is required
+        page_size:
+            Number of rows fetched per WUResult call
+        max_workers:
+            Number of pages fetched in parallel
+        prefetch:
+            Number of pages fetched ahead of the consumer on top of max_workers
+        dtypes:
+            Optional dictionary of column to dtype applied to every DataFrame batch
+
+    Methods
+    -------
+        get_total:
+            Get the total number of rows in the result
+
+        iter_rows:
+            Get the rows of the result in pages
+
+        iter_batches:
+            Get the result as DataFrame batches
+
+        iter_arrow_batches:
+            Get the result as pyarrow RecordBatches
+
+        read:
+            Read the result into a DataFrame
+
+        read_arrow:
+            Read the result into a pyarrow Table
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        wuid,
+        sequence=None,
+        result_name=None,
+        page_size=conf.DEFAULT_RESULT_PAGE_SIZE,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        prefetch=2,
+        dtypes: dict = None,
+    ):
+        if (sequence is None) == (result_name is None):
+            raise ValueError("Specify exactly one of sequence or result_name")
+        self.hpcc = hpcc
+        self.wuid = wuid
+        self.sequence = sequence
+        self.result_name = result_name
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self.dtypes = dtypes
+        self.total = None
+
+    def fetch_page(self, start, count):
+        """Fetch one page of the result
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to fetch
+
+        Returns
+        -------
+            data_attr: dict
+                start, count, total and requested values of the page
+            rows: list
+                The rows of the page
+        """
+        resp = self.hpcc.get_wu_result(
+            Wuid=self.wuid,
+            Sequence=self.sequence,
+            ResultName=self.result_name,
+            Start=start,
+            Count=count,
+        )
+        data = utils.get_data_from_response(resp)
+        if data is None:
+            return {"start": start, "count": 0}, []
+        data_attr, rows = data
+        if "total" in data_attr:
+            self.total = data_attr["total"]
+        return data_attr, rows
+
+    def get_total(self):
+        """Get the total number of rows in the result
+
+        Returns
+        -------
+            total: int
+                Number of rows in the result
+        """
+        if self.total is None:
+            self.fetch_page(0, 1)
+        return self.total
+
+    def iter_rows(self, start=0, count=-1):
+        """Get the rows of the result in pages
+
+        The first page is fetched on its own to learn the total row count.
+        The remaining pages are fetched by max_workers threads, at most
+        max_workers + prefetch pages ahead of the consumer, and yielded in order.
+        If ESP returns fewer rows than a page asked for, the missing rows are
+        fetched before the next page is yielded.
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to read. -1 reads to the end of the result
+
+        Returns
+        -------
+            Generator of data_attr, rows for each page
+        """
+        end = None if count == -1 else start + count
+        first_count = self.page_size if end is None else min(self.page_size, count)
+        data_attr, rows = self.fetch_page(start, first_count)
+        if not rows:
+            return
+        yield data_attr, rows
+        if self.total is not None:
+            end = self.total if end is None else min(end, self.total)
+        if end is None:
+            yield from self._iter_sequential(start + len(rows))
+            return
+        yield from self._iter_sequential(
+            start + len(rows), min(start + first_count, end)
+        )
+        starts = iter(range(start + self.page_size, end, self.page_size))
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-wuresult"
+        )
+        pending = deque()
+        try:
+            for page_start in starts:
+                pending.append(self._submit(executor, page_start, end))
+                if len(pending) >= self.max_workers + self.prefetch:
+                    break
+            while pending:
+                page_start, page_end, future = pending.popleft()
+                data_attr, rows = future.result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    pending.append(self._submit(executor, next_start, end))
+                if not rows:
+                    return
+                yield data_attr, rows
+                # A short page leaves a gap before the next page
+                yield from self._iter_sequential(page_start + len(rows), page_end)
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_batches(self, start=0, count=-1):
+        """Get the result as DataFrame batches
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to read. -1 reads to the end of the result
+
+        Returns
+        -------
+            Generator of data_attr, pd.DataFrame for each page
+        """
+        for data_attr, rows in self.iter_rows(start, count):
+            yield data_attr, self._to_dataframe(rows)
+
+    def iter_arrow_batches(self, start=0, count=-1, schema=None):
+        """Get the result as pyarrow RecordBatches
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to read. -1 reads to the end of the result
+            schema:
+                Optional pyarrow.Schema of the batches
+
+        Returns
+        -------
+            Generator of pyarrow.RecordBatch for each page
+
+        Raises
+        ------
+            HPCCException:
+                If pyarrow is not installed
+        """
+        pa = _import_pyarrow()
+        for _, rows in self.iter_rows(start, count):
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+    def read(self, start=0, count=-1):
+        """Read the result into a DataFrame
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to read. -1 reads to the end of the result
+
+        Returns
+        -------
+            data: pd.DataFrame
+                The rows of the result
+        """
+        rows = []
+        for _, page in self.iter_rows(start, count):
+            rows.extend(page)
+        return self._to_dataframe(rows)
+
+    def read_arrow(self, start=0, count=-1, schema=None):
+        """Read the result into a pyarrow Table
+
+        Parameters
+        ----------
+            start:
+                Index of the first row
+            count:
+                Number of rows to read. -1 reads to the end of the result
+            schema:
+                Optional pyarrow.Schema of the table
+
+        Returns
+        -------
+            table: pyarrow.Table
+                The rows of the result
+
+        Raises
+        ------
+            HPCCException:
+                If pyarrow is not installed
+        """
+        pa = _import_pyarrow()
+        batches = list(self.iter_arrow_batches(start, count, schema))
+        if not batches:
+            return pa.Table.from_pylist([], schema=schema)
+        return pa.Table.from_batches(batches)
+
+    def _submit(self, executor, page_start, end):
+        page_end = min(page_start + self.page_size, end)
+        future = executor.submit(self.fetch_page, page_start, page_end - page_start)
+        return page_start, page_end, future
+
+    def _iter_sequential(self, start, end=None):
+        while end is None or start < end:
+            count = self.page_size if end is None else min(self.page_size, end - start)
+            data_attr, rows = self.fetch_page(start, count)
+            if not rows:
+                return
+            yield data_attr, rows
+            start += len(rows)
+
+    def _to_dataframe(self, rows):
+        import pandas as pd
+
+        df = pd.json_normalize(rows)
+        if self.dtypes:
+            df = df.astype(
+                {col: dtype for col, dtype in self.dtypes.items() if col in df.columns}
+            )
+        return df
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise HPCCException("pyarrow is required for Arrow output")
+    return pyarrow
@@ -0,0 +1,352 @@
+import csv
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pyhpcc.config as conf
+from pyhpcc import utils
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import WUInfoResponse
+
+log = logging.getLogger(__name__)
+
+COLUMNS = (
+    "wuid",
+    "cluster",
+    "job_name",
+    "owner",
+    "state",
+    "kind",
+    "name",
+    "value",
+    "seconds",
+    "count",
+    "graph_name",
+    "subgraph_id",
+)
+
+
+def timer_rows(info: WUInfoResponse, include_graphs=True):
+    """
+    Normalize the timers of a WUInfo response into rows
+
+    Parameters
+    ----------
+    info : WUInfoResponse
+        The WUInfo of a workunit, with timers and graphs
+    include_graphs : bool
+        Add a row per graph with the time from its start to its finish
+
+    Returns
+    -------
+    list
+        A dictionary per timer with the keys in COLUMNS. kind is timer or graph
+    """
+    workunit = info.workunit
+    base = {
+        "wuid": workunit.wuid,
+        "cluster": workunit.cluster,
+        "job_name": workunit.job_name,
+        "owner": workunit.owner,
+        "state": workunit.state,
+    }
+    rows = [
+        dict(
+            base,
+            kind="timer",
+            name=timer.name,
+            value=timer.value,
+            seconds=utils.parse_duration(timer.value),
+            count=timer.count,
+            graph_name=timer.graph_name,
+            subgraph_id=timer.subgraph_id,
+        )
+        for timer in info.timers
+    ]
+    if include_graphs:
+        rows.extend(
+            dict(
+                base,
+                kind="graph",
+                name=graph.name,
+                value=None,
+                seconds=_elapsed(graph.when_started, graph.when_finished),
+                count=1,
+                graph_name=graph.name,
+                subgraph_id=None,
+            )
+            for graph in info.graphs
+        )
+    return rows
+
+
+class WorkunitStatsCollector(object):
+    """
+    Collects the WUInfo timers of many workunits into a table
+
+    WUInfo calls are made by max_workers threads, at most max_workers +
+    prefetch ahead of the consumer. Each timer becomes a row of COLUMNS, so
+    runtimes can be compared across workunits, releases and clusters.
+    Workunits whose WUInfo fails or is malformed are logged and skipped.
+
+    Attributes
+    ----------
+        hpcc:
+            The hpcc object
+        max_workers:
+            Number of WUInfo calls made in parallel
+        prefetch:
+            Number of workunits fetched ahead of the consumer on top of max_workers
+        include_graphs:
+            Add a row per graph with its elapsed time
+        failed:
+            Wuids whose WUInfo failed or was malformed in the last collection
+
+    Methods
+    -------
+        fetch:
+            Get the WUInfo of a workunit
+
+        iter_rows:
+            Get the timer rows of many workunits
+
+        to_dataframe:
+            Collect the timer rows into a DataFrame
+
+        write:
+            Collect the timer rows into a CSV or Parquet file
+    """
+
+    def __init__(
+        self,
+        hpcc: HPCC,
+        max_workers=conf.DEFAULT_FETCH_WORKERS,
+        prefetch=2,
+        include_graphs=True,
+    ):
+        self.hpcc = hpcc
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self.include_graphs = include_graphs
+        self.failed = []
+
+    def fetch(self, wuid):
+        """Get the WUInfo of a workunit with only its timers and graphs
+
+        Parameters
+        ----------
+            wuid:
+                Wuid of the workunit
+
+        Returns
+        -------
+            info: WUInfoResponse
+                The WUInfo of the workunit
+        """
+        resp = self.hpcc.get_wu_info(
+            Wuid=wuid,
+            TruncateEclTo64k=1,
+            IncludeExceptions=0,
+            IncludeGraphs=int(self.include_graphs),
+            IncludeSourceFiles=0,
+            IncludeResults=0,
+            IncludeResultsViewNames=0,
+            IncludeVariables=0,
+            IncludeTimers=1,
+            IncludeResourceURLs=0,
+            IncludeDebugValues=0,
+            IncludeApplicationValues=0,
+            IncludeWorkflows=0,
+            IncludeXmlSchemas=0,
+            SuppressResultSchemas=1,
+        )
+        return WUInfoResponse.from_response(resp)
+
+    def iter_rows(self, wuids):
+        """Get the timer rows of many workunits
+
+        Parameters
+        ----------
+            wuids:
+                Wuids of the workunits, any iterable
+
+        Returns
+        -------
+            Generator of the list of rows of each workunit, in order
+        """
+        self.failed = []
+        wuids = iter(wuids)
+        pending = deque()
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pyhpcc-wustats"
+        )
+        try:
+            for wuid in wuids:
+                pending.append((wuid, executor.submit(self.fetch, wuid)))
+                if len(pending) >= self.max_workers + self.prefetch:
+                    break
+            while pending:
+                wuid, future = pending.popleft()
+                next_wuid = next(wuids, None)
+                if next_wuid is not None:
+                    pending.append((next_wuid, executor.submit(self.fetch, next_wuid)))
+                try:
+                    rows = timer_rows(future.result(), self.include_graphs)
+                except (HPCCException, OSError) as e:
+                    log.warning("Could not collect timers of %s: %s", wuid, e)
+                    self.failed.append(wuid)
+                    continue
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    # A malformed or truncated body only loses its own workunit
+                    log.warning("Malformed WUInfo of %s: %r", wuid, e)
+                    self.failed.append(wuid)
+                    continue
+                yield rows
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def to_dataframe(self, wuids):
+        """Collect the timer rows of many workunits into a DataFrame
+
+        Parameters
+        ----------
+            wuids:
+                Wuids of the workunits
+
+        Returns
+        -------
+            stats: pd.DataFrame
+                A row per wuid and timer with the columns in COLUMNS
+        """
+        import pandas as pd
+
+        rows = [row for rows in self.iter_rows(wuids) for row in rows]
+        return pd.DataFrame(rows, columns=list(COLUMNS))
+
+    def write(
+        self, wuids, path, file_format=None, batch_size=conf.DEFAULT_STATS_BATCH_SIZE
+    ):
+        """Collect the timer rows of many workunits into a CSV or Parquet file
+
+        Rows are written every batch_size workunits, so a long collection
+        keeps little in memory. CSV files are appended to and flushed after
+        every batch, so the rows written survive an interruption. Parquet
+        files are only readable once closed, so they are written to path.part
+        and renamed to path at the end. A collection that raises leaves path
+        unchanged and the rows written in path.part.
+
+        Parameters
+        ----------
+            wuids:
+                Wuids of the workunits
+            path:
+                Output file
+            file_format:
+                csv or parquet. Defaults to the extension of path
+            batch_size:
+                Workunits collected per written batch
+
+        Returns
+        -------
+            rows: int
+                Number of rows written
+
+        Raises
+        ------
+            HPCCException:
+                If the format is unknown, or parquet without pyarrow installed
+        """
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format == "csv":
+            writer = _CSVWriter(path)
+        elif file_format == "parquet":
+            writer = _ParquetWriter(path)
+        else:
+            raise HPCCException("Unknown statistics format %r" % file_format)
+        written = 0
+        batch = []
+        count = 0
+        complete = False
+        try:
+            for rows in self.iter_rows(wuids):
+                batch.extend(rows)
+                count += 1
+                if count % batch_size == 0:
+                    written += writer.write(batch)
+                    batch = []
+            written += writer.write(batch)
+            complete = True
+        finally:
+            writer.close(complete)
+        return written
+
+
+class _CSVWriter(object):
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if new:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        return len(rows)
+
+    def close(self, complete=True):
+        self._file.close()
+
+
+class _ParquetWriter(object):
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise HPCCException("pyarrow is required for Parquet output")
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                (name, pa.float64() if name == "seconds" else pa.int64())
+                if name in ("seconds", "count", "subgraph_id")
+                else (name, pa.string())
+                for name in COLUMNS
+            ]
+        )
+        self._path = path
+        self._part = os.fspath(path) + ".part"
+        self._writer = pq.ParquetWriter(self._part, self._schema)
+
+    def write(self, rows):
+        if rows:
+            self._writer.write_table(
+                self._pa.Table.from_pylist(rows, schema=self._schema)
+            )
+        return len(rows)
+
+    def close(self, complete=True):
+        self._writer.close()
+        if complete:
+            os.replace(self._part, self._path)
+        else:
+            log.warning(
+                "Statistics collection interrupted, rows kept in %s", self._part
+            )
+
+
+def _elapsed(started, finished):
+    if not started or not finished:
+        return None
+    try:
+        return (
+            datetime.fromisoformat(finished) - datetime.fromisoformat(started)
+        ).total_seconds()
+    except ValueError:
+        return None
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import shutil
@@ -11,8 +10,12 @@ import pyhpcc.config as conf
 import pyhpcc.utils as utils
 from pyhpcc.command_config import CompileConfig, RunConfig
 from pyhpcc.config import ECL_OUTPUT_DIR
+from pyhpcc.decoder import decode_response
 from pyhpcc.errors import HPCCException, RunConfigException
 from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.responses import ActivityResponse
+from pyhpcc.models.workspace import EclWorkspace
+from pyhpcc.tracing import get_tracer
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +32,9 @@ class WorkunitSubmit(object):
             Clusters
         remove_temp_files:
             bool value to specify if files created by WorkunitSubmit be removed
+        workspace:
+            Optional EclWorkspace that ecl files are written to instead of the
+            working folder. submit_query removes each job's files when it is done
 
     Methods
     -------
@@ -53,6 +59,9 @@ class WorkunitSubmit(object):
         bash_run:
             Run the workunit
 
+        submit_query:
+            Write, compile and run an ecl query
+
         compile_workunit:
             Legacy function to compile the workunit
 
@@ -72,8 +81,15 @@ class WorkunitSubmit(object):
             Creates run config from given options
     """
 
-    def __init__(self, hpcc: HPCC, clusters: tuple, remove_temp_files=False):
+    def __init__(
+        self,
+        hpcc: HPCC,
+        clusters: tuple,
+        remove_temp_files=False,
+        workspace: EclWorkspace = None,
+    ):
         self.remove_temp_files = remove_temp_files
+        self.workspace = workspace
         self.hpcc: HPCC = hpcc
         if len(clusters) == 0:
             raise ValueError("Minimum one cluster should be specified")
@@ -107,9 +123,8 @@ class WorkunitSubmit(object):
             words = job_name.split()
             job_name = "_".join(words)
             file_name = os.path.join(folder, job_name + ".ecl")
-            f = open(file_name, "w")
-            f.write(query_text)
-            f.close
+            with open(file_name, "w") as f:
+                f.write(query_text)
             return file_name
         except Exception as e:
             raise HPCCException("Could not write file: " + str(e))
@@ -171,7 +186,9 @@ class WorkunitSubmit(object):
             if len(self.clusters) == 1:
                 return self.clusters[0]
             payload = {"SortBy": "Name", "Descending": 1}
-            return self.get_cluster_from_response(self.hpcc.activity(**payload).json())
+            return self.get_cluster_from_response(
+                decode_response(self.hpcc.activity(**payload))
+            )
         except Exception as e:
             raise HPCCException("Could not get workload: " + str(e))
 
@@ -196,12 +213,9 @@ class WorkunitSubmit(object):
                 A generic exception
         """
         cluster_activity = Counter(self.clusters)
-        if "Running" in list(resp["ActivityResponse"].keys()):
-            workunits = resp["ActivityResponse"]["Running"]["ActiveWorkunit"]
-            for workunit in workunits:
-                cluster = workunit["TargetClusterName"]
-                if cluster in cluster_activity:
-                    cluster_activity[cluster] -= 1
+        for workunit in ActivityResponse.from_response(resp).running:
+            if workunit.target_cluster_name in cluster_activity:
+                cluster_activity[workunit.target_cluster_name] -= 1
         return cluster_activity.most_common(1)[0][0]
 
     def create_file_name(
@@ -217,11 +231,14 @@ class WorkunitSubmit(object):
                 The folder to write the file to
             job_name:
                 The name of the ecl file
+            output_folder:
+                The folder under working_folder to write the file to
 
         Returns
         -------
             file_name:
-                The name of the ecl file
+                The name of the ecl file. A unique name in the workspace if
+                one is configured, in which case working_folder is not used
 
         Raises
         ------
@@ -230,6 +247,8 @@ class WorkunitSubmit(object):
         """
         try:
             self.job_name = job_name
+            if self.workspace is not None:
+                return self.workspace.write(query_text, job_name)
             self.ecl_output_folder = os.path.join(working_folder, output_folder)
             if not os.path.exists(self.ecl_output_folder):
                 os.makedirs(self.ecl_output_folder)
@@ -237,7 +256,7 @@ class WorkunitSubmit(object):
         except Exception as e:
             raise HPCCException("Could not create file name: " + str(e))
 
-    def bash_compile(self, file_name: str, options: dict = None):
+    def bash_compile(self, file_name: str, options: dict = None, compiler=conf.ECLCC):
         """Compile the ecl file
 
         Parameters
@@ -246,6 +265,8 @@ class WorkunitSubmit(object):
                 The name of the ecl file
             options:
                 dictionary of eclcc compiler options
+            compiler:
+                The eclcc executable. Defaults to eclcc on the PATH
 
         Returns
         -------
@@ -259,19 +280,27 @@ class WorkunitSubmit(object):
             HPCCException:
                 A generic exception
         """
-        try:
-            if options is None:
-                options = conf.DEFAULT_COMPILE_OPTIONS
-            compile_config = CompileConfig(options)
-            bash_command, output_file = self.get_bash_command(file_name, compile_config)
-            process = subprocess.Popen(
-                bash_command.split(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
-            output, error = process.communicate()
-            parsed_output = utils.parse_bash_compile_output(output, bash_command)
-            return parsed_output, output_file
-        except Exception as e:
-            raise HPCCException("Could not compile: " + str(e))
+        with get_tracer().start_span(
+            "pyhpcc.compile", {"pyhpcc.file_name": file_name}
+        ) as span:
+            try:
+                if options is None:
+                    options = conf.DEFAULT_COMPILE_OPTIONS
+                compile_config = CompileConfig(options, compiler)
+                bash_command, output_file = self.get_bash_command(
+                    file_name, compile_config
+                )
+                process = subprocess.Popen(
+                    bash_command.split(),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                )
+                output, error = process.communicate()
+                parsed_output = utils.parse_bash_compile_output(output, bash_command)
+                span.set_attribute("pyhpcc.status", parsed_output["status"])
+                return parsed_output, output_file
+            except Exception as e:
+                raise HPCCException("Could not compile: " + str(e))
 
     def bash_run(self, compiled_file, options: dict = None, show_command=False):
         """Run the compiled ecl file
@@ -293,24 +322,94 @@ class WorkunitSubmit(object):
             HPCCException:
                 A generic exception
         """
-        try:
-            run_config = self.configure_run_config(options)
-            bash_command = run_config.create_run_bash_command(compiled_file)
-            process = subprocess.Popen(
-                bash_command.split(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-            )
-            output, error = process.communicate()
-            parsed_response = utils.parse_bash_run_output(output)
-            if show_command:
-                masked_run_command = run_config.create_run_bash_command(
-                    compiled_file, password_mask=True
+        with get_tracer().start_span(
+            "pyhpcc.run", {"pyhpcc.file_name": compiled_file}
+        ) as span:
+            try:
+                run_config = self.configure_run_config(options)
+                span.set_attribute(
+                    "pyhpcc.cluster", run_config.options.get(conf.CLUSTER_OPTION)
                 )
-                parsed_response[conf.COMMAND] = masked_run_command
-            return parsed_response
-        except RunConfigException:
-            raise
-        except Exception as e:
-            raise HPCCException("Could not run: " + str(e))
+                bash_command = run_config.create_run_bash_command(compiled_file)
+                process = subprocess.Popen(
+                    bash_command.split(),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                )
+                output, error = process.communicate()
+                parsed_response = utils.parse_bash_run_output(output)
+                wu_info = parsed_response["wu_info"]
+                span.set_attributes(
+                    {
+                        "pyhpcc.wuid": wu_info[conf.WUID],
+                        "pyhpcc.state": wu_info[conf.STATE],
+                    }
+                )
+                if show_command:
+                    masked_run_command = run_config.create_run_bash_command(
+                        compiled_file, password_mask=True
+                    )
+                    parsed_response[conf.COMMAND] = masked_run_command
+                return parsed_response
+            except RunConfigException:
+                raise
+            except Exception as e:
+                raise HPCCException("Could not run: " + str(e))
+
+    def submit_query(
+        self,
+        query_text,
+        working_folder,
+        job_name,
+        compile_options: dict = None,
+        run_options: dict = None,
+    ):
+        """Write, compile and run an ecl query
+
+        Parameters
+        ----------
+            query_text:
+                The ecl query
+            working_folder:
+                The folder to write the ecl file to. Not used with a workspace
+            job_name:
+                The name of the ecl file and workunit
+            compile_options:
+                dictionary of eclcc compiler options
+            run_options:
+                dictionary of ecl run options
+
+        Returns
+        -------
+            compile_output:
+                Parsed output from bash_compile
+            run_output:
+                Parsed output from bash_run
+
+        Raises
+        ------
+            HPCCException:
+                If the query does not compile or could not be run
+        """
+        with get_tracer().start_span(
+            "pyhpcc.submit_query", {"pyhpcc.job_name": job_name}
+        ):
+            file_name = self.create_file_name(query_text, working_folder, job_name)
+            try:
+                compile_output, output_file = self.bash_compile(
+                    file_name, compile_options
+                )
+                if compile_output["status"] != "success":
+                    raise HPCCException(
+                        "Could not compile: " + ",".join(compile_output["errors"])
+                    )
+                run_options = dict(run_options or {})
+                run_options.setdefault(conf.JOB_NAME_OPTION, "_".join(job_name.split()))
+                run_output = self.bash_run(output_file, options=run_options)
+                return compile_output, run_output
+            finally:
+                if self.workspace is not None:
+                    self.workspace.release(file_name)
 
     def configure_run_config(self, options: dict) -> RunConfig:
         """Creates run config from given options
@@ -359,10 +458,10 @@ class WorkunitSubmit(object):
             w3 = self.hpcc.wu_wait_compiled(Wuid=wuid)
         except requests.exceptions.Timeout:
             w3 = self.wu_wait_compiled(wuid=wuid)
-            w3 = json.loads(w3.text)
+            w3 = decode_response(w3)
             return w3["WUWaitResponse"]["StateID"]
         else:
-            w3 = json.loads(w3.text)
+            w3 = decode_response(w3)
             return w3["WUWaitResponse"]["StateID"]
 
     def create_workunit(
@@ -403,7 +502,7 @@ class WorkunitSubmit(object):
         )
 
         if resp.status_code == 200:
-            resp = json.loads(resp.text)
+            resp = decode_response(resp)
             if (
                 "WUUpdateResponse" in resp
                 and "Workunit" in resp["WUUpdateResponse"]
@@ -426,7 +525,10 @@ class WorkunitSubmit(object):
             logging.info(
                 "session timeout for wu_wait_compiled, starting new session for wu_wait_complete"
             )
-            w4 = self.hpcc.wu_wait_compiled(Wuid=wuid)
+            with get_tracer().start_span(
+                "pyhpcc.wu_wait_compiled", {"pyhpcc.wuid": wuid}
+            ):
+                w4 = self.hpcc.wu_wait_compiled(Wuid=wuid)
         except requests.exceptions.Timeout:
             w4 = self.wu_wait_compiled(wuid=wuid)
             return w4
@@ -445,7 +547,10 @@ class WorkunitSubmit(object):
             logging.info(
                 "session timeout for WuRun, starting new session for wu_wait_complete"
             )
-            w4 = self.hpcc.wu_wait_complete(Wuid=wuid)
+            with get_tracer().start_span(
+                "pyhpcc.wu_wait_complete", {"pyhpcc.wuid": wuid}
+            ):
+                w4 = self.hpcc.wu_wait_complete(Wuid=wuid)
         except requests.exceptions.Timeout:
             w4 = self.wu_wait_complete(wuid=wuid)
             return w4
@@ -468,11 +573,11 @@ class WorkunitSubmit(object):
             w4 = self.hpcc.wu_run(Wuid=wuid, Cluster=cluster, Variables=[])
         except requests.exceptions.Timeout:
             w4 = self.wu_wait_complete(wuid=wuid)
-            w4 = w4.json()
+            w4 = decode_response(w4)
 
             return w4["WUWaitResponse"]["StateID"]
         else:
-            w4 = json.loads(w4.text)
+            w4 = decode_response(w4)
             state = w4["WURunResponse"]["State"]
             return conf.WORKUNIT_STATE_MAP[state]
 
@@ -0,0 +1,333 @@
+import abc
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("pyhpcc_current_span", default=None)
+
+
+class NoOpSpan(object):
+    """Span returned by NoOpTracer, every method does nothing"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+class NoOpTracer(object):
+    """Default tracer, spans cost one context manager and are not recorded"""
+
+    _span = NoOpSpan()
+
+    @contextmanager
+    def start_span(self, name, attributes=None, parent=None, activate=True):
+        yield self._span
+
+
+class Span(object):
+    """
+    A timed operation of a Tracer, in the shape of an OpenTelemetry span
+
+    Attributes
+    ----------
+        name:
+            Name of the operation
+        trace_id:
+            32 hex digit id shared by every span of a trace
+        span_id:
+            16 hex digit id of the span
+        parent_id:
+            span_id of the parent span, None for a root span
+        start_time:
+            Start in nanoseconds since the epoch
+        end_time:
+            End in nanoseconds since the epoch, None while the span is open
+        attributes:
+            dictionary of attributes
+        status:
+            OK or ERROR
+        events:
+            list of exception events
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_time",
+        "end_time",
+        "attributes",
+        "status",
+        "events",
+    )
+
+    def __init__(self, name, trace_id, span_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.events = []
+
+    def set_attribute(self, key, value):
+        """Set one attribute"""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        """Set several attributes from a dictionary"""
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception):
+        """Mark the span as failed and record the exception as an event"""
+        self.status = "ERROR"
+        self.events.append(
+            {
+                "name": "exception",
+                "time_unix_nano": time.time_ns(),
+                "attributes": {
+                    "exception.type": type(exception).__name__,
+                    "exception.message": str(exception),
+                },
+            }
+        )
+
+    @property
+    def duration(self):
+        """Seconds the span took, None while the span is open"""
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) / 1e9
+
+    def to_dict(self):
+        """The span as an OpenTelemetry-like dictionary"""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "attributes": self.attributes,
+            "status": self.status,
+            "events": self.events,
+        }
+
+
+class Tracer(object):
+    """
+    Records spans and hands them to exporters when they end
+
+    A span started inside another span's block becomes its child. Spans held
+    open across the yields of a generator should be started with
+    activate=False and passed as parent to their children explicitly, so they
+    do not become the parent of the consumer's spans.
+
+    Attributes
+    ----------
+        exporters:
+            list of exporters every ended span is passed to
+
+    Methods
+    -------
+        start_span:
+            Context manager that records a span around its block
+
+        current_span:
+            The span of the enclosing start_span block
+
+        shutdown:
+            Shut down the exporters
+    """
+
+    def __init__(self, exporters=()):
+        self.exporters = list(exporters)
+
+    @contextmanager
+    def start_span(self, name, attributes=None, parent=None, activate=True):
+        """Record a span around the block
+
+        Parameters
+        ----------
+            name:
+                Name of the operation
+            attributes:
+                dictionary of attributes
+            parent:
+                Parent span. Defaults to the current span
+            activate:
+                Make the span the current span inside the block
+
+        Returns
+        -------
+            span: Span
+                The span, exceptions raised in the block are recorded on it
+        """
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        span = Span(name, trace_id, os.urandom(8).hex(), parent_id, attributes)
+        token = _current_span.set(span) if activate else None
+        try:
+            yield span
+        except Exception as e:
+            # GeneratorExit and KeyboardInterrupt end the span without an error,
+            # a consumer stopping a traced generator early is not a failure
+            span.record_exception(e)
+            raise
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+            span.end_time = time.time_ns()
+            self._export(span)
+
+    def current_span(self):
+        """The span of the enclosing start_span block, None outside one"""
+        return _current_span.get()
+
+    def shutdown(self):
+        """Shut down the exporters"""
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+    def _export(self, span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                log.warning("Span exporter %r failed", exporter, exc_info=True)
+
+
+class OpenTelemetryTracer(object):
+    """
+    Adapter that records PyHPCC spans with an OpenTelemetry tracer
+
+    Parameters
+    ----------
+    tracer :
+        An opentelemetry.trace.Tracer, e.g. opentelemetry.trace.get_tracer("pyhpcc")
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @contextmanager
+    def start_span(self, name, attributes=None, parent=None, activate=True):
+        from opentelemetry import trace
+
+        if activate and parent is None:
+            with self.tracer.start_as_current_span(
+                name,
+                attributes=attributes,
+                record_exception=False,
+                set_status_on_exception=False,
+            ) as span:
+                try:
+                    yield span
+                except Exception as e:
+                    _record_otel_exception(trace, span, e)
+                    raise
+            return
+        context = None
+        if parent is not None:
+            context = trace.set_span_in_context(parent)
+        span = self.tracer.start_span(name, context=context, attributes=attributes)
+        try:
+            yield span
+        except Exception as e:
+            _record_otel_exception(trace, span, e)
+            raise
+        finally:
+            span.end()
+
+
+def _record_otel_exception(trace, span, exception):
+    span.record_exception(exception)
+    span.set_status(trace.Status(trace.StatusCode.ERROR, str(exception)))
+
+
+class SpanExporter(abc.ABC):
+    """Interface of the exporters a Tracer hands ended spans to"""
+
+    @abc.abstractmethod
+    def export(self, span: Span):
+        """Export an ended span"""
+
+    def shutdown(self):
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps ended spans in a list, for tests"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends ended spans to a file as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+_tracer = NoOpTracer()
+
+
+def get_tracer():
+    """
+    Get the tracer used by PyHPCC
+
+    Returns
+    -------
+    Tracer
+        The tracer set with set_tracer, else a NoOpTracer
+    """
+    return _tracer
+
+
+def set_tracer(tracer):
+    """
+    Set the tracer used by PyHPCC
+
+    Parameters
+    ----------
+    tracer : Tracer or OpenTelemetryTracer
+        The tracer. None restores the NoOpTracer
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else NoOpTracer()
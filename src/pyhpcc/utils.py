@@ -1,7 +1,9 @@
+import logging
+import math
+import os
 import re
 import sys
 
-import pandas as pd
 import six
 
 if sys.version_info[0] < 3:
@@ -12,6 +14,7 @@ from pyhpcc.config import (
     COMPILE_ERROR_MIDDLE_PATTERN,
     COMPILE_ERROR_PATTERN,
     FAILED_STATUS,
+    LOG_MAX_CHARS,
     RUN_ERROR_MSG_PATTERN,
     RUN_UNWANTED_PATTERNS,
     STATE,
@@ -19,11 +22,14 @@ from pyhpcc.config import (
     WUID,
     WUID_PATTERN,
 )
+from pyhpcc.decoder import decode_response
 from pyhpcc.errors import HPCCException
 
 """
 This module contains utility functions for the pyhpcc package.
 """
+log = logging.getLogger(__name__)
+
 DFU_LOGICAL_FILES = "DFULogicalFiles"
 DFU_QUERY_RESPONSE = "DFUQueryResponse"
 DFU_LOGICAL_FILE = "DFULogicalFile"
@@ -63,6 +69,187 @@ def convert_arg_to_utf8_str(arg):
         raise e
 
 
+def to_int(value, default=None):
+    """
+    Convert an ESP number, which may be formatted with thousands separators, to int
+
+    Parameters
+    ----------
+    value : str or int
+        The number, e.g. "1,234,567"
+    default :
+        Returned if value is None, empty, a bool or not a number. Values that
+        are not empty are logged
+
+    Returns
+    -------
+    int
+        The number
+    """
+    if isinstance(value, bool):
+        log.warning("Expected a number, got %r", value)
+        return default
+    if isinstance(value, int):
+        return value
+    if value is None or value == "":
+        return default
+    try:
+        return int(str(value).replace(",", ""))
+    except ValueError:
+        log.warning("Expected a number, got %r", value)
+        return default
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Parameters
+    ----------
+    values : list
+        The numbers to compute the percentile over. Need not be sorted.
+    pct : float
+        The percentile to compute, between 0 and 100.
+
+    Returns
+    -------
+    float or None
+        The percentile value, or None if values is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize_for_log(value, max_chars=LOG_MAX_CHARS, decode_bytes=False):
+    """
+    Short text of a request field for logging.
+
+    Files and streams are reported by name and never read, and bytes by size
+    unless decode_bytes is set, so upload bodies are not copied into the log.
+    Other values are formatted piece by piece and cut off after max_chars
+    characters.
+
+    Parameters
+    ----------
+    value :
+        The field, e.g. params, data or files of a request
+    max_chars : int
+        Characters kept before the text is truncated
+    decode_bytes : bool
+        Show the start of bytes values as text, for fields such as params
+        whose values are encoded by convert_arg_to_utf8_str
+
+    Returns
+    -------
+    str
+        The text
+    """
+    text = _summarize(value, max_chars, decode_bytes)
+    if len(text) > max_chars:
+        return "%s...(truncated)" % text[:max_chars]
+    return text
+
+
+def _summarize(value, max_chars, decode_bytes):
+    if isinstance(value, (bytes, bytearray)):
+        if decode_bytes:
+            return repr(bytes(value[: max_chars + 1]).decode("utf-8", "replace"))
+        return "<%d bytes>" % len(value)
+    if hasattr(value, "read"):
+        return "<file %s>" % getattr(value, "name", type(value).__name__)
+    if isinstance(value, str):
+        return repr(value[: max_chars + 1])
+    if isinstance(value, (dict, list, tuple)):
+        is_dict = isinstance(value, dict)
+        items, size = [], 0
+        for item in value.items() if is_dict else value:
+            if is_dict:
+                text = "%r: %s" % (
+                    item[0],
+                    _summarize(item[1], max_chars, decode_bytes),
+                )
+            else:
+                text = _summarize(item, max_chars, decode_bytes)
+            items.append(text)
+            size += len(text) + 2
+            if size > max_chars:
+                break
+        return ("{%s}" if is_dict else "[%s]") % ", ".join(items)
+    return repr(value)[: max_chars + 1]
+
+
+class LazyLogValue(object):
+    """
+    Wraps a value so it is summarized only if the log record is emitted
+
+    Pass as a logging argument, e.g. log.debug("data: %s", LazyLogValue(data)).
+    Arguments are passed to summarize_for_log.
+    """
+
+    __slots__ = ("value", "max_chars", "decode_bytes")
+
+    def __init__(self, value, max_chars=LOG_MAX_CHARS, decode_bytes=False):
+        self.value = value
+        self.max_chars = max_chars
+        self.decode_bytes = decode_bytes
+
+    def __str__(self):
+        return summarize_for_log(self.value, self.max_chars, self.decode_bytes)
+
+
+def parse_duration(value, default_unit="s"):
+    """
+    Convert an ESP duration to seconds.
+
+    Parameters
+    ----------
+    value : str or number
+        The duration, e.g. "1.5s", "12ms", "1:02.345", "1h 2m 3s" or a number
+        without a unit
+    default_unit : str
+        Unit of a number without a unit, one of d, h, m, s, ms, us or ns.
+        Formatted timers are seconds, raw graph statistics are nanoseconds
+
+    Returns
+    -------
+    float or None
+        The seconds, or None if value is empty or not a duration.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) * _DURATION_UNITS[default_unit]
+    value = value.strip()
+    try:
+        if ":" in value:
+            seconds = 0.0
+            for part in value.split(":"):
+                seconds = seconds * 60 + float(part)
+            return seconds
+        return float(value) * _DURATION_UNITS[default_unit]
+    except ValueError:
+        pass
+    tokens = _DURATION_TOKEN.findall(value)
+    if not tokens or _DURATION_TOKEN.sub("", value).strip():
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in tokens)
+
+
+_DURATION_TOKEN = re.compile(r"(\d+(?:\.\d+)?)\s*(ms|us|ns|d|h|m|s)")
+_DURATION_UNITS = {
+    "d": 86400.0,
+    "h": 3600.0,
+    "m": 60.0,
+    "s": 1.0,
+    "ms": 1e-3,
+    "us": 1e-6,
+    "ns": 1e-9,
+}
+
+
 def create_compile_file_name(file_name):
     """
     Create a compiled file name from a filename.
@@ -83,54 +270,42 @@ def create_compile_file_name(file_name):
         A generic exception.
     """
     try:
-        return file_name.split(".")[0] + ".eclxml"
+        return os.path.splitext(file_name)[0] + ".eclxml"
     except HPCCException as e:
         raise e
 
 
-# TODO: Revise method
-
-# def get_graph_skew(response):
-#     """
-#     Get the graph skew from the response of a WUInfo call.
+def get_graph_skew(response):
+    """
+    Get the subgraph timings and skew from the response of a WUGetGraph call.
 
-#     Parameters
-#     ----------
-#     response :
-#         str
+    Parameters
+    ----------
+    response : Response or dict
+        The WUGetGraph response or its decoded body
 
-#     Returns
-#     -------
-#     dict :
-#         A dictionary containing the graph skew information.
+    Returns
+    -------
+    list
+        A dictionary per subgraph with its subgraphid, graph, skewmax
+        (percent) and avgtime (seconds).
 
-#     Raises
-#     ------
-#     HPCCException
-#         A generic exception.
-#     """
-#     try:
-#         resp_json = response.json()
-#         graphs = []
-#         xml = resp_json["WUGetGraphResponse"]["Graphs"]["ECLGraphEx"][0]["Graph"]
-#         root = ET.fromstringlist(xml)
-
-#         # Loop through the graph nodes and get the skew information
-#         for node in root.findall("./node/att/graph/node"):
-#             graph = {"subgraphid": node.get("id")}
-#             for child in node:
-#                 if child.get("name") == "SkewMaxLocalExecute":
-#                     graph["skewmax"] = child.get("value")
-#                 if child.get("name") == "TimeAvgLocalExecute":
-#                     graph["avgtime"] = child.get("value")
-#                 if child.get("ecl") == "TimeAvgLocalExecute":
-#                     graph["ecl"] = child.get("value")
-#             graphs.append(graph)
-
-#         return graphs
+    Raises
+    ------
+    HPCCException
+        If the response has exceptions or a graph cannot be parsed.
+    """
+    from pyhpcc.models.graph import parse_graph_response
 
-#     except HPCCException as e:
-#         raise e
+    return [
+        {
+            "subgraphid": subgraph.id,
+            "graph": subgraph.graph_name,
+            "skewmax": subgraph.skew_max,
+            "avgtime": subgraph.time_avg,
+        }
+        for subgraph in parse_graph_response(response).subgraphs
+    ]
 
 
 def get_file_status(response):
@@ -139,8 +314,8 @@ def get_file_status(response):
 
     Parameters
     ----------
-    response :
-        Response Object
+    response : Response or dict
+        Response Object or its decoded body
 
     Returns
     -------
@@ -155,7 +330,7 @@ def get_file_status(response):
     try:
         NUM_FILES = "NumFiles"
         DFU_QUERY_RESPONSE = "DFUQueryResponse"
-        response = response.json()
+        response = decode_response(response)
         response = response[DFU_QUERY_RESPONSE]
         if NUM_FILES in response:
             return response[NUM_FILES]
@@ -171,8 +346,8 @@ def get_file_type(response):
 
     Parameters
     ----------
-    response : Response
-        The Response object
+    response : Response or dict
+        The Response object or its decoded body
 
     Returns
     -------
@@ -185,7 +360,7 @@ def get_file_type(response):
         A generic exception.
     """
     try:
-        response = response.json()
+        response = decode_response(response)
         data_dict = {}
         NODE_GROUP = "NodeGroup"
         IS_SUPER_FILE = "isSuperfile"
@@ -215,8 +390,8 @@ def get_subfile_names(response):
 
     Parameters
     ----------
-    response:
-        The Response object
+    response: Response or dict
+        The Response object or its decoded body
 
     Returns
     -------
@@ -228,8 +403,10 @@ def get_subfile_names(response):
     HPCCException
         A generic exception.
     """
+    import pandas as pd
+
     try:
-        response = response.json()
+        response = decode_response(response)
         DFU_INFO_RESPONSE = "DFUInfoResponse"
         FILE_DETAIL = "FileDetail"
         SUBFILES = "subfiles"
@@ -252,8 +429,8 @@ def get_data_from_response(response):
 
     Parameters
     ----------
-    response : Response
-        The Response Object
+    response : Response or dict
+        The Response Object or its decoded body
 
     Returns
     -------
@@ -271,7 +448,7 @@ def get_data_from_response(response):
     EXCEPTIONS = "Exceptions"
     EXCEPTION = "Exception"
     data_attr = {}
-    response = response.json()
+    response = decode_response(response)
 
     if EXCEPTIONS in response:
         messages = []
@@ -303,8 +480,8 @@ def get_flat_data(response):
 
     Parameters
     ----------
-    response : Response
-        Response Object
+    response : Response or dict
+        Response Object or its decoded body
 
     Returns
     -------
@@ -316,6 +493,8 @@ def get_flat_data(response):
     HPCCException
         A generic exception.
     """
+    import pandas as pd
+
     try:
         data_attr, data = get_data_from_response(response)
         df = pd.json_normalize(data)
@@ -330,8 +509,8 @@ def get_csv_data(response, csv_separator, infer_headers=False, csv_headers=()):
 
     Parameters
     ----------
-    response : Response
-        Response Object
+    response : Response or dict
+        Response Object or its decoded body
     csv_separator : str
         The csv seperator
     csv_header : str
@@ -347,6 +526,8 @@ def get_csv_data(response, csv_separator, infer_headers=False, csv_headers=()):
     HPCCException
         A generic exception.
     """
+    import pandas as pd
+
     try:
         LINE = "line"
         csv_format_data = ""
@@ -379,8 +560,8 @@ def get_csv_header(response, csv_seperator):
 
     Parameters
     ----------
-    response : Response
-        response with header information
+    response : Response or dict
+        response with header information, or its decoded body
 
     Returns
     -------
@@ -403,8 +584,8 @@ def check_file_existence(response, logical_file):
 
     Parameters
     ----------
-    response : Response
-        The response object
+    response : Response or dict
+        The response object or its decoded body
 
     Returns
     -------
@@ -417,7 +598,7 @@ def check_file_existence(response, logical_file):
         A generic exception.
     """
     try:
-        response = response.json()
+        response = decode_response(response)
         if DFU_QUERY_RESPONSE in response:
             response = response[DFU_QUERY_RESPONSE]
             if DFU_LOGICAL_FILES in response:
@@ -432,6 +613,84 @@ def check_file_existence(response, logical_file):
         raise e
 
 
+def get_workunit_states(response):
+    """
+    Parses the WUQuery response to get the state of each workunit
+
+    Parameters
+    ----------
+    response : Response or dict
+        The WUQuery Response object or its decoded body
+
+    Returns
+    -------
+    dict
+        A dictionary of wuid to workunit state
+
+    Raises
+    ------
+    HPCCException
+        A generic exception.
+    """
+    try:
+        WU_QUERY_RESPONSE = "WUQueryResponse"
+        WORKUNITS = "Workunits"
+        ECL_WORKUNIT = "ECLWorkunit"
+        states = {}
+        response = decode_response(response)
+        if WU_QUERY_RESPONSE in response:
+            response = response[WU_QUERY_RESPONSE]
+            if WORKUNITS in response:
+                response = response[WORKUNITS]
+                if ECL_WORKUNIT in response:
+                    for workunit in response[ECL_WORKUNIT]:
+                        states[workunit["Wuid"]] = workunit["State"]
+        return states
+    except HPCCException as e:
+        raise e
+
+
+def get_roxie_results(response):
+    """
+    Parses a WsEcl JSON response to get the rows of each result
+
+    Parameters
+    ----------
+    response : Response or dict
+        The WsEcl Response object or its decoded body
+
+    Returns
+    -------
+    dict
+        A dictionary of result name to list of rows
+
+    Raises
+    ------
+    HPCCException
+        If the response contains exceptions
+    """
+    RESULTS = "Results"
+    ROW = "Row"
+    EXCEPTIONS = "Exceptions"
+    EXCEPTION = "Exception"
+    response = decode_response(response)
+    # WsEcl wraps the response in a single <query>Response key
+    if len(response) == 1:
+        (body,) = response.values()
+        if isinstance(body, dict):
+            response = body
+    for container in (response, response.get(RESULTS, {})):
+        if EXCEPTIONS in container:
+            exceptions = container[EXCEPTIONS].get(EXCEPTION, [])
+            messages = [exception.get("Message", "") for exception in exceptions]
+            raise HPCCException(",".join(messages))
+    results = {}
+    for name, result in response.get(RESULTS, {}).items():
+        if isinstance(result, dict) and ROW in result:
+            results[name] = result[ROW]
+    return results
+
+
 # def despray_file(hpcc, query_text, cluster, jobn):
 #     """
 #     ToDo: Desprays a file from the HPCC cluster to the local machine
@@ -1,6 +1,8 @@
 import os
+import threading
 
 import pytest
+import requests
 from pyhpcc.models.auth import Auth
 from pyhpcc.models.hpcc import HPCC
 from pyhpcc.models.workunit_submit import WorkunitSubmit
@@ -43,6 +45,80 @@ LANDING_ZONE_PATH = os.environ.get("LANDING_ZONE_PATH") or my_secret.LANDING_ZON
 DFU_CLUSTER = os.environ.get("DFU_CLUSTER") or my_secret.DFU_CLUSTER
 
 
+class FakeResponse(object):
+    """
+    A requests.Response stand-in for tests that do not reach a cluster
+
+    Attributes
+    ----------
+        payload:
+            Decoded body returned by json
+        status_code:
+            HTTP status, raise_for_status raises from 400
+        params:
+            Parameters of the request
+        url:
+            Url of the request
+    """
+
+    def __init__(self, payload=None, status_code=200, params=None, url=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.params = params
+        self.url = url
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code, response=self)
+
+
+def esp_exception(message):
+    """Decoded body of an ESP exception"""
+    return {"Exceptions": {"Exception": [{"Message": message}]}}
+
+
+class FakeHPCC(object):
+    """
+    An HPCC stand-in answering ESP calls with handlers
+
+    Each keyword argument names an HPCC method and gives the function called
+    with its keyword arguments. The decoded body a handler returns is wrapped
+    in a FakeResponse.
+
+    Attributes
+    ----------
+        handlers:
+            Each method name to its handler
+        exception:
+            Message of an ESP exception returned by every call instead
+        calls:
+            (method name, keyword arguments) of each call, in order
+    """
+
+    def __init__(self, exception=None, **handlers):
+        self.handlers = handlers
+        self.exception = exception
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        handler = self.__dict__.get("handlers", {}).get(name)
+        if handler is None:
+            raise AttributeError(name)
+
+        def call(**kwargs):
+            with self.lock:
+                self.calls.append((name, kwargs))
+            if self.exception:
+                return FakeResponse(esp_exception(self.exception))
+            return FakeResponse(handler(**kwargs))
+
+        return call
+
+
 @pytest.fixture(scope="session")
 def hpcc_host():
     return HPCC_HOST
@@ -0,0 +1,74 @@
+import pytest
+from pyhpcc.cache import TTLCache
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.roxie import Roxie
+from requests import HTTPError, Response
+
+
+# Test if request parameters and headers are passed per request instead of stored on the shared session
+def test_roxie_handler_does_not_mutate_session(mocker):
+    roxie = Roxie(Auth("localhost", 8002, "user", "password"), "query", "roxie")
+    request = mocker.patch.object(roxie.auth.session, "request")
+    roxie.roxie_call(id=1, headers={"X-Test": "1"})
+    kwargs = request.call_args.kwargs
+    assert request.call_args.args[1] == roxie.get_query_url()
+    assert kwargs["params"] == {"id": b"1"}
+    assert kwargs["headers"] == {"X-Test": "1"}
+    assert roxie.auth.session.params == {}
+
+
+def _roxie_response(status_code=200):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = b"{}"
+    return resp
+
+
+# Test if repeated calls with reordered params are answered from the cache
+def test_roxie_handler_cache(mocker):
+    cache = TTLCache()
+    roxie = Roxie(
+        Auth("localhost", 8002, "user", "password"), "query", "roxie", cache=cache
+    )
+    request = mocker.patch.object(
+        roxie.auth.session, "request", return_value=_roxie_response()
+    )
+    first = roxie.roxie_call(id=1, name="a")
+    assert not roxie.cached_result
+    assert roxie.roxie_call(name="a", id=1) is first
+    assert roxie.cached_result
+    roxie.roxie_call(id=2, name="a")
+    assert request.call_count == 2
+    assert cache.stats()["hits"] == 1
+
+
+# Test if client errors are cached only with negative caching, server errors never
+@pytest.mark.parametrize(
+    "negative_ttl, status, expected_calls",
+    [(None, 404, 2), (10, 404, 1), (10, 503, 2), (10, 500, 2)],
+)
+def test_roxie_handler_negative_cache(mocker, negative_ttl, status, expected_calls):
+    roxie = Roxie(
+        Auth("localhost", 8002, "user", "password"),
+        "query",
+        "roxie",
+        cache=TTLCache(negative_ttl=negative_ttl),
+    )
+    request = mocker.patch.object(
+        roxie.auth.session, "request", return_value=_roxie_response(status)
+    )
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            roxie.roxie_call(id=1)
+    assert request.call_count == expected_calls
+
+
+# Test if Roxie clients of different hosts sharing a cache do not share entries
+def test_roxie_handler_cache_per_host():
+    cache = TTLCache()
+    roxies = [
+        Roxie(Auth(host, 8002, "user", "password"), "query", "roxie", cache=cache)
+        for host in ("roxie1", "roxie2")
+    ]
+    keys = {roxie.cache_key({"id": 1}) for roxie in roxies}
+    assert len(keys) == 2
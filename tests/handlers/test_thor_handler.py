@@ -0,0 +1,36 @@
+import logging
+
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.hpcc import HPCC
+
+
+# Test if request parameters and headers are passed per request instead of stored on the shared session
+def test_thor_handler_does_not_mutate_session(mocker):
+    hpcc = HPCC(Auth("localhost", 8010, "user", "password", protocol="http"))
+    request = mocker.patch.object(hpcc.auth.session, "request")
+    headers = {"X-Test": "1"}
+    hpcc.get_wu_info(Wuid="W20240101-1", headers=headers)
+    kwargs = request.call_args.kwargs
+    assert kwargs["params"] == {"Wuid": b"W20240101-1"}
+    assert kwargs["headers"]["X-Test"] == "1"
+    assert headers == {"X-Test": "1"}
+    assert hpcc.auth.session.params == {}
+    assert "X-Test" not in hpcc.auth.session.headers
+
+
+# Test if requests are logged at DEBUG only and upload files are never read for logging
+def test_thor_handler_logging(mocker, caplog):
+    hpcc = HPCC(Auth("localhost", 8010, "user", "password", protocol="http"))
+    mocker.patch.object(hpcc.auth.session, "request")
+    upload = mocker.Mock(spec=["read", "name"])
+    upload.name = "data.csv"
+    files = {"file": ("data.csv", upload, "text/plain")}
+    with caplog.at_level(logging.INFO, logger="pyhpcc.handlers.thor_handler"):
+        hpcc.upload_file(upload_="", files=files)
+    assert caplog.records == []
+    with caplog.at_level(logging.DEBUG, logger="pyhpcc.handlers.thor_handler"):
+        hpcc.upload_file(upload_="", files=files)
+    (record,) = caplog.records
+    assert record.levelno == logging.DEBUG
+    assert "<file data.csv>" in record.getMessage()
+    upload.read.assert_not_called()
@@ -0,0 +1,136 @@
+import pytest
+from conftest import FakeHPCC
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.catalog import DFUCatalog, scope_pattern
+
+FILES = sorted(
+    [f"sales::file{i:03d}" for i in range(25)] + [f"hr::file{i:03d}" for i in range(7)]
+)
+
+
+def catalog_hpcc(files=FILES, max_files=None, exception=None):
+    def dfu_query(PageStartFrom, PageSize, LogicalName=None, **kwargs):
+        matched = files
+        if LogicalName is not None:
+            matched = [f for f in files if f.startswith(LogicalName.rstrip("*"))]
+        subset = max_files is not None and len(matched) > max_files
+        if subset:
+            matched = matched[:max_files]
+        page = matched[PageStartFrom : PageStartFrom + PageSize]
+        return {
+            "DFUQueryResponse": {
+                "NumFiles": len(matched),
+                "IsSubsetOfFiles": subset,
+                "DFULogicalFiles": {
+                    "DFULogicalFile": [
+                        {"Name": name, "IntSize": 10, "RecordCount": "1,000"}
+                        for name in page
+                    ]
+                },
+            }
+        }
+
+    return FakeHPCC(exception, dfu_query=dfu_query)
+
+
+def queries(hpcc):
+    """(LogicalName, PageStartFrom) of each DFUQuery call, sorted"""
+    return sorted(
+        (kwargs.get("LogicalName"), kwargs["PageStartFrom"]) for _, kwargs in hpcc.calls
+    )
+
+
+# Test if a scope is turned into a LogicalName pattern
+@pytest.mark.parametrize(
+    "scope, pattern",
+    [("sales", "sales::*"), ("thor::sales::", "thor::sales::*"), ("a*", "a*")],
+)
+def test_scope_pattern(scope, pattern):
+    assert scope_pattern(scope) == pattern
+
+
+# Test if every page of the catalog is fetched and yielded in order
+@pytest.mark.parametrize("page_size, max_workers", [(5, 4), (7, 1), (100, 2)])
+def test_catalog_iter_files(page_size, max_workers):
+    hpcc = catalog_hpcc()
+    catalog = DFUCatalog(hpcc, page_size=page_size, max_workers=max_workers)
+    files = list(catalog.iter_files())
+    assert [f.name for f in files] == FILES
+    assert files[0].total_size == 10 and files[0].record_count == 1000
+    assert len(hpcc.calls) == -(-len(FILES) // page_size)
+    assert hpcc.calls[0][1]["Sortby"] == "Name"
+
+
+# Test if shards are enumerated with one LogicalName pattern per scope
+def test_catalog_shards():
+    hpcc = catalog_hpcc()
+    catalog = DFUCatalog(hpcc, page_size=5, NodeGroup="mythor")
+    names = [f.name for f in catalog.iter_files(scopes=["sales", "hr"])]
+    assert sorted(names) == FILES
+    assert [n for n in names if n.startswith("hr")] == FILES[:7]
+    assert {name for name, _ in queries(hpcc)} == {"sales::*", "hr::*"}
+    assert all(kwargs["NodeGroup"] == "mythor" for _, kwargs in hpcc.calls)
+
+
+# Test if a shard capped by MaxNumberOfFiles raises instead of returning part of it
+def test_catalog_subset_raises():
+    catalog = DFUCatalog(catalog_hpcc(max_files=10), page_size=5, max_files=10)
+    with pytest.raises(HPCCException, match=r"sales::\*"):
+        list(catalog.iter_files(scopes=["sales"]))
+    assert len(list(catalog.iter_files(scopes=["hr"]))) == 7
+
+
+# Test if ESP exceptions are raised
+def test_catalog_exception():
+    catalog = DFUCatalog(catalog_hpcc(exception="Access denied"))
+    with pytest.raises(HPCCException, match="Access denied"):
+        list(catalog.iter_files())
+
+
+# Test if names are looked up with one query per scope and matched case insensitively
+def test_catalog_lookup():
+    hpcc = catalog_hpcc()
+    catalog = DFUCatalog(hpcc, page_size=10)
+    names = ["~SALES::file001", "sales::file024", "sales::missing", "hr::file003"]
+    files = catalog.lookup(names)
+    assert files["~SALES::file001"].name == "sales::file001"
+    assert files["sales::file024"].name == "sales::file024"
+    assert files["sales::missing"] is None
+    assert files["hr::file003"].name == "hr::file003"
+    assert queries(hpcc) == [
+        ("hr::file003", 0),
+        ("sales::*", 0),
+        ("sales::*", 10),
+        ("sales::*", 20),
+    ]
+
+
+# Test if the names of a scope much larger than the lookup are queried one by one
+def test_catalog_lookup_large_scope():
+    hpcc = catalog_hpcc()
+    catalog = DFUCatalog(hpcc, page_size=5, scan_factor=2)
+    files = catalog.lookup(["sales::file001", "sales::file020"])
+    assert [f.name for f in files.values()] == ["sales::file001", "sales::file020"]
+    assert queries(hpcc) == [
+        ("sales::*", 0),
+        ("sales::file020", 0),
+    ]
+
+
+# Test if the names of a scope capped by MaxNumberOfFiles are queried one by one
+def test_catalog_lookup_capped_scope():
+    files = [f"big::file{i:03d}" for i in range(150)]
+    hpcc = catalog_hpcc(files=files, max_files=100)
+    catalog = DFUCatalog(hpcc, page_size=100, max_files=100, scan_factor=100)
+    names = files[140:]
+    found = catalog.lookup(names)
+    assert [found[name].name for name in names] == names
+    assert ("big::*", 0) in queries(hpcc)
+
+
+# Test if a scope containing * is looked up without error
+def test_catalog_lookup_wildcard_scope():
+    hpcc = catalog_hpcc(files=["a*::x", "a*::y"])
+    found = DFUCatalog(hpcc).lookup(["a*::x", "a*::y", "a*::z"])
+    assert found["a*::x"].name == "a*::x"
+    assert found["a*::z"] is None
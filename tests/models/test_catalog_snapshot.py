@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+
+import pytest
+from conftest import FakeHPCC
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.catalog_snapshot import CatalogSnapshot
+from pyhpcc.models.file import ReadFileInfo
+
+
+@pytest.fixture
+def hpcc():
+    def dfu_query(PageStartFrom, PageSize, StartDate=None, **kwargs):
+        if hpcc.release is not None:
+            hpcc.release.wait(5)
+        files = [
+            dict(f, Name=name)
+            for name, f in sorted(hpcc.files.items())
+            if StartDate is None
+            or f["Modified"] >= StartDate.replace("T", " ").rstrip("Z")
+        ]
+        page = files[PageStartFrom : PageStartFrom + PageSize]
+        return {
+            "DFUQueryResponse": {
+                "NumFiles": len(files),
+                "IsSubsetOfFiles": hpcc.subset,
+                "DFULogicalFiles": {"DFULogicalFile": page},
+            }
+        }
+
+    def file_query(**kwargs):
+        raise AssertionError("file_query called with a snapshot")
+
+    hpcc = FakeHPCC(
+        dfu_query=dfu_query, file_query=file_query, check_file_exists=file_query
+    )
+    hpcc.files = {
+        "test::sales": {
+            "Modified": "2024-01-01 10:00:00",
+            "NodeGroup": "mythor",
+            "IntSize": 100,
+            "RecordCount": "1,000",
+            "ContentType": "flat",
+        },
+        "test::hr": {
+            "Modified": "2024-01-02 10:00:00",
+            "NodeGroup": "mythor",
+            "IntSize": 50,
+            "RecordCount": "",
+            "ContentType": "csv",
+            "Owner": "hr",
+        },
+    }
+    hpcc.release = None
+    hpcc.subset = False
+    return hpcc
+
+
+def start_dates(hpcc):
+    """StartDate of each DFUQuery call"""
+    return [kwargs.get("StartDate") for _, kwargs in hpcc.calls]
+
+
+# Test if lookups are answered from the snapshot after one full sync
+def test_snapshot_lookup(hpcc):
+    snapshot = CatalogSnapshot(hpcc, page_size=1)
+    sales = snapshot.get("~TEST::Sales")
+    assert (sales.name, sales.total_size, sales.record_count) == (
+        "test::sales",
+        100,
+        1000,
+    )
+    assert snapshot.exists("test::hr")
+    assert not snapshot.exists("test::missing")
+    assert start_dates(hpcc) == [None, None]
+
+
+# Test if a stale snapshot syncs incrementally and a full sync drops deleted files
+def test_snapshot_incremental_and_full_sync(hpcc):
+    snapshot = CatalogSnapshot(hpcc, max_age=0, background_sync=False)
+    assert snapshot.sync() == 2
+    hpcc.files["test::new"] = {"Modified": "2024-01-03 10:00:00", "IntSize": 1}
+    del hpcc.files["test::sales"]
+    assert snapshot.exists("test::new")
+    # Incremental syncs start a day before the newest Modified
+    assert start_dates(hpcc)[-1] == "2024-01-01T10:00:00Z"
+    assert snapshot.exists("test::sales")
+    snapshot.sync(full=True)
+    assert not snapshot.exists("test::sales")
+
+
+# Test if the snapshot persists between instances on the same database file
+def test_snapshot_persists(hpcc, tmp_path):
+    path = str(tmp_path / "catalog.db")
+    CatalogSnapshot(hpcc, path).sync()
+    snapshot = CatalogSnapshot(hpcc, path)
+    assert snapshot.age() < 60
+    assert snapshot.exists("test::hr")
+    assert len(hpcc.calls) == 1
+
+
+# Test if a snapshot written without record_count_text is synced again in full
+def test_snapshot_migrates(hpcc, tmp_path):
+    path = str(tmp_path / "catalog.db")
+    CatalogSnapshot(hpcc, path).sync()
+    db = sqlite3.connect(path)
+    with db:
+        db.execute("ALTER TABLE files DROP COLUMN record_count_text")
+    db.close()
+    snapshot = CatalogSnapshot(hpcc, path)
+    assert snapshot.get("test::hr").record_count_text == ""
+    assert start_dates(hpcc) == [None, None]
+
+
+# Test if ReadFileInfo checks files in the snapshot instead of calling ESP
+def test_read_file_info_snapshot(hpcc):
+    snapshot = CatalogSnapshot(hpcc)
+    read_file_info = ReadFileInfo(hpcc, "test::hr", snapshot=snapshot)
+    assert read_file_info.check_file_in_dfu()
+    read_file_info.check_if_file_exists_and_is_super_file("thor")
+    assert read_file_info.cluster == "mythor"
+    assert read_file_info.file_type == "csv"
+    assert read_file_info.record_count == -2
+    missing = ReadFileInfo(hpcc, "test::missing", snapshot=snapshot)
+    missing.check_if_file_exists_and_is_super_file("thor")
+    assert missing.read_status == "File doesn't exist"
+
+
+# Test if the snapshot gives ReadFileInfo the same attributes as a DFUQuery
+@pytest.mark.parametrize(
+    "attributes",
+    [
+        {"RecordCount": "1,000"},
+        {"RecordCount": ""},
+        {"RecordCount": None},
+        {"RecordCount": "5", "NodeGroup": None, "ContentType": "", "isSuperfile": 1},
+    ],
+)
+def test_read_file_info_snapshot_matches_dfu_query(hpcc, attributes):
+    file = {
+        "Modified": "2024-01-03 10:00:00",
+        "NodeGroup": "mythor",
+        "Totalsize": "1,024",
+        "IntSize": 1024,
+        "ContentType": "flat",
+        "isSuperfile": False,
+    }
+    file.update(attributes)
+    hpcc.files["test::compare"] = file
+
+    def file_query(LogicalName, **kwargs):
+        matched = [dict(f, Name=n) for n, f in hpcc.files.items() if n == LogicalName]
+        return {
+            "DFUQueryResponse": {
+                "NumFiles": len(matched),
+                "DFULogicalFiles": {"DFULogicalFile": matched},
+            }
+        }
+
+    snapshot = CatalogSnapshot(hpcc)
+    hpcc.handlers["file_query"] = file_query
+    fields = (
+        "if_exists",
+        "cluster",
+        "if_superfile",
+        "actual_file_size",
+        "file_type",
+        "record_count",
+        "read_status",
+    )
+    results = []
+    for name in ("test::compare", "test::missing"):
+        for read_file_info in (
+            ReadFileInfo(hpcc, name),
+            ReadFileInfo(hpcc, name, snapshot=snapshot),
+        ):
+            read_file_info.check_if_file_exists_and_is_super_file("thor")
+            results.append(tuple(getattr(read_file_info, f) for f in fields))
+    assert results[0] == results[1]
+    assert results[2] == results[3]
+
+
+# Test if many names are looked up in the snapshot at once
+def test_snapshot_get_many(hpcc):
+    snapshot = CatalogSnapshot(hpcc)
+    files = snapshot.get_many(["TEST::HR", "test::missing", "~test::sales"])
+    assert files["TEST::HR"].owner == "hr"
+    assert files["test::missing"] is None
+    assert files["~test::sales"].record_count == 1000
+
+
+# Test if a stale lookup is answered from the snapshot while a sync runs in the background
+def test_snapshot_background_sync(hpcc):
+    snapshot = CatalogSnapshot(hpcc, max_age=0, overlap=0)
+    snapshot.sync()
+    hpcc.files["test::new"] = {"Modified": "2024-01-03 10:00:00", "IntSize": 1}
+    hpcc.release = threading.Event()
+    assert not snapshot.exists("test::new")
+    assert snapshot.get("test::hr").owner == "hr"
+    hpcc.release.set()
+    with snapshot._sync_lock:
+        pass
+    assert start_dates(hpcc)[1:] == ["2024-01-02T10:00:00Z"]
+    hpcc.release = None
+    assert snapshot.exists("test::new")
+
+
+# Test if a full sync of a capped catalog raises and keeps the snapshot
+def test_snapshot_capped_full_sync(hpcc):
+    snapshot = CatalogSnapshot(hpcc)
+    snapshot.sync()
+    hpcc.subset = True
+    del hpcc.files["test::sales"]
+    with pytest.raises(HPCCException):
+        snapshot.sync(full=True)
+    assert snapshot.exists("test::sales")
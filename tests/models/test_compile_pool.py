@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+
+import pytest
+from pyhpcc.config import COMPILE_WARM_MARKER, METACACHE_OPTION
+from pyhpcc.models.compile_pool import CompileWorkerPool
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+STUB_ECLCC = os.path.join(
+    os.path.dirname(__file__), "..", "..", "benchmarks", "stub_eclcc.py"
+)
+
+
+@pytest.fixture
+def stub_compiler(monkeypatch):
+    monkeypatch.setenv("STUB_ECLCC_COLD", "0")
+    monkeypatch.setenv("STUB_ECLCC_WARM", "0")
+    return f"{sys.executable} {os.path.abspath(STUB_ECLCC)}"
+
+
+@pytest.fixture
+def pool(hpcc, stub_compiler):
+    ws = WorkunitSubmit(hpcc, ("thor",))
+    with CompileWorkerPool(ws, workers=3, compiler=stub_compiler) as pool:
+        yield pool
+
+
+# Test if jobs with the same include paths share a worker and a metacache directory
+def test_compile_pool_routing(pool):
+    options = {"-I": "/repos/a"}
+    assert pool.route(options) == pool.route({"-I": "/repos/a", "-E": bool})
+    assert pool.cache_dir(options, 0) == pool.cache_dir({"-I": "/repos/a"}, 0)
+    assert pool.cache_dir(options, 0) != pool.cache_dir({"-I": "/repos/b"}, 0)
+    assert pool.cache_dir(options, 0) != pool.cache_dir(options, 1)
+
+
+class SlowSubmit:
+    def __init__(self):
+        self.release = threading.Event()
+        self.caches = []
+
+    def bash_compile(self, file_name, options, compiler):
+        self.caches.append(options[METACACHE_OPTION])
+        self.release.wait(5)
+        return {"status": "success"}, file_name + "xml"
+
+
+# Test if compiles of one repository spread over idle workers, each with its own cache
+def test_compile_pool_parallel_same_repo(tmp_path):
+    ws = SlowSubmit()
+    with CompileWorkerPool(ws, workers=3, cache_root=str(tmp_path)) as pool:
+        options = {"-I": "/repos/a"}
+        futures = [pool.submit(f"q{i}.ecl", options) for i in range(3)]
+        assert sorted(pool.stats().values()) == [1, 1, 1]
+        ws.release.set()
+        for future in futures:
+            future.result()
+        assert len(set(ws.caches)) == 3
+        # Once idle, the next compile goes to a warm worker
+        pool.submit("q3.ecl", options).result()
+        assert ws.caches[-1] in ws.caches[:3]
+
+
+class FailingSubmit:
+    def bash_compile(self, file_name, options, compiler):
+        if file_name.startswith("bad"):
+            return {"status": "error"}, file_name + "xml"
+        return {"status": "success"}, file_name + "xml"
+
+
+# Test if only a successful compile marks a metacache as warm
+def test_compile_pool_warm_after_success(tmp_path):
+    with CompileWorkerPool(
+        FailingSubmit(), workers=2, cache_root=str(tmp_path)
+    ) as pool:
+        options = {"-I": "/repos/a"}
+        home = pool.route(options)
+        other = 1 - home
+        # An existing but empty cache directory does not attract jobs
+        pool.cache_dir(options, other)
+        assert pool.route(options) == home
+        pool.submit("bad.ecl", options).result()
+        marker = os.path.join(pool.cache_dir(options, home), COMPILE_WARM_MARKER)
+        assert not os.path.exists(marker)
+        pool.submit("good.ecl", options).result()
+        assert os.path.exists(marker)
+
+
+# Test if compiles run through the stub compiler with the pinned metacache
+def test_compile_pool_compile(tmp_path, pool):
+    file_name = str(tmp_path / "query.ecl")
+    with open(file_name, "w") as f:
+        f.write("OUTPUT(1);")
+    options = {"-I": str(tmp_path)}
+    output, output_file = pool.compile(file_name, options)
+    assert output["status"] == "success"
+    assert os.path.exists(output_file)
+    cache_dir = pool.cache_dir(options, pool.route(options))
+    assert f"{METACACHE_OPTION} {cache_dir}" in output["bash_command"]
+    assert sum(pool.stats().values()) == 1
+
+
+# Test if the temporary cache root is removed when the pool is closed
+def test_compile_pool_close(hpcc, stub_compiler):
+    pool = CompileWorkerPool(WorkunitSubmit(hpcc, ("thor",)), compiler=stub_compiler)
+    cache_dir = pool.cache_dir({}, 0)
+    pool.close()
+    assert not os.path.exists(cache_dir)
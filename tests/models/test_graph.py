@@ -0,0 +1,121 @@
+import tracemalloc
+
+import pyhpcc.utils as utils
+import pytest
+from conftest import FakeHPCC, esp_exception
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.graph import GraphAnalyzer, parse_graph
+
+GRAPH = """<graph>
+ <node id="1" label="">
+  <att>
+   <graph>
+    <att name="TimeAvgLocalExecute" value="2000000000"/>
+    <att name="TimeMaxLocalExecute" value="3000000000"/>
+    <att name="SkewMaxLocalExecute" value="5000"/>
+    <node id="2" label="Disk Read&#10;'test::in'">
+     <att name="_kind" value="2"/>
+     <att name="TimeMaxLocalExecute" value="100ms"/>
+     <att name="SkewMaxLocalExecute" value="+5%"/>
+    </node>
+    <node id="3" label="Join">
+     <att name="_kind" value="10"/>
+     <att name="TimeAvgLocalExecute" value="1500000000"/>
+     <att name="TimeMaxLocalExecute" value="2900000000"/>
+     <att name="SkewMaxLocalExecute" value="9333"/>
+    </node>
+    <edge id="2_0" source="2" target="3">
+     <att name="NumRowsProcessed" value="1000"/>
+    </edge>
+   </graph>
+  </att>
+ </node>
+ <node id="4" label="">
+  <att>
+   <graph>
+    <node id="5" label="Output">
+     <att name="TimeMaxLocalExecute" value="1s"/>
+    </node>
+    <edge id="3_0" source="3" target="5"><att name="count" value="1,500"/></edge>
+   </graph>
+  </att>
+ </node>
+</graph>"""
+
+
+def get_graph(Wuid, GraphName=None):
+    if Wuid == "W-missing":
+        return esp_exception("Invalid Workunit ID")
+    graphs = [{"Name": "graph1", "Graph": GRAPH}, {"Name": "graph2", "Graph": ""}]
+    return {"WUGetGraphResponse": {"Graphs": {"ECLGraphEx": graphs}}}
+
+
+# Test if subgraph and activity timings, skew and row counts are parsed
+def test_parse_graph():
+    analysis = parse_graph(GRAPH, "graph1")
+    subgraphs = {s.id: s for s in analysis.subgraphs}
+    assert (subgraphs["1"].time_avg, subgraphs["1"].skew_max) == (2.0, 50.0)
+    assert (subgraphs["1"].activities, subgraphs["4"].activities) == (2, 1)
+    activities = {a.id: a for a in analysis.activities}
+    join = activities["3"]
+    assert (join.subgraph_id, join.kind, join.label) == ("1", "10", "Join")
+    assert (join.time_max, join.skew_max) == pytest.approx((2.9, 93.33))
+    assert (join.rows_in, join.rows_out) == (1000, 1500)
+    assert activities["2"].time_max == pytest.approx(0.1)
+    assert activities["2"].skew_max == 5.0
+    assert [a.id for a in analysis.hot_activities(2)] == ["3", "5"]
+    assert [a.id for a in analysis.skewed_activities()] == ["3"]
+
+
+# Test if malformed xgmml raises an HPCCException
+def test_parse_graph_malformed():
+    with pytest.raises(HPCCException, match="graph1"):
+        parse_graph("<graph><node>", "graph1")
+
+
+# Test if many workunits are analyzed, in the calling process and in a process pool
+@pytest.mark.parametrize("processes", [0, 2])
+def test_analyze_many(processes):
+    analyzer = GraphAnalyzer(FakeHPCC(get_graph=get_graph), processes=processes)
+    analyses = analyzer.analyze_many(["W1", "W2"])
+    assert list(analyses) == ["W1", "W2"]
+    assert analyses["W2"].wuid == "W2"
+    assert len(analyses["W2"].activities) == 3
+    assert analyses["W2"].activities[0].graph_name == "graph1"
+
+
+# Test if ESP exceptions are raised
+def test_analyze_exception():
+    with pytest.raises(HPCCException, match="Invalid Workunit ID"):
+        GraphAnalyzer(FakeHPCC(get_graph=get_graph)).analyze("W-missing")
+
+
+# Test if get_graph_skew reports the skew and average time of each subgraph
+def test_get_graph_skew():
+    skew = utils.get_graph_skew(FakeHPCC(get_graph=get_graph).get_graph(Wuid="W1"))
+    assert skew == [
+        {"subgraphid": "1", "graph": "graph1", "skewmax": 50.0, "avgtime": 2.0},
+        {"subgraphid": "4", "graph": "graph1", "skewmax": None, "avgtime": None},
+    ]
+
+
+# Test if parsing keeps only the attributes used, not the elements read
+def test_parse_graph_memory():
+    padding = "x" * 200
+    edges = "".join(
+        f'<edge id="e{i}" source="1" target="2"><att name="NumRowsProcessed"'
+        f' value="1"/><att name="Label" value="{padding}"/></edge>'
+        for i in range(20000)
+    )
+    xml = (
+        '<graph><node id="10"><att><graph><node id="1"/><node id="2"/>'
+        f"{edges}</graph></att></node></graph>"
+    ).encode()
+    tracemalloc.start()
+    try:
+        analysis = parse_graph(xml)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert {a.id: a.rows_in for a in analysis.activities}["2"] == 20000
+    assert peak < len(xml) / 2
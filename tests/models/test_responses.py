@@ -0,0 +1,104 @@
+import pytest
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.responses import (
+    ActivityResponse,
+    DFUInfoResponse,
+    DFUQueryResponse,
+    WUInfoResponse,
+    WUQueryResponse,
+    WUResultResponse,
+)
+
+
+# Test if DFUQuery files are read with comma separated numbers parsed
+def test_dfu_query_response():
+    response = DFUQueryResponse.from_response(
+        {
+            "DFUQueryResponse": {
+                "NumFiles": 2,
+                "DFULogicalFiles": {
+                    "DFULogicalFile": [
+                        {
+                            "Name": "a::b",
+                            "NodeGroup": "mythor",
+                            "Totalsize": "1,234,567",
+                            "RecordCount": "1,000",
+                            "isSuperfile": False,
+                        },
+                        {"Name": "a::super", "isSuperfile": True, "RecordCount": ""},
+                    ]
+                },
+            }
+        }
+    )
+    assert response.num_files == 2
+    first, second = response.files
+    assert (first.total_size, first.record_count) == (1234567, 1000)
+    assert second.is_superfile and second.record_count is None
+
+
+# Test if WUInfo timers and graphs are read
+def test_wu_info_response():
+    response = WUInfoResponse.from_response(
+        {
+            "WUInfoResponse": {
+                "Workunit": {
+                    "Wuid": "W20240101-000001",
+                    "State": "completed",
+                    "StateID": 3,
+                    "Timers": {
+                        "ECLTimer": [{"Name": "Total thor time", "Value": "1.5s"}]
+                    },
+                    "Graphs": {"ECLGraph": [{"Name": "graph1", "Complete": True}]},
+                }
+            }
+        }
+    )
+    assert response.workunit.wuid == "W20240101-000001"
+    assert response.workunit.state_id == 3
+    assert response.timers[0].value == "1.5s"
+    assert response.graphs[0].complete
+
+
+# Test if WUQuery, WUResult, DFUInfo and Activity responses are read
+def test_other_responses():
+    query = WUQueryResponse.from_response(
+        {"WUQueryResponse": {"Workunits": {"ECLWorkunit": [{"Wuid": "W1"}]}}}
+    )
+    assert query.num_wus == 1 and query.workunits[0].wuid == "W1"
+    result = WUResultResponse.from_response(
+        {"WUResultResponse": {"Wuid": "W1", "Total": 2, "Result": {"Row": [1, 2]}}}
+    )
+    assert (result.total, result.rows) == (2, [1, 2])
+    info = DFUInfoResponse.from_response(
+        {
+            "DFUInfoResponse": {
+                "FileDetail": {
+                    "Name": "a::super",
+                    "isSuperfile": True,
+                    "subfiles": {"Item": ["a::one", "a::two"]},
+                }
+            }
+        }
+    )
+    assert info.subfiles == ["a::one", "a::two"]
+    activity = ActivityResponse.from_response({"ActivityResponse": {}})
+    assert activity.running == []
+
+
+# Test if ESP exceptions are raised
+def test_response_exceptions():
+    with pytest.raises(HPCCException, match="Cannot find file"):
+        DFUInfoResponse.from_response(
+            {
+                "DFUInfoResponse": {
+                    "Exceptions": {"Exception": [{"Message": "Cannot find file"}]}
+                }
+            }
+        )
+
+
+# Test if the models use slots
+def test_response_slots():
+    with pytest.raises(AttributeError):
+        WUQueryResponse(0).extra = 1
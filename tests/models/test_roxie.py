@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+from conftest import FakeResponse
+from pyhpcc.cache import TTLCache
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.roxie import Roxie, RoxieClient
+
+
+@pytest.fixture
+def roxie_auth():
+    return Auth("roxie.host", 8002, "user", "password", protocol="http")
+
+
+@pytest.fixture
+def client(roxie_auth):
+    with RoxieClient(roxie_auth, "fetch_person", "roxie", max_workers=8) as client:
+        yield client
+
+
+# Test if the query url is built from the auth url, target and query name
+def test_roxie_query_url(roxie_auth):
+    roxie = Roxie(roxie_auth, "fetch_person", "roxie")
+    assert (
+        roxie.get_query_url()
+        == "http://roxie.host:8002/WsEcl/submit/query/roxie/fetch_person/.json"
+    )
+    assert roxie.get_query_url("http://other:8002").startswith("http://other:8002/")
+
+
+# Test if call_many returns responses in input order while running in parallel
+def test_roxie_client_call_many_order(client, mocker):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def request(method, url, params, **kwargs):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.01 * (10 - int(params["id"])))
+        with lock:
+            active.pop()
+        return FakeResponse(params=params)
+
+    mocker.patch.object(client.session, "request", side_effect=request)
+    responses = client.call_many([{"id": i} for i in range(10)])
+    assert [r.params["id"] for r in responses] == [str(i).encode() for i in range(10)]
+    assert max(peak) > 1
+
+
+# Test if failed requests raise or are returned in place with return_exceptions
+def test_roxie_client_call_many_errors(client, mocker):
+    mocker.patch.object(
+        client.session,
+        "request",
+        side_effect=lambda method, url, params, **kwargs: FakeResponse(
+            status_code=500 if params["id"] == b"1" else 200, params=params
+        ),
+    )
+    with pytest.raises(requests.HTTPError):
+        client.call_many([{"id": 0}, {"id": 1}])
+    responses = client.call_many([{"id": 0}, {"id": 1}], return_exceptions=True)
+    assert isinstance(responses[0], FakeResponse)
+    assert isinstance(responses[1], requests.HTTPError)
+
+
+# Test if the client does not share state with the auth session
+def test_roxie_client_own_session(client, roxie_auth):
+    assert client.session is not roxie_auth.session
+    adapter = client.session.get_adapter("http://roxie.host")
+    assert adapter._pool_maxsize == 8
+
+
+# Test if the client answers repeated requests from its cache
+def test_roxie_client_cache(mocker):
+    cache = TTLCache()
+    client = RoxieClient(
+        Auth("localhost", 8002, "user", "password"), "query", "roxie", cache=cache
+    )
+    request = mocker.patch.object(client.session, "request")
+    with client:
+        client.call_many([{"id": 1}, {"id": 2}])
+        client.call_many([{"id": 1}, {"id": 2}], data='{"b": 1, "a": 2}')
+        client.call_many([{"id": 1}, {"id": 2}], data='{"a": 2, "b": 1}')
+    assert request.call_count == 4
+    assert cache.stats()["hits"] == 2
+
+
+# Test if the client negative-caches client errors but not server errors
+@pytest.mark.parametrize("status, expected_calls", [(404, 1), (503, 2)])
+def test_roxie_client_negative_cache(mocker, status, expected_calls):
+    client = RoxieClient(
+        Auth("localhost", 8002, "user", "password"),
+        "query",
+        "roxie",
+        cache=TTLCache(negative_ttl=10),
+    )
+    request = mocker.patch.object(
+        client.session,
+        "request",
+        return_value=FakeResponse(status_code=status, params={}),
+    )
+    with client:
+        for _ in range(2):
+            with pytest.raises(requests.HTTPError):
+                client.call({"id": 1})
+    assert request.call_count == expected_calls
+
+
+def _score_request(key_field, reverse=False):
+    def request(method, url, data, **kwargs):
+        rows = json.loads(data)["fetch_person"]["people"]["Row"]
+        assert len(rows) <= 4
+        results = [{"id": row["id"], "score": row["id"] * 10} for row in rows]
+        if reverse:
+            results.reverse()
+        return FakeResponse(
+            {"fetch_personResponse": {"Results": {"scores": {"Row": results}}}}
+        )
+
+    return request
+
+
+# Test if batched rows are split back per input in input order
+@pytest.mark.parametrize("key_field, reverse", [(None, False), ("id", True)])
+def test_roxie_client_call_batch(client, mocker, key_field, reverse):
+    request = mocker.patch.object(
+        client.session, "request", side_effect=_score_request(key_field, reverse)
+    )
+    inputs = [{"id": i} for i in range(10)]
+    rows = client.call_batch(inputs, "people", batch_size=4, key_field=key_field)
+    assert [row[0]["score"] for row in rows] == [i * 10 for i in range(10)]
+    assert request.call_count == 3
+    assert request.call_args.kwargs["headers"]["Content-Type"] == "application/json"
+
+
+# Test if a result with a different number of rows than the batch is rejected
+def test_roxie_client_call_batch_mismatch(client, mocker):
+    mocker.patch.object(
+        client.session,
+        "request",
+        return_value=FakeResponse(
+            {"fetch_personResponse": {"Results": {"scores": {"Row": [{"id": 1}]}}}}
+        ),
+    )
+    with pytest.raises(HPCCException):
+        client.call_batch([{"id": 1}, {"id": 2}], "people")
+
+
+# Test if query exceptions are raised
+def test_roxie_client_call_batch_exception(client, mocker):
+    mocker.patch.object(
+        client.session,
+        "request",
+        return_value=FakeResponse(
+            {
+                "fetch_personResponse": {
+                    "Exceptions": {"Exception": [{"Message": "Unknown dataset"}]}
+                }
+            }
+        ),
+    )
+    with pytest.raises(HPCCException, match="Unknown dataset"):
+        client.call_batch([{"id": 1}], "people")
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+from conftest import FakeResponse
+from pyhpcc.cache import TTLCache
+from pyhpcc.config import DEFAULT_ROXIE_WORKERS
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.roxie_async import AsyncRoxieClient
+
+
+class FakeRoxie:
+    """Counts concurrent requests and sleeps according to the id parameter"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, params, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            ident = int(params["id"])
+            if ident < 0:
+                raise requests.ConnectionError("refused")
+            time.sleep(0.002 * (ident % 5))
+            return FakeResponse(params=params)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def roxie_auth():
+    return Auth("roxie.host", 8002, "user", "password", protocol="http")
+
+
+def _client(roxie_auth, mocker, **kwargs):
+    client = AsyncRoxieClient(
+        roxie_auth, "fetch_person", "roxie", transport="threads", **kwargs
+    )
+    fake = FakeRoxie()
+    mocker.patch.object(client.client.session, "request", side_effect=fake.request)
+    return client, fake
+
+
+# Test if gather returns responses in input order without exceeding the concurrency window
+def test_async_gather(roxie_auth, mocker):
+    client, fake = _client(roxie_auth, mocker, max_concurrency=4)
+
+    async def run():
+        async with client:
+            return await client.gather({"id": i} for i in range(40))
+
+    responses = asyncio.run(run())
+    assert [r.params["id"] for r in responses] == [str(i).encode() for i in range(40)]
+    assert 1 < fake.peak <= 4
+
+
+# Test if as_completed yields every input once with its index
+def test_async_as_completed(roxie_auth, mocker):
+    client, _ = _client(roxie_auth, mocker, max_concurrency=3)
+
+    async def run():
+        async with client:
+            return [
+                item
+                async for item in client.as_completed([{"id": i} for i in range(10)])
+            ]
+
+    items = asyncio.run(run())
+    assert sorted(index for index, _ in items) == list(range(10))
+    assert all(r.params["id"] == str(i).encode() for i, r in items)
+
+
+# Test if failed requests are raised or returned
+def test_async_exceptions(roxie_auth, mocker):
+    client, _ = _client(roxie_auth, mocker, max_concurrency=2)
+    inputs = [{"id": 1}, {"id": -1}, {"id": 2}]
+
+    async def run():
+        async with client:
+            with pytest.raises(requests.ConnectionError):
+                await client.gather(inputs)
+            return await client.gather(inputs, return_exceptions=True)
+
+    responses = asyncio.run(run())
+    assert isinstance(responses[1], requests.ConnectionError)
+    assert responses[2].params["id"] == b"2"
+
+
+# Test if a request that exceeds its timeout is abandoned
+def test_async_timeout(roxie_auth, mocker):
+    client, fake = _client(roxie_auth, mocker, max_concurrency=1)
+
+    async def run():
+        async with client:
+            with pytest.raises(asyncio.TimeoutError):
+                await client.call({"id": 4}, timeout=0.001)
+            # The slot is freed once the abandoned request finishes
+            return await client.call({"id": 1}, timeout=1)
+
+    assert asyncio.run(run()).params["id"] == b"1"
+    assert fake.peak == 1
+
+
+# Test if the admission window is separate from the threads sending requests
+def test_async_window_larger_than_workers(roxie_auth, mocker):
+    client, fake = _client(roxie_auth, mocker, max_concurrency=16, max_workers=2)
+
+    async def run():
+        async with client:
+            return await client.gather({"id": i} for i in range(40))
+
+    assert len(asyncio.run(run())) == 40
+    assert client.client.max_workers == 2
+    assert fake.peak <= 2
+
+
+class RoxieServer:
+    """aiohttp server answering queries after a delay, counting concurrent requests"""
+
+    def __init__(self, web, delay=0.05):
+        self.web = web
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append(request)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            ident = request.query["id"]
+            if ident == "bad":
+                return self.web.json_response({"error": "bad input"}, status=400)
+            return self.web.json_response({"id": ident})
+        finally:
+            self.active -= 1
+
+    async def client(self, **kwargs):
+        app = self.web.Application()
+        app.router.add_post("/{tail:.*}", self.handle)
+        self.runner = self.web.AppRunner(app)
+        await self.runner.setup()
+        await self.web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        port = self.runner.addresses[0][1]
+        auth = Auth("127.0.0.1", port, "user", "password", protocol="http")
+        return AsyncRoxieClient(
+            auth, "fetch_person", "roxie", transport="aiohttp", **kwargs
+        )
+
+
+# Test if the aiohttp transport keeps more requests in flight than there are threads
+def test_aiohttp_transport_concurrency():
+    server = RoxieServer(pytest.importorskip("aiohttp.web"))
+
+    async def run():
+        client = await server.client(max_concurrency=200)
+        try:
+            async with client:
+                return await client.gather({"id": i} for i in range(1000))
+        finally:
+            await server.runner.cleanup()
+
+    responses = asyncio.run(run())
+    assert isinstance(responses[0], requests.Response)
+    assert [r.json()["id"] for r in responses] == [str(i) for i in range(1000)]
+    assert DEFAULT_ROXIE_WORKERS < server.peak <= 200
+    assert server.requests[0].headers["Authorization"].startswith("Basic ")
+
+
+# Test if the aiohttp transport raises 4xx responses and caches them like RoxieClient
+def test_aiohttp_transport_client_error():
+    server = RoxieServer(pytest.importorskip("aiohttp.web"), delay=0)
+
+    async def run():
+        client = await server.client(cache=TTLCache(negative_ttl=10))
+        try:
+            async with client:
+                for _ in range(2):
+                    with pytest.raises(requests.HTTPError):
+                        await client.call({"id": "bad"})
+                return await client.call({"id": 1})
+        finally:
+            await server.runner.cleanup()
+
+    assert asyncio.run(run()).json() == {"id": "1"}
+    assert len(server.requests) == 2
+
+
+# Test if an unknown transport is rejected
+def test_unknown_transport(roxie_auth):
+    with pytest.raises(ValueError):
+        AsyncRoxieClient(roxie_auth, "fetch_person", "roxie", transport="curl")
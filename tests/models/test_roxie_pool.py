@@ -0,0 +1,141 @@
+import time
+from collections import Counter
+
+import pytest
+import requests
+from conftest import FakeResponse
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.roxie import RoxieClient
+from pyhpcc.models.roxie_pool import LEAST_LATENCY, RoxieEndpointPool
+
+URLS = ["http://esp1:8002", "http://esp2:8002", "http://esp3:8002"]
+
+
+def choose_and_succeed(pool, count, latency=0.01):
+    chosen = Counter()
+    for _ in range(count):
+        endpoint = pool.choose()
+        pool.report_success(endpoint, latency)
+        chosen[endpoint.base_url] += 1
+    return chosen
+
+
+# Test if round robin spreads requests evenly
+def test_pool_round_robin():
+    assert choose_and_succeed(RoxieEndpointPool(URLS), 9) == Counter(
+        {url: 3 for url in URLS}
+    )
+
+
+# Test if least latency routing prefers the fastest endpoint
+def test_pool_least_latency():
+    pool = RoxieEndpointPool(URLS, strategy=LEAST_LATENCY)
+    for endpoint, latency in zip(pool.endpoints, [0.5, 0.01, 0.3]):
+        pool.choose()
+        pool.report_success(endpoint, latency)
+    assert pool.choose().base_url == "http://esp2:8002"
+
+
+# Test if an endpoint is ejected after consecutive failures and readmitted later
+def test_pool_ejects_and_readmits():
+    pool = RoxieEndpointPool(URLS[:2], max_failures=2, eject_seconds=0.05)
+    bad = pool.endpoints[0]
+    for _ in range(2):
+        pool.choose(exclude=(pool.endpoints[1],))
+        pool.report_failure(bad)
+    assert pool.stats()[bad.base_url]["ejected"]
+    assert set(choose_and_succeed(pool, 4)) == {"http://esp2:8002"}
+    time.sleep(0.06)
+    assert "http://esp1:8002" in choose_and_succeed(pool, 4)
+
+
+# Test if an endpoint with a slow p95 is ejected
+def test_pool_ejects_slow_endpoint():
+    pool = RoxieEndpointPool(URLS[:2], max_latency=0.1, min_samples=3)
+    slow = pool.endpoints[0]
+    for _ in range(3):
+        pool.choose(exclude=(pool.endpoints[1],))
+        pool.report_success(slow, 1.0)
+    assert pool.stats()[slow.base_url]["ejected"]
+
+
+# Test if the pool falls back to an ejected endpoint when all are ejected
+def test_pool_all_ejected():
+    pool = RoxieEndpointPool(URLS[:1], max_failures=1)
+    pool.report_failure(pool.choose())
+    assert pool.choose() is pool.endpoints[0]
+    assert pool.choose(exclude=pool.endpoints) is None
+
+
+# Test if the hedge delay is only known after enough samples
+def test_pool_hedge_delay():
+    pool = RoxieEndpointPool(URLS, min_samples=10)
+    choose_and_succeed(pool, 9)
+    assert pool.hedge_delay() is None
+    choose_and_succeed(pool, 1)
+    assert pool.hedge_delay() == pytest.approx(0.01)
+
+
+@pytest.fixture
+def roxie_auth():
+    return Auth("esp1", 8002, "user", "password", protocol="http")
+
+
+# Test if a hedged request returns the faster endpoint's response
+def test_client_hedged_request(roxie_auth, mocker):
+    pool = RoxieEndpointPool(URLS[:2])
+    client = RoxieClient(
+        roxie_auth, "query", "roxie", endpoints=pool, hedge=True, hedge_delay=0.02
+    )
+
+    def request(method, url, **kwargs):
+        if url.startswith("http://esp1"):
+            time.sleep(0.5)
+        return FakeResponse(url=url)
+
+    mocker.patch.object(client.session, "request", side_effect=request)
+    with client:
+        start = time.perf_counter()
+        resp = client.call({"id": 1})
+        assert time.perf_counter() - start < 0.4
+    assert resp.url.startswith("http://esp2")
+
+
+# Test if a failed request is retried on another endpoint
+def test_client_hedged_failover(roxie_auth, mocker):
+    pool = RoxieEndpointPool(URLS[:2])
+    client = RoxieClient(roxie_auth, "query", "roxie", endpoints=pool, hedge=True)
+
+    def request(method, url, **kwargs):
+        if url.startswith("http://esp1"):
+            raise requests.ConnectionError()
+        return FakeResponse(url=url)
+
+    mocker.patch.object(client.session, "request", side_effect=request)
+    with client:
+        assert client.call({"id": 1}).url.startswith("http://esp2")
+    assert pool.stats()["http://esp1:8002"]["failures"] == 1
+
+
+# Test if 4xx responses are sent once and never eject an endpoint
+@pytest.mark.parametrize("hedge", [False, True])
+def test_client_error_keeps_endpoints(roxie_auth, mocker, hedge):
+    pool = RoxieEndpointPool(URLS[:2], max_failures=2)
+    client = RoxieClient(roxie_auth, "query", "roxie", endpoints=pool, hedge=hedge)
+    request = mocker.patch.object(
+        client.session, "request", return_value=FakeResponse(status_code=400)
+    )
+    with client:
+        for _ in range(3):
+            with pytest.raises(requests.HTTPError):
+                client.call({"id": 1})
+    assert request.call_count == 3
+    stats = pool.stats()
+    assert not any(stats[url]["ejected"] for url in URLS[:2])
+    assert sum(stats[url]["failures"] for url in URLS[:2]) == 0
+
+
+# Test if hedging without an endpoint pool is rejected
+def test_client_hedge_requires_pool(roxie_auth):
+    with pytest.raises(ValueError):
+        RoxieClient(roxie_auth, "query", "roxie", hedge=True)
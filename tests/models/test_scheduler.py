@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+from conftest import FakeHPCC
+from pyhpcc.config import CLUSTER_OPTION
+from pyhpcc.models.scheduler import COMPLETED, FAILED, WorkunitScheduler
+
+
+def workunit_hpcc():
+    def wu_query(Wuid):
+        return {
+            "WUQueryResponse": {
+                "Workunits": {"ECLWorkunit": [{"Wuid": Wuid, "State": "completed"}]}
+            }
+        }
+
+    return FakeHPCC(wu_query=wu_query)
+
+
+class FakeSubmit:
+    def __init__(self, clusters, state="completed", delay=0.01, output=None):
+        self.hpcc = workunit_hpcc()
+        self.clusters = clusters
+        self.state = state
+        self.delay = delay
+        self.output = output
+        self.lock = threading.Lock()
+        self.running = Counter()
+        self.peak = Counter()
+        self.order = []
+
+    def bash_run(self, compiled_file, options=None):
+        cluster = options[CLUSTER_OPTION]
+        with self.lock:
+            self.order.append(compiled_file)
+            self.running[cluster] += 1
+            self.peak[cluster] = max(self.peak[cluster], self.running[cluster])
+        time.sleep(self.delay)
+        with self.lock:
+            self.running[cluster] -= 1
+        if self.output is not None:
+            return self.output
+        wuid = "W20240101-" + compiled_file.split(".")[0]
+        return {"wu_info": {"wuid": wuid, "state": self.state}}
+
+
+# Test if the scheduler refuses to run without any concurrency cap
+def test_scheduler_requires_limits():
+    with pytest.raises(ValueError):
+        WorkunitScheduler(FakeSubmit(("thor",)))
+
+
+# Test if per-cluster limits are never exceeded and every job completes
+def test_scheduler_cluster_limits():
+    ws = FakeSubmit(("thor", "hthor"))
+    with WorkunitScheduler(ws, cluster_limits={"thor": 2, "hthor": 1}) as scheduler:
+        jobs = [scheduler.submit(f"{i}.eclxml") for i in range(12)]
+        assert scheduler.join(timeout=10)
+    assert all(job.status == COMPLETED for job in jobs)
+    assert ws.peak["thor"] <= 2
+    assert ws.peak["hthor"] <= 1
+    metrics = scheduler.metrics()
+    assert metrics["completed"] == 12
+    assert metrics["queued"] == 0
+    assert metrics["queue_wait"]["p95"] is not None
+
+
+# Test if higher priority jobs are dispatched first
+def test_scheduler_priority_order():
+    ws = FakeSubmit(("thor",))
+    scheduler = WorkunitScheduler(ws, max_concurrent=1)
+    scheduler.submit("low.eclxml", priority=0)
+    scheduler.submit("high.eclxml", priority=10)
+    scheduler.submit("mid.eclxml", priority=5)
+    with scheduler:
+        assert scheduler.join(timeout=10)
+    assert ws.order == ["high.eclxml", "mid.eclxml", "low.eclxml"]
+
+
+# Test if workunits still running after bash_run are completed through WUQuery
+def test_scheduler_tracks_with_wu_query():
+    ws = FakeSubmit(("thor",), state="running")
+    with WorkunitScheduler(ws, max_concurrent=2, poll_interval=0.05) as scheduler:
+        job = scheduler.submit("1.eclxml")
+        assert job.wait(timeout=10)
+    assert job.status == COMPLETED
+    assert job.wu_state == "completed"
+    assert ws.hpcc.calls == [("wu_query", {"Wuid": "W20240101-1"})]
+
+
+# Test if errors in the ecl run output fail the job
+def test_scheduler_failed_run():
+    output = {
+        "wu_info": {"wuid": None, "state": None},
+        "error": {"message": ["401: Unauthorized Access"]},
+    }
+    ws = FakeSubmit(("thor",), output=output)
+    with WorkunitScheduler(ws, max_concurrent=1) as scheduler:
+        job = scheduler.submit("1.eclxml")
+        assert job.wait(timeout=10)
+    assert job.status == FAILED
+    assert "401" in str(job.error)
+    assert scheduler.metrics()["failed"] == 1
+
+
+# Test if queued jobs can be cancelled
+def test_scheduler_cancel():
+    scheduler = WorkunitScheduler(FakeSubmit(("thor",)), max_concurrent=1)
+    job = scheduler.submit("1.eclxml")
+    assert scheduler.cancel(job)
+    assert job.done()
+    assert scheduler.metrics()["queued"] == 0
+
+
+# Test if clusters without a limit run up to max_concurrent jobs at once
+def test_scheduler_unlimited_cluster():
+    ws = FakeSubmit(("thor",), delay=0.05)
+    with WorkunitScheduler(ws, max_concurrent=4) as scheduler:
+        for i in range(8):
+            scheduler.submit(f"{i}.eclxml")
+        assert scheduler.join(timeout=10)
+    assert 1 < ws.peak["thor"] <= 4
+
+
+# Test if a slow WUQuery poll does not hold up dispatching
+def test_scheduler_polls_off_dispatcher():
+    ws = FakeSubmit(("thor",), state="running", delay=0)
+    release = threading.Event()
+    wu_query = ws.hpcc.wu_query
+
+    def slow_wu_query(Wuid):
+        release.wait(5)
+        return wu_query(Wuid=Wuid)
+
+    ws.hpcc.wu_query = slow_wu_query
+    with WorkunitScheduler(ws, max_concurrent=2, poll_interval=0.01) as scheduler:
+        first = scheduler.submit("1.eclxml")
+        time.sleep(0.1)
+        ws.state = "completed"
+        second = scheduler.submit("2.eclxml")
+        assert second.wait(timeout=2)
+        assert not first.done()
+        release.set()
+        assert first.wait(timeout=10)
+
+
+# Test if shutdown without waiting still stops the worker threads
+def test_scheduler_shutdown_no_wait():
+    ws = FakeSubmit(("thor",))
+    scheduler = WorkunitScheduler(ws, max_concurrent=1)
+    scheduler.start()
+    job = scheduler.submit("1.eclxml")
+    scheduler.shutdown(wait=False)
+    assert job.wait(timeout=10)
+    scheduler._dispatcher.join(timeout=10)
+    assert scheduler._executor._shutdown
@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.single_flight import SingleFlightSubmit
+
+
+class FakeSubmit:
+    def __init__(self, delay=0.05, error=None, run_output=None):
+        self.delay = delay
+        self.error = error
+        self.run_output = run_output
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def submit_query(
+        self, query_text, working_folder, job_name, compile_options, run_options
+    ):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        if self.run_output is not None:
+            return {"status": "success"}, self.run_output
+        return {"status": "success"}, {"wu_info": {"wuid": f"W20240101-{call}"}}
+
+
+def submit_concurrently(single_flight, count, **kwargs):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [
+            executor.submit(single_flight.submit, "OUTPUT(1);", "job", **kwargs)
+            for _ in range(count)
+        ]
+        return [future.result() for future in futures]
+
+
+# Test if concurrent identical submissions share one compile and run
+def test_single_flight_shares_in_flight():
+    ws = FakeSubmit()
+    single_flight = SingleFlightSubmit(ws, "folder")
+    results = submit_concurrently(single_flight, 8)
+    assert ws.calls == 1
+    assert {result[1]["wu_info"]["wuid"] for result in results} == {"W20240101-1"}
+    stats = single_flight.stats()
+    assert stats["executed"] == 1
+    assert stats["shared"] == 7
+
+
+# Test if every caller gets its own copy of the shared result
+def test_single_flight_results_are_copies():
+    ws = FakeSubmit()
+    single_flight = SingleFlightSubmit(ws, "folder", reuse_window=60)
+    results = submit_concurrently(single_flight, 4)
+    results[0][1]["wu_info"]["wuid"] = "changed"
+    assert [result[1]["wu_info"]["wuid"] for result in results[1:]] == [
+        "W20240101-1"
+    ] * 3
+    reused = single_flight.submit("OUTPUT(1);", "job")
+    assert reused[1]["wu_info"]["wuid"] == "W20240101-1"
+    assert ws.calls == 1
+
+
+# Test if an interrupted leader releases its followers and the in-flight entry
+def test_single_flight_interrupted():
+    ws = FakeSubmit(delay=0.2, error=KeyboardInterrupt())
+    single_flight = SingleFlightSubmit(ws, "folder")
+    errors = []
+
+    def follow():
+        time.sleep(0.05)
+        try:
+            single_flight.submit("OUTPUT(1);", "job")
+        except HPCCException as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    with pytest.raises(KeyboardInterrupt):
+        single_flight.submit("OUTPUT(1);", "job")
+    follower.join(5)
+    assert not follower.is_alive()
+    assert len(errors) == 1
+    ws.error = None
+    single_flight.submit("OUTPUT(1);", "job")
+    assert ws.calls == 2
+
+
+# Test if submissions with different options are not deduplicated
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ({"compile_options": {"-E": bool}}, {"compile_options": {}}),
+        ({"run_options": {"--target": "thor"}}, {"run_options": {"--target": "roxie"}}),
+    ],
+)
+def test_single_flight_key_includes_options(first, second):
+    assert SingleFlightSubmit.submission_key(
+        "OUTPUT(1);", **first
+    ) != SingleFlightSubmit.submission_key("OUTPUT(1);", **second)
+
+
+# Test if completed results are only reused inside the reuse window
+@pytest.mark.parametrize("reuse_window, expected_calls", [(0, 2), (60, 1)])
+def test_single_flight_reuse_window(reuse_window, expected_calls):
+    ws = FakeSubmit(delay=0)
+    single_flight = SingleFlightSubmit(ws, "folder", reuse_window=reuse_window)
+    single_flight.submit("OUTPUT(1);", "job")
+    single_flight.submit("OUTPUT(1);", "job")
+    assert ws.calls == expected_calls
+
+
+# Test if a failed submission raises for every waiting caller and is not reused
+def test_single_flight_shares_errors():
+    ws = FakeSubmit(error=HPCCException("Could not compile"))
+    single_flight = SingleFlightSubmit(ws, "folder", reuse_window=60)
+    with pytest.raises(HPCCException):
+        submit_concurrently(single_flight, 4)
+    assert ws.calls == 1
+    with pytest.raises(HPCCException):
+        single_flight.submit("OUTPUT(1);", "job")
+    assert ws.calls == 2
+
+
+# Test if runs with errors or a failed state are not reused
+@pytest.mark.parametrize(
+    "run_output",
+    [
+        {"wu_info": {"wuid": "W1", "state": "failed"}},
+        {"wu_info": {"wuid": "W1", "state": "aborted"}},
+        {"wu_info": {"wuid": "W1", "state": None}, "error": {"message": ["Error"]}},
+    ],
+)
+def test_single_flight_does_not_reuse_failed_runs(run_output):
+    ws = FakeSubmit(delay=0, run_output=run_output)
+    single_flight = SingleFlightSubmit(ws, "folder", reuse_window=60)
+    single_flight.submit("OUTPUT(1);", "job")
+    single_flight.submit("OUTPUT(1);", "job")
+    assert ws.calls == 2
+
+
+# Test if the oldest reusable results are dropped past max_entries
+def test_single_flight_max_entries():
+    ws = FakeSubmit(delay=0)
+    single_flight = SingleFlightSubmit(ws, "folder", reuse_window=60, max_entries=2)
+    for query in ("OUTPUT(1);", "OUTPUT(2);", "OUTPUT(3);", "OUTPUT(1);"):
+        single_flight.submit(query, "job")
+    assert ws.calls == 4
+    single_flight.submit("OUTPUT(3);", "job")
+    assert ws.calls == 4
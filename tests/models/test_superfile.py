@@ -0,0 +1,147 @@
+import json
+
+import pytest
+from conftest import FakeHPCC, esp_exception
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.superfile import SuperfileResolver, SuperfileTransaction
+
+FILES = {
+    "test::super": ["test::nested", "test::a"],
+    "test::nested": ["test::a", "test::b", "test::empty"],
+    "test::empty": [],
+    "test::a": None,
+    "test::b": None,
+}
+
+
+def info_hpcc(files=FILES):
+    def get_subfile_info(Name):
+        if Name not in files:
+            return esp_exception("Not found")
+        subfiles = files[Name]
+        detail = {"Name": Name, "isSuperfile": subfiles is not None}
+        if subfiles is None:
+            detail.update(FileSizeInt64=100, RecordCountInt64=10)
+        else:
+            detail["subfiles"] = {"Item": subfiles}
+        return {"DFUInfoResponse": {"FileDetail": detail}}
+
+    return FakeHPCC(get_subfile_info=get_subfile_info)
+
+
+def names(hpcc):
+    """Name of each DFUInfo call"""
+    return [kwargs["Name"] for _, kwargs in hpcc.calls]
+
+
+# Test if nested superfiles are expanded with one DFUInfo call per file
+def test_resolve_tree():
+    hpcc = info_hpcc()
+    tree = SuperfileResolver(hpcc).resolve("test::super")
+    assert [child.name for child in tree.children] == ["test::nested", "test::a"]
+    assert [leaf.name for leaf in tree.leaves()] == ["test::a", "test::b"]
+    assert (tree.total_size, tree.total_records, tree.depth) == (200, 20, 2)
+    assert sorted(names(hpcc)) == sorted(FILES)
+
+
+# Test if repeated resolves are answered from the cache until invalidated
+def test_resolve_cached():
+    hpcc = info_hpcc()
+    resolver = SuperfileResolver(hpcc)
+    resolver.resolve("test::super")
+    resolver.resolve("~TEST::Nested")
+    assert len(hpcc.calls) == len(FILES)
+    resolver.invalidate("test::nested")
+    resolver.resolve("test::super")
+    assert names(hpcc)[len(FILES) :] == ["test::nested"]
+
+
+# Test if a superfile containing itself is reported
+def test_resolve_cycle():
+    files = {"test::x": ["test::y"], "test::y": ["test::a", "test::x"], "test::a": None}
+    with pytest.raises(HPCCException, match="test::x -> test::y -> test::x"):
+        SuperfileResolver(info_hpcc(files)).resolve("test::x")
+
+
+# Test if missing subfiles raise the ESP exception
+def test_resolve_missing():
+    with pytest.raises(HPCCException, match="Not found"):
+        SuperfileResolver(info_hpcc({"test::x": ["test::gone"]})).resolve("test::x")
+
+
+def action_hpcc(fail=()):
+    def superfile_action(data, headers):
+        request = json.loads(data)["SuperfileActionRequest"]
+        if (request["superfile"], request["action"]) in fail:
+            return esp_exception("Cannot lock")
+        return {"SuperfileActionResponse": {"superfile": request["superfile"]}}
+
+    return FakeHPCC(superfile_action=superfile_action)
+
+
+def action_requests(hpcc):
+    """SuperfileActionRequest of each SuperfileAction call"""
+    return [
+        json.loads(kwargs["data"])["SuperfileActionRequest"] for _, kwargs in hpcc.calls
+    ]
+
+
+# Test if consecutive operations on a superfile are merged into few calls
+def test_transaction_batches_calls():
+    hpcc = action_hpcc()
+    with SuperfileTransaction(hpcc) as transaction:
+        transaction.add("test::super", ["test::a", "test::b"])
+        transaction.add("test::super", ["test::c"])
+        transaction.swap("test::super", ["test::old"], ["test::new"], delete=True)
+        transaction.add("test::super", ["test::d"])
+        transaction.clear("test::other")
+    calls = [
+        (r["superfile"], r["action"], r["subfiles"], r["delete"])
+        for r in action_requests(hpcc)
+    ]
+    assert [c for c in calls if c[0] == "test::super"] == [
+        ("test::super", "add", ["test::a", "test::b", "test::c", "test::new"], False),
+        ("test::super", "remove", ["test::old"], True),
+        ("test::super", "add", ["test::d"], False),
+    ]
+    assert ("test::other", "remove", ["*"], False) in calls
+    assert {op.status for op in transaction.operations} == {"ok"}
+
+
+# Test if a failure skips the later operations of its superfile only
+def test_transaction_failure():
+    hpcc = action_hpcc(fail={("test::super", "remove")})
+    transaction = SuperfileTransaction(hpcc)
+    add = transaction.add("test::super", ["test::a"])
+    swap = transaction.swap("test::super", ["test::old"], ["test::new"])
+    clear = transaction.clear("test::super")
+    other = transaction.add("test::other", ["test::a"])
+    transaction.commit()
+    assert (add.status, swap.status, clear.status) == ("ok", "failed", "skipped")
+    assert swap.error == "Cannot lock"
+    assert other.status == "ok"
+
+
+# Test if a swap whose remove fails leaves the new subfiles added
+def test_transaction_swap_adds_first():
+    hpcc = action_hpcc(fail={("test::super", "remove")})
+    transaction = SuperfileTransaction(hpcc)
+    swap = transaction.swap("test::super", ["test::old"], ["test::new"])
+    transaction.commit()
+    assert [(r["action"], r["subfiles"]) for r in action_requests(hpcc)] == [
+        ("add", ["test::new"]),
+        ("remove", ["test::old"]),
+    ]
+    assert swap.status == "failed"
+
+
+# Test if a commit drops the changed superfiles and deleted subfiles from a resolver cache
+def test_transaction_invalidates_resolver():
+    resolver = SuperfileResolver(info_hpcc())
+    for name in ("test::super", "test::old", "test::other"):
+        resolver.cache.set(name, "cached")
+    with SuperfileTransaction(action_hpcc(), resolver=resolver) as transaction:
+        transaction.swap("test::super", ["TEST::Old"], ["test::new"], delete=True)
+    assert resolver.cache.get("test::super") is None
+    assert resolver.cache.get("test::old") is None
+    assert resolver.cache.get("test::other") == "cached"
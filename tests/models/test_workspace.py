@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from pyhpcc.models.workspace import EclWorkspace
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    with EclWorkspace(root=tmp_path) as workspace:
+        yield workspace
+
+
+# Test if identical job names get unique files in one reused directory
+def test_workspace_unique_names(workspace):
+    first = workspace.write("OUTPUT(1);", "Basic Job")
+    second = workspace.write("OUTPUT(2);", "Basic Job")
+    assert first != second
+    assert os.path.dirname(first) == os.path.dirname(second) == workspace.path
+    assert os.path.basename(first).startswith("Basic_Job_")
+    assert open(first).read() == "OUTPUT(1);"
+    assert open(second).read() == "OUTPUT(2);"
+
+
+# Test if releasing a job removes the ecl file and its compiled outputs only
+def test_workspace_release(workspace):
+    file_name = workspace.write("OUTPUT(1);", "job")
+    other = workspace.write("OUTPUT(2);", "job")
+    stem = os.path.splitext(file_name)[0]
+    for suffix in (".eclxml", ".eclxml.xml"):
+        open(stem + suffix, "w").close()
+    workspace.release(file_name)
+    assert os.listdir(workspace.path) == [os.path.basename(other)]
+
+
+# Test if the job context manager releases the files even if the job fails
+def test_workspace_job_context(workspace):
+    with pytest.raises(RuntimeError):
+        with workspace.job("OUTPUT(1);", "job") as file_name:
+            assert os.path.exists(file_name)
+            raise RuntimeError()
+    assert not os.path.exists(file_name)
+
+
+# Test if exiting the workspace removes the directory
+def test_workspace_cleanup(tmp_path):
+    with EclWorkspace(root=tmp_path) as workspace:
+        workspace.write("OUTPUT(1);", "job")
+        path = workspace.path
+    assert not os.path.exists(path)
+    assert workspace.path is None
+
+
+# Test if WorkunitSubmit writes to the workspace and submit_query cleans up after the run
+def test_workunit_submit_with_workspace(hpcc, workspace, mocker):
+    ws = WorkunitSubmit(hpcc, ("thor",), workspace=workspace)
+    mocker.patch.object(
+        ws, "bash_compile", return_value=({"status": "success"}, "a.eclxml")
+    )
+    mocker.patch.object(ws, "bash_run", return_value={"wu_info": {}})
+    ws.submit_query("OUTPUT(1);", None, "Basic Job")
+    file_name = ws.bash_compile.call_args.args[0]
+    assert os.path.dirname(file_name) == workspace.path
+    assert os.listdir(workspace.path) == []
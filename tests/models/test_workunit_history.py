@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import FakeHPCC
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.workunit_history import WorkunitHistoryExporter
+
+START = datetime(2024, 1, 1)
+# Two workunits a minute for three hours
+WORKUNITS = [
+    (START + timedelta(seconds=30 * i), f"W20240101-{i:06d}") for i in range(360)
+]
+
+
+def wu_query(StartDate, EndDate, PageStartFrom, PageSize, **kwargs):
+    start = datetime.strptime(StartDate, "%Y-%m-%dT%H:%M:%SZ")
+    end = datetime.strptime(EndDate, "%Y-%m-%dT%H:%M:%SZ")
+    # Windows include both ends, like WUQuery
+    wuids = [wuid for when, wuid in WORKUNITS if start <= when <= end]
+    page = wuids[PageStartFrom : PageStartFrom + PageSize]
+    return {
+        "WUQueryResponse": {
+            "NumWUs": len(wuids),
+            "Workunits": {
+                "ECLWorkunit": [
+                    {
+                        "Wuid": wuid,
+                        "Cluster": "thor",
+                        "State": "completed",
+                        "Jobname": "job" if wuid >= WORKUNITS[300][1] else None,
+                    }
+                    for wuid in page
+                ]
+            },
+        }
+    }
+
+
+# Test if a date range is split into windows formatted for WUQuery
+def test_windows():
+    exporter = WorkunitHistoryExporter(FakeHPCC(wu_query=wu_query), window=3600)
+    assert exporter.windows(START, START + timedelta(minutes=90)) == [
+        ("2024-01-01T00:00:00Z", "2024-01-01T01:00:00Z"),
+        ("2024-01-01T01:00:00Z", "2024-01-01T01:30:00Z"),
+    ]
+
+
+# Test if every page of every window is fetched and workunits are exported once
+@pytest.mark.parametrize("page_size, max_workers", [(25, 4), (1000, 1)])
+def test_iter_workunits(page_size, max_workers):
+    hpcc = FakeHPCC(wu_query=wu_query)
+    exporter = WorkunitHistoryExporter(
+        hpcc, page_size=page_size, max_workers=max_workers, Cluster="thor"
+    )
+    workunits = list(exporter.iter_workunits(START, START + timedelta(hours=3)))
+    assert sorted(w.wuid for w in workunits) == [wuid for _, wuid in WORKUNITS]
+    assert {kwargs["Cluster"] for _, kwargs in hpcc.calls} == {"thor"}
+    assert all(kwargs["Sortby"] == "Wuid" for _, kwargs in hpcc.calls)
+
+
+# Test if workunits are exported in batches of dictionaries and RecordBatches
+def test_batches():
+    exporter = WorkunitHistoryExporter(FakeHPCC(wu_query=wu_query), page_size=50)
+    end = START + timedelta(hours=3)
+    batches = list(exporter.iter_batches(START, end, batch_size=100))
+    assert [len(batch) for batch in batches] == [100, 100, 100, 60]
+    assert batches[0][0]["cluster"] == "thor"
+    pytest.importorskip("pyarrow")
+    arrow = list(exporter.iter_arrow_batches(START, end, batch_size=200))
+    assert [batch.num_rows for batch in arrow] == [200, 160]
+    assert "wuid" in arrow[0].schema.names
+
+
+# Test if every RecordBatch has the same schema, even when a batch has only nulls
+def test_arrow_batches_schema(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    exporter = WorkunitHistoryExporter(FakeHPCC(wu_query=wu_query), page_size=50)
+    end = START + timedelta(hours=3)
+    arrow = list(exporter.iter_arrow_batches(START, end, batch_size=100))
+    assert arrow[0].column("job_name").null_count == 100
+    assert {batch.schema for batch in arrow} == {arrow[0].schema}
+    assert arrow[0].schema.field("job_name").type == pa.string()
+    assert arrow[0].schema.field("protected").type == pa.bool_()
+    with pq.ParquetWriter(tmp_path / "history.parquet", arrow[0].schema) as writer:
+        for batch in arrow:
+            writer.write_batch(batch)
+    assert pq.read_table(tmp_path / "history.parquet").num_rows == 360
+
+
+# Test if ESP exceptions are raised
+def test_exception():
+    exporter = WorkunitHistoryExporter(FakeHPCC("Access denied", wu_query=wu_query))
+    with pytest.raises(HPCCException, match="Access denied"):
+        list(exporter.iter_workunits(START, START + timedelta(hours=1)))
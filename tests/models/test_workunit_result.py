@@ -0,0 +1,104 @@
+import pytest
+from conftest import FakeHPCC
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.workunit_result import WorkunitResultReader
+
+RESULT_ROWS = [{"id": i, "name": f"name{i}"} for i in range(95)]
+
+
+def result_hpcc(rows=RESULT_ROWS, exception=None, max_count=None):
+    def get_wu_result(Wuid, Sequence, ResultName, Start, Count):
+        if max_count is not None:
+            Count = min(Count, max_count)
+        page = rows[Start : Start + Count]
+        response = {
+            "Wuid": Wuid,
+            "Sequence": Sequence,
+            "Start": Start,
+            "Requested": Count,
+            "Count": len(page),
+            "Total": len(rows),
+        }
+        if page:
+            response["Result"] = {"Row": page}
+        return {"WUResultResponse": response}
+
+    return FakeHPCC(exception, get_wu_result=get_wu_result)
+
+
+# Test if the reader requires exactly one of sequence or result_name
+@pytest.mark.parametrize("kwargs", [{}, {"sequence": 0, "result_name": "Result 1"}])
+def test_reader_result_selector(kwargs):
+    with pytest.raises(ValueError):
+        WorkunitResultReader(result_hpcc(), "W20240101-1", **kwargs)
+
+
+# Test if parallel pages are returned in order and cover the whole result
+@pytest.mark.parametrize("page_size, max_workers", [(10, 4), (7, 1), (200, 4)])
+def test_reader_read_all(page_size, max_workers):
+    hpcc = result_hpcc()
+    reader = WorkunitResultReader(
+        hpcc, "W20240101-1", sequence=0, page_size=page_size, max_workers=max_workers
+    )
+    df = reader.read()
+    assert df["id"].tolist() == list(range(95))
+    assert reader.get_total() == 95
+    assert len(hpcc.calls) == -(-95 // page_size)
+
+
+# Test if start and count limit the rows read
+def test_reader_start_count():
+    reader = WorkunitResultReader(
+        result_hpcc(), "W20240101-1", result_name="Result 1", page_size=10
+    )
+    batches = list(reader.iter_batches(start=15, count=30))
+    assert [data_attr["start"] for data_attr, _ in batches] == [15, 25, 35]
+    assert sum(len(df) for _, df in batches) == 30
+
+
+# Test if dtypes are applied to every batch
+def test_reader_dtypes():
+    reader = WorkunitResultReader(
+        result_hpcc(), "W20240101-1", sequence=0, page_size=50, dtypes={"id": "float64"}
+    )
+    for _, df in reader.iter_batches():
+        assert str(df["id"].dtype) == "float64"
+
+
+# Test if an empty result returns an empty DataFrame
+def test_reader_empty_result():
+    reader = WorkunitResultReader(result_hpcc(rows=[]), "W20240101-1", sequence=0)
+    assert reader.read().empty
+
+
+# Test if ESP exceptions are raised
+def test_reader_exception():
+    reader = WorkunitResultReader(
+        result_hpcc(exception="Invalid Wuid"), "W20240101-1", sequence=0
+    )
+    with pytest.raises(HPCCException):
+        reader.read()
+
+
+# Test if the result can be read as a pyarrow Table
+def test_reader_read_arrow():
+    pytest.importorskip("pyarrow")
+    reader = WorkunitResultReader(
+        result_hpcc(), "W20240101-1", sequence=0, page_size=20
+    )
+    table = reader.read_arrow()
+    assert table.num_rows == 95
+    assert table.column("id").to_pylist() == list(range(95))
+
+
+# Test if rows missing from short pages are fetched instead of skipped
+@pytest.mark.parametrize("start, count", [(0, -1), (3, 80)])
+def test_reader_short_pages(start, count):
+    reader = WorkunitResultReader(
+        result_hpcc(max_count=7), "W20240101-1", sequence=0, page_size=20
+    )
+    rows = [row for _, page in reader.iter_rows(start, count) for row in page]
+    expected = (
+        RESULT_ROWS[start:] if count == -1 else RESULT_ROWS[start : start + count]
+    )
+    assert rows == expected
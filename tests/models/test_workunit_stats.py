@@ -0,0 +1,132 @@
+import csv
+
+import pytest
+from conftest import FakeHPCC, esp_exception
+from pyhpcc.errors import HPCCException
+from pyhpcc.models.workunit_stats import COLUMNS, WorkunitStatsCollector
+
+
+def get_wu_info(Wuid, **kwargs):
+    if Wuid == "W-missing":
+        return esp_exception("Invalid Workunit ID")
+    if Wuid == "W-truncated":
+        return {"WUInfoResponse": "<truncated>"}
+    if Wuid == "W-malformed":
+        return {
+            "WUInfoResponse": {
+                "Workunit": {"Wuid": Wuid, "Timers": {"ECLTimer": ["x"]}}
+            }
+        }
+    workunit = {
+        "Wuid": Wuid,
+        "Cluster": "thor",
+        "Jobname": "daily",
+        "State": "completed",
+        "Timers": {
+            "ECLTimer": [
+                {"Name": "Total cluster time", "Value": "1:02.5", "count": 1},
+                {
+                    "Name": "Graph graph1 - 1 (1)",
+                    "Value": "250ms",
+                    "count": 1,
+                    "GraphName": "graph1",
+                    "SubGraphId": 1,
+                },
+            ]
+        },
+        "Graphs": {
+            "ECLGraph": [
+                {
+                    "Name": "graph1",
+                    "WhenStarted": "2024-01-01T12:00:00Z",
+                    "WhenFinished": "2024-01-01T12:01:00Z",
+                }
+            ]
+        },
+    }
+    return {"WUInfoResponse": {"Workunit": workunit}}
+
+
+# Test if timers and graphs become one row per wuid and timer
+def test_collector_dataframe():
+    hpcc = FakeHPCC(get_wu_info=get_wu_info)
+    df = WorkunitStatsCollector(hpcc, max_workers=2).to_dataframe(["W1", "W2"])
+    assert list(df.columns) == list(COLUMNS)
+    assert list(df["wuid"]) == ["W1"] * 3 + ["W2"] * 3
+    assert list(df["kind"][:3]) == ["timer", "timer", "graph"]
+    assert list(df["seconds"][:3]) == [62.5, 0.25, 60.0]
+    assert df["subgraph_id"][1] == 1
+    kwargs = hpcc.calls[0][1]
+    assert (kwargs["IncludeTimers"], kwargs["IncludeResults"]) == (1, 0)
+
+
+# Test if failed workunits are skipped and reported
+def test_collector_failed():
+    collector = WorkunitStatsCollector(
+        FakeHPCC(get_wu_info=get_wu_info), include_graphs=False
+    )
+    rows = [row for rows in collector.iter_rows(["W1", "W-missing"]) for row in rows]
+    assert [row["wuid"] for row in rows] == ["W1", "W1"]
+    assert collector.failed == ["W-missing"]
+
+
+# Test if malformed WUInfo bodies in the middle of a batch are skipped and reported
+def test_collector_malformed(tmp_path):
+    path = str(tmp_path / "stats.csv")
+    collector = WorkunitStatsCollector(FakeHPCC(get_wu_info=get_wu_info))
+    wuids = ["W1", "W-truncated", "W2", "W-malformed", "W3"]
+    assert collector.write(wuids, path, batch_size=2) == 9
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["wuid"] for row in rows[::3]] == ["W1", "W2", "W3"]
+    assert collector.failed == ["W-truncated", "W-malformed"]
+
+
+# Test if rows are appended to a CSV file in batches
+def test_collector_write_csv(tmp_path):
+    path = str(tmp_path / "stats.csv")
+    collector = WorkunitStatsCollector(FakeHPCC(get_wu_info=get_wu_info))
+    assert collector.write(["W1", "W2", "W3"], path, batch_size=2) == 9
+    assert collector.write(["W4"], path) == 3
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 12
+    assert rows[-1]["wuid"] == "W4" and rows[0]["seconds"] == "62.5"
+
+
+# Test if rows are written to a Parquet file
+def test_collector_write_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "stats.parquet")
+    WorkunitStatsCollector(FakeHPCC(get_wu_info=get_wu_info)).write(
+        ["W1", "W2", "W3"], path, batch_size=2
+    )
+    table = pq.read_table(path)
+    assert table.num_rows == 9
+    assert table.column("seconds").to_pylist()[:3] == [62.5, 0.25, 60.0]
+    assert not (tmp_path / "stats.parquet.part").exists()
+
+
+# Test if an interrupted Parquet collection leaves the output file untouched
+def test_collector_write_parquet_interrupted(tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "stats.parquet"
+    path.write_bytes(b"previous")
+
+    def wuids():
+        yield "W1"
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        WorkunitStatsCollector(FakeHPCC(get_wu_info=get_wu_info)).write(
+            wuids(), path, batch_size=1
+        )
+    assert path.read_bytes() == b"previous"
+
+
+# Test if an unknown format is rejected
+def test_collector_unknown_format(tmp_path):
+    with pytest.raises(HPCCException):
+        WorkunitStatsCollector(FakeHPCC(get_wu_info=get_wu_info)).write(
+            ["W1"], str(tmp_path / "stats.xlsx")
+        )
@@ -5,6 +5,7 @@ import conftest
 import pytest
 from pyhpcc.command_config import CompileConfig
 from pyhpcc.config import ECL_OUTPUT_DIR, OUTPUT_FILE_OPTION
+from pyhpcc.errors import HPCCException
 from pyhpcc.models.workunit_submit import WorkunitSubmit
 
 DUMMY_OUTPUT = "dummy_output"
@@ -243,3 +244,31 @@ def test_configure_run_config(hpcc, options, expected_options):
 def test_get_least_active_cluster(ws):
     cluster = ws.get_least_active_cluster()
     assert cluster != ""
+
+
+# Test if submit_query compiles and runs the written file with the job name set
+def test_submit_query(tmp_path, ws, ecl_hello_query, mocker):
+    compile_output = {"status": "success"}
+    run_output = {"wu_info": {"wuid": "W20240101-1", "state": "completed"}}
+    bash_compile = mocker.patch.object(
+        ws, "bash_compile", return_value=(compile_output, "Basic_Job.eclxml")
+    )
+    bash_run = mocker.patch.object(ws, "bash_run", return_value=run_output)
+    output = ws.submit_query(ecl_hello_query, tmp_path, "Basic Job")
+    assert output == (compile_output, run_output)
+    assert bash_compile.call_args.args[0].endswith("Basic_Job.ecl")
+    bash_run.assert_called_once_with(
+        "Basic_Job.eclxml", options={"--job-name": "Basic_Job"}
+    )
+
+
+# Test if submit_query does not run a query that failed to compile
+def test_submit_query_compile_error(tmp_path, ws, ecl_hello_query, mocker):
+    compile_output = {"status": "error", "errors": ["Error: syntax error"]}
+    mocker.patch.object(
+        ws, "bash_compile", return_value=(compile_output, "Basic_Job.eclxml")
+    )
+    bash_run = mocker.patch.object(ws, "bash_run")
+    with pytest.raises(HPCCException):
+        ws.submit_query(ecl_hello_query, tmp_path, "Basic Job")
+    bash_run.assert_not_called()
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from pyhpcc.cache import TTLCache
+
+
+# Test if entries expire after the ttl
+def test_cache_ttl():
+    cache = TTLCache(ttl=0.05)
+    cache.set("key", 1)
+    assert cache.get("key") == 1
+    time.sleep(0.06)
+    assert cache.get("key") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+# Test if the least recently used entry is evicted
+def test_cache_lru_eviction():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+# Test if negative entries are only cached when negative_ttl is set
+@pytest.mark.parametrize("negative_ttl, expected", [(None, None), (10, "failed")])
+def test_cache_negative(negative_ttl, expected):
+    cache = TTLCache(negative_ttl=negative_ttl)
+    cache.set_negative("key", "failed")
+    assert cache.get("key") == expected
+
+
+# Test if invalidate and clear remove entries
+def test_cache_invalidate_clear():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
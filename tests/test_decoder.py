@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from pyhpcc import decoder
+from pyhpcc.errors import HPCCException
+from requests.models import Response
+
+BODY = {"DFUQueryResponse": {"NumFiles": 1}}
+
+
+def _response(body):
+    response = Response()
+    response.status_code = 200
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+@pytest.fixture
+def json_backend():
+    initial = decoder.get_backend()
+    decoder.set_backend("json")
+    yield
+    decoder.set_backend(initial)
+
+
+# Test if a Response is decoded and an already decoded body is returned as is
+def test_decode_response(json_backend):
+    assert decoder.decode_response(_response(BODY)) == BODY
+    assert decoder.decode_response(BODY) is BODY
+
+
+# Test if responses are only parsed once by the helpers that share them
+def test_decode_response_parsed_once(mocker, json_backend):
+    loads = mocker.spy(decoder, "_loads")
+    body = decoder.decode_response(_response(BODY))
+    decoder.decode_response(body)
+    decoder.decode_response(body)
+    assert loads.call_count == 1
+
+
+# Test if an unknown backend is rejected
+def test_set_backend_unknown():
+    with pytest.raises(HPCCException):
+        decoder.set_backend("yaml")
+
+
+# Test if every installed backend decodes the same document
+@pytest.mark.parametrize("backend", decoder.BACKENDS)
+def test_backends_agree(backend):
+    pytest.importorskip(backend)
+    initial = decoder.get_backend()
+    decoder.set_backend(backend)
+    try:
+        assert decoder.loads(json.dumps(BODY).encode("utf-8")) == BODY
+    finally:
+        decoder.set_backend(initial)
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+import pyhpcc
+import pytest
+
+# Budget for importing a module that only submits workunits, override with
+# PYHPCC_IMPORT_BUDGET_MS on slow machines. Loading pandas alone exceeds it.
+IMPORT_BUDGET_MS = float(os.environ.get("PYHPCC_IMPORT_BUDGET_MS", 300))
+LIGHT_MODULES = [
+    "pyhpcc.utils",
+    "pyhpcc.models.workunit_submit",
+    "pyhpcc.models.file",
+    "pyhpcc.models.workunit_result",
+    "pyhpcc.models.roxie",
+]
+
+
+def _import(module, *flags):
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.dirname(pyhpcc.__file__))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    code = (
+        f"import json, sys, {module}; "
+        "print(json.dumps([m for m in ('pandas', 'pyarrow') if m in sys.modules]))"
+    )
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+
+
+def _cumulative_ms(stderr, module):
+    for line in reversed(stderr.splitlines()):
+        if line.startswith("import time:") and line.split("|")[-1].strip() == module:
+            return int(line.split("|")[1]) / 1000
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+# Test if importing the modules does not load pandas or pyarrow
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_heavy_dependencies_not_imported(module):
+    assert json.loads(_import(module).stdout) == []
+
+
+# Test if importing workunit submission stays within the import time budget
+def test_import_time_budget():
+    module = "pyhpcc.models.workunit_submit"
+    best = min(
+        _cumulative_ms(_import(module, "-X", "importtime").stderr, module)
+        for _ in range(3)
+    )
+    assert best < IMPORT_BUDGET_MS
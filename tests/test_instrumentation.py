@@ -0,0 +1,100 @@
+import json
+import logging
+
+import pytest
+import requests
+from pyhpcc.instrumentation import (
+    HistogramAggregator,
+    Instrumentation,
+    RequestInfo,
+    RequestLogSampler,
+)
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.roxie import Roxie
+from requests.models import Response
+
+
+def _response(status_code=200, content=b'{"WUInfoResponse": {}}'):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = content
+    resp.request = requests.Request("POST", "http://localhost", data=b"abc").prepare()
+    return resp
+
+
+@pytest.fixture
+def instrumentation():
+    instrumentation = Instrumentation()
+    instrumentation.infos = []
+    instrumentation.add_post_request(instrumentation.infos.append)
+    return instrumentation
+
+
+# Test if thor requests are recorded with their endpoint, status and sizes
+def test_thor_request_instrumented(instrumentation, mocker):
+    hpcc = HPCC(Auth("localhost", 8010, "u", "p"), instrumentation=instrumentation)
+    pre = instrumentation.add_pre_request(mocker.Mock())
+    mocker.patch.object(hpcc.auth.session, "request", return_value=_response())
+    hpcc.get_wu_info(Wuid="W1")
+    (info,) = instrumentation.infos
+    assert pre.call_args.args[0] is info
+    assert info.endpoint == "WsWorkunits/WUInfo"
+    assert (info.status, info.bytes_in, info.bytes_out) == (200, 22, 3)
+    assert info.total >= 0 and info.error is None
+
+
+# Test if failed requests are recorded with the exception name
+def test_roxie_request_error_instrumented(instrumentation, mocker):
+    roxie = Roxie(
+        Auth("localhost", 8002, "u", "p"),
+        "query",
+        "roxie",
+        instrumentation=instrumentation,
+    )
+    mocker.patch.object(
+        roxie.auth.session, "request", side_effect=requests.ConnectionError()
+    )
+    with pytest.raises(requests.ConnectionError):
+        roxie.roxie_call(id=1)
+    (info,) = instrumentation.infos
+    assert info.endpoint == "WsEcl/submit/query/roxie/query"
+    assert info.error == "ConnectionError" and info.status is None
+
+
+# Test if a failing callback does not fail the request
+def test_callback_failure_ignored(instrumentation, mocker):
+    hpcc = HPCC(Auth("localhost", 8010, "u", "p"), instrumentation=instrumentation)
+    instrumentation.add_pre_request(mocker.Mock(side_effect=ValueError))
+    mocker.patch.object(hpcc.auth.session, "request", return_value=_response())
+    assert hpcc.get_wu_info(Wuid="W1").status_code == 200
+    assert len(instrumentation.infos) == 1
+
+
+# Test if the histogram aggregates per endpoint and orders by total time
+def test_histogram_aggregator():
+    aggregator = HistogramAggregator(buckets=(0.1, 1, 10))
+    for total in [0.05] * 8 + [0.5, 5]:
+        aggregator(RequestInfo("WsDfu/DFUQuery", "POST", "", total=total, bytes_in=10))
+    aggregator(RequestInfo("WsWorkunits/WUInfo", "POST", "", total=20, status=500))
+    summary = aggregator.summary()
+    assert list(summary) == ["WsWorkunits/WUInfo", "WsDfu/DFUQuery"]
+    dfu = summary["WsDfu/DFUQuery"]
+    assert (dfu["count"], dfu["bytes_in"], dfu["errors"]) == (10, 100, 0)
+    assert (dfu["p50"], dfu["p95"], dfu["p99"]) == (0.1, 5, 5)
+    assert summary["WsWorkunits/WUInfo"]["errors"] == 1
+    assert summary["WsWorkunits/WUInfo"]["p50"] == 20
+    aggregator.reset()
+    assert aggregator.summary() == {}
+
+
+# Test if the sampler logs every failed request and the sampled successful ones
+def test_request_log_sampler(caplog):
+    sampler = RequestLogSampler(rate=0)
+    ok = RequestInfo("WsWorkunits/WUInfo", "POST", "http://localhost", status=200)
+    failed = RequestInfo("WsWorkunits/WUInfo", "POST", "http://localhost", status=500)
+    with caplog.at_level(logging.INFO, logger="pyhpcc.requests"):
+        sampler(ok)
+        sampler(failed)
+        RequestLogSampler(rate=1)(ok)
+    assert [json.loads(r.getMessage())["status"] for r in caplog.records] == [500, 200]
@@ -0,0 +1,149 @@
+import json
+
+import pytest
+from pyhpcc import tracing
+from pyhpcc.models.auth import Auth
+from pyhpcc.models.file import ReadFileInfo
+from pyhpcc.models.hpcc import HPCC
+from pyhpcc.models.workunit_submit import WorkunitSubmit
+
+ROWS = [{"id": i} for i in range(5)]
+
+
+@pytest.fixture
+def exporter():
+    exporter = tracing.InMemorySpanExporter()
+    tracing.set_tracer(tracing.Tracer([exporter]))
+    yield exporter
+    tracing.set_tracer(None)
+
+
+# Test if nested spans share a trace and link to their parent
+def test_tracer_nesting(exporter):
+    tracer = tracing.get_tracer()
+    with tracer.start_span("outer", {"a": 1}) as outer:
+        with tracer.start_span("inner") as inner:
+            assert tracer.current_span() is inner
+        assert tracer.current_span() is outer
+    assert [span.name for span in exporter.spans] == ["inner", "outer"]
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id and outer.parent_id is None
+    assert outer.duration >= inner.duration >= 0
+
+
+# Test if exceptions are recorded on the span
+def test_tracer_exception(exporter):
+    with pytest.raises(ValueError):
+        with tracing.get_tracer().start_span("failing"):
+            raise ValueError("boom")
+    (span,) = exporter.spans
+    assert span.status == "ERROR"
+    assert span.events[0]["attributes"]["exception.message"] == "boom"
+
+
+# Test if the file exporter writes one JSON line per span
+def test_file_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = tracing.Tracer([tracing.FileSpanExporter(path)])
+    with tracer.start_span("first", {"pyhpcc.wuid": "W1"}):
+        pass
+    with tracer.start_span("second"):
+        pass
+    tracer.shutdown()
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["first", "second"]
+    assert spans[0]["attributes"] == {"pyhpcc.wuid": "W1"}
+
+
+# Test if the default tracer records nothing
+def test_noop_tracer():
+    tracer = tracing.get_tracer()
+    assert isinstance(tracer, tracing.NoOpTracer)
+    with tracer.start_span("ignored") as span:
+        span.set_attribute("a", 1)
+
+
+class FakeProcess:
+    def __init__(self, output):
+        self.output = output
+
+    def communicate(self):
+        return self.output, None
+
+
+# Test if submit_query records compile and run spans under one trace
+def test_submit_query_spans(exporter, tmp_path, mocker):
+    ws = WorkunitSubmit(HPCC(Auth("localhost", 8010, "u", "p")), ("thor",))
+    outputs = iter([b"", b"wuid: W20240101-000001\nstate: completed\n"])
+    mocker.patch(
+        "pyhpcc.models.workunit_submit.subprocess.Popen",
+        side_effect=lambda *args, **kwargs: FakeProcess(next(outputs)),
+    )
+    ws.submit_query("OUTPUT(1);", tmp_path, "Traced Job")
+    spans = {span.name: span for span in exporter.spans}
+    submit = spans["pyhpcc.submit_query"]
+    assert spans["pyhpcc.compile"].parent_id == submit.span_id
+    assert spans["pyhpcc.compile"].attributes["pyhpcc.status"] == "success"
+    run = spans["pyhpcc.run"]
+    assert run.parent_id == submit.span_id
+    assert run.attributes["pyhpcc.wuid"] == "W20240101-000001"
+    assert run.attributes["pyhpcc.cluster"] == "thor"
+
+
+class FakeFileHPCC:
+    def file_query(self, **kwargs):
+        return {
+            "DFUQueryResponse": {
+                "NumFiles": 1,
+                "DFULogicalFiles": {
+                    "DFULogicalFile": [
+                        {
+                            "Name": "test::file",
+                            "NodeGroup": "mythor",
+                            "Totalsize": "100",
+                            "RecordCount": "5",
+                            "ContentType": "flat",
+                        }
+                    ]
+                },
+            }
+        }
+
+    def get_file_info(self, LogicalName, Cluster, Start, Count):
+        page = ROWS[Start : Start + Count]
+        return {
+            "WUResultResponse": {
+                "Start": Start,
+                "Count": len(page),
+                "Total": len(ROWS),
+                "Result": {"Row": page},
+            }
+        }
+
+
+# Test if get_data_iter records a read span with one child span per page
+def test_get_data_iter_spans(exporter):
+    pages = list(ReadFileInfo(FakeFileHPCC(), "test::file").get_data_iter(0, -1, 2))
+    assert [data_attr["count"] for data_attr, _ in pages] == [2, 2, 1]
+    read = next(span for span in exporter.spans if span.name == "pyhpcc.read")
+    page_spans = [span for span in exporter.spans if span.name == "pyhpcc.read.page"]
+    assert read.attributes["pyhpcc.logical_name"] == "test::file"
+    assert read.attributes["pyhpcc.cluster"] == "mythor"
+    assert [span.attributes["pyhpcc.rows"] for span in page_spans] == [2, 2, 1, 0]
+    assert all(span.parent_id == read.span_id for span in page_spans)
+
+
+# Test if stopping a traced generator early does not mark its span as failed
+def test_get_data_iter_early_exit(exporter):
+    pages = ReadFileInfo(FakeFileHPCC(), "test::file").get_data_iter(0, -1, 2)
+    next(pages)
+    pages.close()
+    read = next(span for span in exporter.spans if span.name == "pyhpcc.read")
+    assert read.status != "ERROR"
+    assert read.end_time is not None and not read.events
+
+
+# Test if an exporter must implement export
+def test_span_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        tracing.SpanExporter()
@@ -85,3 +85,72 @@ def test_bash_run(resp, expected_output):
     output = utils.parse_bash_run_output(resp)
     expected_output["raw_output"] = resp.decode()
     assert output == expected_output
+
+
+# Test if ESP numbers with thousands separators are parsed
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1,234,567", 1234567), ("12", 12), (5, 5), ("", None), (None, None)],
+)
+def test_to_int(value, expected):
+    assert utils.to_int(value) == expected
+
+
+# Test if bools and malformed numbers are rejected and logged
+@pytest.mark.parametrize("value", [True, False, "12abc", "1.5"])
+def test_to_int_rejects(value, caplog):
+    assert utils.to_int(value, default=-1) == -1
+    assert repr(value) in caplog.text
+
+
+# Test if request fields are summarized without reading or decoding upload bodies
+def test_summarize_for_log(mocker):
+    upload = mocker.Mock(spec=["read", "name"])
+    upload.name = "data.csv"
+    files = {"file": ("data.csv", upload, "text/plain"), "raw": b"x" * 1000}
+    assert utils.summarize_for_log(files) == (
+        "{'file': ['data.csv', <file data.csv>, 'text/plain'], 'raw': <1000 bytes>}"
+    )
+    upload.read.assert_not_called()
+    assert utils.summarize_for_log({"Wuid": b"W1"}, decode_bytes=True) == (
+        "{'Wuid': 'W1'}"
+    )
+    text = utils.summarize_for_log({"a": "x" * 1000}, max_chars=20)
+    assert text == "{'a': 'xxxxxxxxxxxxx...(truncated)"
+
+
+# Test if a lazy log value is only summarized when it is formatted
+def test_lazy_log_value(mocker):
+    summarize = mocker.patch.object(utils, "summarize_for_log", return_value="s")
+    value = utils.LazyLogValue({"a": 1})
+    summarize.assert_not_called()
+    assert str(value) == "s"
+
+
+# Test if ESP durations in their different formats are converted to seconds
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1.5s", 1.5),
+        ("12ms", 0.012),
+        ("1:02.5", 62.5),
+        ("1:00:01", 3601.0),
+        ("1h 2m 3s", 3723.0),
+        ("2.5", 2.5),
+        (3, 3.0),
+        ("", None),
+        ("soon", None),
+        (None, None),
+    ],
+)
+def test_parse_duration(value, expected):
+    assert utils.parse_duration(value) == pytest.approx(expected)
+
+
+# Test if numbers without a unit are read in the default unit
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1500000", 0.0015), (2000, 2e-6), ("12ms", 0.012), ("1:02", 62.0)],
+)
+def test_parse_duration_default_unit(value, expected):
+    assert utils.parse_duration(value, default_unit="ns") == pytest.approx(expected)